@@ -0,0 +1,89 @@
+"""Throughput of lookups on a shared frozen BodyPartIndex, from an increasing number of threads.
+
+Run from the repository root:
+
+    python -m benchmarks.concurrent_reads --threads 1 2 4 8 --seconds 2
+
+Prints one JSON object per thread count, with the lookups per second over all threads.
+"""
+import argparse
+import json
+import random
+import sys
+import threading
+import time
+from typing import Callable, List
+
+from body_part_index import BodyPartIndex
+
+
+def make_workload(bpi: BodyPartIndex, seed: int) -> List[Callable[[], object]]:
+    """Get a shuffled mix of lookups (by ID and code, relationships, searches) to run repeatedly."""
+    body_parts = list(bpi.get_all_body_parts())
+    rng = random.Random(seed)
+    sample = rng.sample(body_parts, min(200, len(body_parts)))
+    workload: List[Callable[[], object]] = []
+    for body_part in sample:
+        workload.append(lambda bp=body_part: bpi.get(bp.radlex_id))
+        workload.append(lambda bp=body_part: bpi.get_children(bp.radlex_id))
+        workload.append(lambda bp=body_part: bp.ancestors)
+        workload.append(lambda bp=body_part: bp.snomed_code)
+        workload.append(lambda bp=body_part: bpi.ranked_search(bp.description, limit=5))
+        for code in body_part.codes[:1]:
+            workload.append(lambda code=code: bpi.get_by_code(code))
+    rng.shuffle(workload)
+    return workload
+
+
+def run(workload: List[Callable[[], object]], threads: int, seconds: float) -> float:
+    """Run the workload from several threads for a while, and get the lookups per second."""
+    counts = [0] * threads
+    stop = threading.Event()
+    barrier = threading.Barrier(threads + 1)
+
+    def worker(number: int) -> None:
+        barrier.wait()
+        count = 0
+        while not stop.is_set():
+            for lookup in workload:
+                lookup()
+            count += len(workload)
+        counts[number] = count
+
+    workers = [threading.Thread(target=worker, args=(number,)) for number in range(threads)]
+    for thread in workers:
+        thread.start()
+    barrier.wait()
+    start = time.perf_counter()
+    time.sleep(seconds)
+    stop.set()
+    for thread in workers:
+        thread.join()
+    return sum(counts) / (time.perf_counter() - start)
+
+
+def main() -> None:
+    """Benchmark concurrent reads and print the results as JSON lines."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--threads', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--seconds', type=float, default=2.0)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('-f', '--from-file', type=str, help='JSON body part data (or packaged)')
+    args = parser.parse_args()
+    start = time.perf_counter()
+    bpi = BodyPartIndex(json_filename=args.from_file, frozen=True)
+    build_seconds = time.perf_counter() - start
+    workload = make_workload(bpi, args.seed)
+    for threads in args.threads:
+        result = {
+            'benchmark': 'concurrent_reads',
+            'threads': threads,
+            'lookups_per_second': round(run(workload, threads, args.seconds)),
+            'frozen_build_seconds': round(build_seconds, 3),
+            'python': sys.version.split()[0],
+        }
+        print(json.dumps(result), flush=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,166 @@
+"""Time to build a BodyPartIndex and to run each kind of lookup, on packaged and synthetic data.
+
+Run from the repository root:
+
+    python -m benchmarks.lookups --sizes 10000 100000 -o results.jsonl
+    python -m benchmarks.lookups --sizes 10000 100000 --baseline results.jsonl
+
+Each dataset (the packaged data, then synthetic data of each size; see benchmarks.synthetic) is
+indexed from scratch, and each operation is run on the same seeded sample of its body parts. Prints
+one JSON object per dataset and operation, with the best time per call over the repeats and the git
+commit measured, so results from two commits can be compared; with --baseline, each line also gets
+the ratio to the same measurement in an earlier results file (above 1 is slower).
+"""
+import argparse
+import json
+import random
+import subprocess
+import sys
+import time
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from body_part_index import BodyPart, BodyPartIndex
+
+from .synthetic import generate_body_parts
+
+DEFAULT_SIZES = (10000, 100000)
+PACKAGED = 'packaged'
+
+
+def git_commit() -> Optional[str]:
+    """Get the commit of the working tree being measured (None outside a git checkout)."""
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            capture_output=True,
+            check=True,
+            text=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def build(json_data: Optional[Dict]) -> Tuple[BodyPartIndex, float]:
+    """Build the singleton index (from the packaged data if json_data is None), timing it."""
+    BodyPartIndex.reset_instance()
+    start = time.perf_counter()
+    bpi = BodyPartIndex(json_data=json_data)
+    return (bpi, time.perf_counter() - start)
+
+
+def make_operations(
+    bpi: BodyPartIndex, sample: List[BodyPart], seed: int
+) -> Iterator[Tuple[str, List[Callable[[], object]]]]:
+    """Get the calls to time for each operation, each over the whole sample.
+
+    The cached snomed_code is timed right after its first (uncached) use, so that runs first.
+    """
+    rng = random.Random(seed)
+    yield ('snomed_code', [lambda bp=body_part: bp.snomed_code for body_part in sample])
+    yield ('snomed_code_cached', [lambda bp=body_part: bp.snomed_code for body_part in sample])
+    yield ('get', [lambda bp=body_part: bpi.get(bp.radlex_id) for body_part in sample])
+    codes = [body_part.codes[0] for body_part in sample if body_part.codes]
+    yield ('get_by_code', [lambda code=code: bpi.get_by_code(code) for code in codes])
+    # Each description without its first word, which usually matches a few body parts
+    queries = [
+        body_part.description.partition(' ')[2] or body_part.description for body_part in sample
+    ]
+    yield ('search', [lambda query=query: bpi.search(query) for query in queries])
+    yield ('children', [lambda bp=body_part: bp.children for body_part in sample])
+    yield ('descendants', [lambda bp=body_part: bp.descendants for body_part in sample])
+    yield ('ancestors', [lambda bp=body_part: bp.ancestors for body_part in sample])
+    # Half of the pairs are contained (by an ancestor), half are random
+    pairs = []
+    for body_part in sample:
+        ancestors = body_part.ancestors
+        if ancestors and rng.random() < 0.5:
+            pairs.append((body_part, rng.choice(ancestors)))
+        else:
+            pairs.append((body_part, rng.choice(sample)))
+    yield (
+        'is_contained',
+        [lambda pair=pair: pair[0].is_contained(pair[1]) for pair in pairs],
+    )
+
+
+def time_calls(calls: List[Callable[[], object]], repeat: int) -> float:
+    """Get the best time to make all the calls, over several repeats."""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for call in calls:
+            call()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def run_dataset(
+    dataset: str, json_data: Optional[Dict], sample_size: int, repeat: int, seed: int
+) -> Iterator[Dict]:
+    """Benchmark one dataset, yielding a result for the build and for each operation."""
+    (bpi, build_seconds) = build(json_data)
+    body_parts = list(bpi.get_all_body_parts())
+    result = {'dataset': dataset, 'size': len(body_parts)}
+    yield {**result, 'operation': 'build', 'calls': 1, 'seconds': build_seconds}
+    sample = random.Random(seed).sample(body_parts, min(sample_size, len(body_parts)))
+    for (operation, calls) in make_operations(bpi, sample, seed):
+        # The first use of snomed_code fills the cache, so it can only be timed once
+        seconds = time_calls(calls, 1 if operation == 'snomed_code' else repeat)
+        yield {**result, 'operation': operation, 'calls': len(calls), 'seconds': seconds}
+    BodyPartIndex.reset_instance()
+
+
+def read_baseline(filename: str) -> Dict[Tuple[str, str], float]:
+    """Read the time per call of each (dataset, operation) from an earlier results file."""
+    baseline = {}
+    with open(filename, encoding='utf-8') as baseline_file:
+        for line in baseline_file:
+            if line.strip():
+                result = json.loads(line)
+                baseline[(result['dataset'], result['operation'])] = result['per_call_us']
+    return baseline
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    """Benchmark builds and lookups and print the results as JSON lines."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        '--sizes', type=int, nargs='*', default=list(DEFAULT_SIZES),
+        help='Sizes of the synthetic datasets (e.g., up to 1000000)',
+    )
+    parser.add_argument('--no-packaged', action='store_true', help='Skip the packaged data')
+    parser.add_argument('--sample', type=int, default=1000, help='Body parts to look up')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('-o', '--output', type=str, help='Also write the results to this file')
+    parser.add_argument('--baseline', type=str, help='Earlier results file to compare with')
+    args = parser.parse_args(argv)
+    baseline = read_baseline(args.baseline) if args.baseline else {}
+    datasets: List[Tuple[str, Callable[[], Optional[Dict]]]] = []
+    if not args.no_packaged:
+        datasets.append((PACKAGED, lambda: None))
+    for size in args.sizes:
+        datasets.append(
+            (f'synthetic-{size}', lambda size=size: generate_body_parts(size, args.seed))
+        )
+    context = {'commit': git_commit(), 'python': sys.version.split()[0]}
+    output_file = open(args.output, 'w', encoding='utf-8') if args.output else None
+    try:
+        for (dataset, get_data) in datasets:
+            for result in run_dataset(dataset, get_data(), args.sample, args.repeat, args.seed):
+                result['seconds'] = round(result['seconds'], 6)
+                result['per_call_us'] = round(result['seconds'] / result['calls'] * 1e6, 3)
+                previous = baseline.get((dataset, result['operation']))
+                if previous:
+                    result['ratio'] = round(result['per_call_us'] / previous, 3)
+                line = json.dumps({'benchmark': 'lookups', **result, **context})
+                print(line, flush=True)
+                if output_file is not None:
+                    output_file.write(line + '\n')
+    finally:
+        if output_file is not None:
+            output_file.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,174 @@
+"""Seeded generator of synthetic body part data of any size, shaped like the packaged data.
+
+Run from the repository root to write a data file:
+
+    python -m benchmarks.synthetic --size 100000 --seed 0 -o synthetic_body_parts.json
+
+The proportions below follow the packaged data (2,890 body parts): containers have a heavy-tailed
+number of children (median 10, up to a few hundred), over a quarter of the concepts have left and
+right versions, and most body parts have SNOMED and FMA codes, fewer UMLS and MESH ones. The
+packaged hierarchy is 6 levels deep; keeping the fan-out realistic, a larger hierarchy has to be
+deeper, so somewhat more concepts are containers (and the depth grows with the log of the size).
+"""
+import argparse
+import json
+import math
+import random
+from collections import deque
+from typing import Any, Dict, List, Optional
+
+from body_part_index import WHOLE_BODY_ID
+
+LEFT_SUFFIX = '_RID5824'
+RIGHT_SUFFIX = '_RID5825'
+
+WHOLE_BODY_CHILDREN = 24
+MEDIAN_CHILDREN = 10
+MAX_CHILDREN = 200
+
+# Probabilities for each concept (or, for the sided versions, for each of them)
+CONTAINER_PROBABILITY = 0.15
+SIDED_PROBABILITY = 0.28
+SYNONYM_PROBABILITY = 0.4
+PART_OF_PROBABILITY = 0.35
+SEX_SPECIFIC_PROBABILITY = 0.04
+CODE_PROBABILITIES = {'SNOMED': 0.6, 'FMA': 0.57, 'UMLS': 0.2, 'MESH': 0.08}
+SIDED_CODE_PROBABILITIES = {'SNOMED': 0.5, 'FMA': 0.5}
+
+_ADJECTIVES = (
+    'anterior', 'posterior', 'superior', 'inferior', 'medial', 'lateral', 'deep', 'superficial',
+    'proximal', 'distal', 'internal', 'external', 'common', 'accessory', 'transverse', 'greater',
+    'lesser', 'middle', 'ascending', 'descending',
+)
+_NOUNS = (
+    'artery', 'vein', 'nerve', 'muscle', 'ligament', 'tendon', 'bone', 'joint', 'lymph node',
+    'duct', 'gland', 'lobe', 'segment', 'fascia', 'recess', 'process', 'foramen', 'sinus', 'wall',
+    'branch', 'plexus', 'cartilage', 'space', 'surface',
+)
+_REGIONS = (
+    'thorax', 'abdomen', 'pelvis', 'neck', 'head', 'arm', 'forearm', 'hand', 'thigh', 'leg', 'foot',
+    'kidney', 'liver', 'lung', 'heart', 'brain', 'spine', 'shoulder', 'hip', 'knee', 'orbit',
+)
+
+
+class _Generator:
+    def __init__(self, size: int, seed: int) -> None:
+        self.size = size
+        self.rng = random.Random(seed)
+        self.body_parts: List[Dict[str, Any]] = []
+        self.concepts: List[Dict[str, Any]] = []
+        # Containers waiting for their children, filled level by level
+        self.containers: 'deque[Dict[str, Any]]' = deque()
+        self.next_number = 100000
+        self.next_code = 1000000
+
+    def generate(self) -> Dict[str, Any]:
+        rng = self.rng
+        whole_body = self._add(WHOLE_BODY_ID, 'whole body', WHOLE_BODY_ID, CODE_PROBABILITIES)
+        child_count = WHOLE_BODY_CHILDREN
+        container = whole_body
+        while len(self.body_parts) < self.size:
+            for _ in range(child_count):
+                if len(self.body_parts) >= self.size:
+                    break
+                self._add_concept(container)
+            if not self.containers:
+                self.containers.append(rng.choice(self.concepts))
+            container = self.containers.popleft()
+            child_count = round(rng.lognormvariate(math.log(MEDIAN_CHILDREN), 0.9))
+            child_count = min(max(child_count, 1), MAX_CHILDREN)
+        return {'$version': f'SYNTHETIC-{self.size}', 'bodyParts': self.body_parts}
+
+    def _add_concept(self, container: Dict[str, Any]) -> None:
+        rng = self.rng
+        radlex_id = f'RID{self.next_number}'
+        self.next_number += 1
+        description = f'{rng.choice(_ADJECTIVES)} {rng.choice(_NOUNS)} of {rng.choice(_REGIONS)}'
+        concept = self._add(radlex_id, description, container['radlexId'], CODE_PROBABILITIES)
+        if rng.random() < SYNONYM_PROBABILITY:
+            concept['synonyms'] = [f'{rng.choice(_NOUNS)} of {rng.choice(_REGIONS)}']
+        if self.concepts and rng.random() < PART_OF_PROBABILITY:
+            # Only earlier concepts, so the part of hierarchy has no cycles
+            concept['partOfId'] = rng.choice(self.concepts)['radlexId']
+        if rng.random() < SEX_SPECIFIC_PROBABILITY:
+            concept['sexSpecific'] = rng.choice(('Female', 'Male'))
+        if rng.random() < CONTAINER_PROBABILITY:
+            self.containers.append(concept)
+        self.concepts.append(concept)
+        # Only if both sided versions fit, so the size is exact without dangling references
+        if rng.random() < SIDED_PROBABILITY and len(self.body_parts) + 2 <= self.size:
+            self._add_sided_versions(concept, container)
+
+    def _add_sided_versions(self, concept: Dict[str, Any], container: Dict[str, Any]) -> None:
+        radlex_id = concept['radlexId']
+        concept['leftId'] = radlex_id + LEFT_SUFFIX
+        concept['rightId'] = radlex_id + RIGHT_SUFFIX
+        for (side, suffix, other_suffix) in (
+            ('left', LEFT_SUFFIX, RIGHT_SUFFIX),
+            ('right', RIGHT_SUFFIX, LEFT_SUFFIX),
+        ):
+            # Sided versions are contained by the same side of a sided container
+            sided_container = container.get(f'{side}Id', container['radlexId'])
+            sided = self._add(
+                radlex_id + suffix,
+                f"{side} {concept['description']}",
+                sided_container,
+                SIDED_CODE_PROBABILITIES,
+            )
+            sided['unsidedId'] = radlex_id
+            sided['leftId' if side == 'right' else 'rightId'] = radlex_id + other_suffix
+            if 'partOfId' in concept:
+                sided['partOfId'] = concept['partOfId']
+
+    def _add(
+        self,
+        radlex_id: str,
+        description: str,
+        contained_by_id: str,
+        code_probabilities: Dict[str, float],
+    ) -> Dict[str, Any]:
+        body_part: Dict[str, Any] = {
+            'radlexId': radlex_id,
+            'description': description,
+            'containedById': contained_by_id,
+        }
+        codes = []
+        for (system, probability) in code_probabilities.items():
+            if self.rng.random() < probability:
+                codes.append({'system': system, 'code': str(self.next_code)})
+                self.next_code += 1
+        if codes:
+            body_part['codes'] = codes
+        self.body_parts.append(body_part)
+        return body_part
+
+
+def generate_body_parts(size: int, seed: int = 0) -> Dict[str, Any]:
+    """Generate body part data in the format of the packaged JSON file.
+
+    The same size and seed always give the same data. Every reference between the body parts
+    (containedById, partOfId, leftId, rightId and unsidedId) is to one of them.
+
+    Args:
+        size (int): Number of body parts (at least 1)
+        seed (int, optional): Seed of the random choices. Defaults to 0.
+
+    Returns:
+        Dict[str, Any]: Data with "$version" and "bodyParts"
+    """
+    return _Generator(size, seed).generate()
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """Write a synthetic data file."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--size', type=int, default=10000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('-o', '--output', type=str, required=True)
+    args = parser.parse_args(argv)
+    with open(args.output, 'w', encoding='utf-8') as output_file:
+        json.dump(generate_body_parts(args.size, args.seed), output_file)
+
+
+if __name__ == '__main__':
+    main()
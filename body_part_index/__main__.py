@@ -1,8 +1,24 @@
 """Command line interface for body_part_index package."""
 import argparse
+import csv
+import itertools
+import json
 import logging
-import requests
-from body_part_index import BodyPartIndex, BodyPart, BODY_PART_INDEX_DATA_URL, WHOLE_BODY_ID
+import multiprocessing
+import os
+import sys
+import tempfile
+import threading
+from functools import partial
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, TextIO
+from body_part_index import BodyPartIndex, BodyPart, WHOLE_BODY_ID
+from body_part_index.constants import BODY_PART_INDEX_DATA_URL
+from body_part_index.body_part import BREADTH_FIRST, DEPTH_FIRST
+from body_part_index.snapshot import DEFAULT_JSON_FILENAME, DEFAULT_SNAPSHOT_FILENAME
+
+DEFAULT_BATCH_CHUNK_SIZE = 1000
+# Chunks in flight per worker process, which bounds the memory used for huge inputs
+CHUNKS_PER_WORKER = 4
 
 
 def setup_argparse() -> argparse.ArgumentParser:
@@ -23,7 +39,12 @@ def setup_argparse() -> argparse.ArgumentParser:
         type=str,
         const=BODY_PART_INDEX_DATA_URL,
         nargs='?',
-        help='URL of the body part index data file',
+        help='URL of the body part index data file (downloaded only if it changed since last time)',
+    )
+    parser.add_argument(
+        '--cache-dir',
+        type=str,
+        help='Cache directory for --from-url data (default: ~/.cache/body_part_index)',
     )
     parser.add_argument(
         '-f',
@@ -31,39 +52,325 @@ def setup_argparse() -> argparse.ArgumentParser:
         type=str,
         help='Filename of the body part index data file',
     )
+    parser.add_argument(
+        '-s',
+        '--from-snapshot',
+        type=str,
+        help='Filename of a body part index snapshot (see --save-snapshot)',
+    )
+    parser.add_argument(
+        '--save-snapshot',
+        type=str,
+        const=DEFAULT_SNAPSHOT_FILENAME,
+        nargs='?',
+        help='Save a snapshot of the index to this file (by default, the snapshot loaded by BodyPartIndex())',
+    )
     parser.add_argument(
         '-v',
         '--verbose',
         action='store_true',
         help='Enable verbose logging'
     )
+    subparsers = parser.add_subparsers(dest='command', title='commands')
+    batch_parser = subparsers.add_parser(
+        'batch',
+        help='Look up many IDs, codes or search terms, writing one JSON line per value',
+        description='Look up the IDs or codes (or, with --search, the search terms) read from a '
+        'file or standard input, writing one JSON object per value, in input order.',
+    )
+    batch_parser.add_argument(
+        'input',
+        type=str,
+        nargs='?',
+        default='-',
+        help='File with one value per line, or a CSV file with --column (default: standard input)',
+    )
+    batch_parser.add_argument(
+        '--column',
+        type=str,
+        help='Read the values from this column of a CSV file with a header row',
+    )
+    batch_parser.add_argument(
+        '--search',
+        action='store_true',
+        help='Treat the values as search terms (best matches first) rather than IDs or codes',
+    )
+    batch_parser.add_argument(
+        '--limit', type=int, default=10, help='Most matches per search term (default: 10)'
+    )
+    batch_parser.add_argument(
+        '-o', '--output', type=str, default='-', help='File to write (default: standard output)'
+    )
+    batch_parser.add_argument(
+        '-w',
+        '--workers',
+        type=int,
+        default=1,
+        help='Processes to look up the values in (default: 1)',
+    )
+    batch_parser.add_argument(
+        '--chunk-size',
+        type=int,
+        default=DEFAULT_BATCH_CHUNK_SIZE,
+        help=f'Values handed to a worker at a time (default: {DEFAULT_BATCH_CHUNK_SIZE})',
+    )
+    tree_parser = subparsers.add_parser(
+        'tree',
+        help='Print the hierarchy below a body part, one line per body part',
+        description='Print the hierarchy contained by a body part, writing each line as soon as '
+        'the walk reaches the body part (so the output can be piped and cut short).',
+    )
+    tree_parser.add_argument(
+        'root',
+        type=str,
+        nargs='?',
+        default=WHOLE_BODY_ID,
+        help=f'ID or code of the body part at the top (default: {WHOLE_BODY_ID}, the whole body)',
+    )
+    tree_parser.add_argument(
+        '--order',
+        choices=(DEPTH_FIRST, BREADTH_FIRST),
+        default=DEPTH_FIRST,
+        help='Depth-first (each body part followed by its contents) or breadth-first (by level)',
+    )
+    tree_parser.add_argument(
+        '--max-depth', type=int, help='Deepest level to print (1 for the children only)'
+    )
+    tree_parser.add_argument(
+        '--prune',
+        type=str,
+        action='append',
+        default=[],
+        metavar='ID',
+        help='Leave out this body part and everything it contains (can be repeated)',
+    )
+    tree_parser.add_argument(
+        '--json',
+        action='store_true',
+        help='Write one JSON object per body part (with its depth) instead of indented text',
+    )
     return parser
 
 
-def setup_index(args) -> BodyPartIndex:
+def setup_index(args: argparse.Namespace) -> BodyPartIndex:
     """Generate BodyPartIndex object from command line arguments."""
     logger = logging.getLogger(__name__)
+    if args.from_snapshot is not None:
+        logger.warning("Using body part index snapshot from %s", args.from_snapshot)
+        return BodyPartIndex.from_snapshot(args.from_snapshot)
     if args.from_file is not None:
         logger.warning("Using body part index data from %s", args.from_file)
         return BodyPartIndex(json_filename=args.from_file)
     if args.from_url is not None:
-        if (response := requests.get(args.from_url, timeout=3)).ok:
-            logger.warning("Using body part index data from %s", args.from_url)
-            return BodyPartIndex(json_data=response.json())
-        raise Exception(f'Failed to retrieve body part index data from {args.from_url}')
+        try:
+            BodyPartIndex.refresh(url=args.from_url, cache_directory=args.cache_dir)
+        except OSError as error:
+            raise Exception(f'Failed to retrieve body part index data from {args.from_url}') from error
+        logger.warning("Using body part index data from %s", args.from_url)
+        return BodyPartIndex.get_instance()
     logger.warning("Using default body part index data")
     return BodyPartIndex()
 
+def source_json_filename(args: argparse.Namespace) -> Optional[str]:
+    """Get the name of the JSON file the index of the command line arguments is built from."""
+    if args.from_file is not None:
+        return args.from_file
+    if args.from_snapshot is None and args.from_url is None:
+        return DEFAULT_JSON_FILENAME
+    return None
+
 def body_part_summary(body_part: BodyPart) -> str:
     """Generate summary of BodyPart object."""
     descendants_count = len(body_part.descendants)
     return f'{body_part} [{descendants_count} children]'
 
 
-def main():
+def body_part_record(body_part: BodyPart) -> Dict[str, Any]:
+    """Generate the JSON object for a BodyPart in batch results."""
+    return {'radlexId': body_part.radlex_id, 'description': body_part.description}
+
+
+def read_values(input_file: TextIO, column: Optional[str] = None) -> Iterator[str]:
+    """Read the values to look up, one per line or from a column of a CSV file (skipping blanks).
+
+    Raises:
+        ValueError: If the CSV file has no such column
+    """
+    if column is None:
+        lines: Iterable[str] = input_file
+    else:
+        reader = csv.DictReader(input_file)
+        if reader.fieldnames is None or column not in reader.fieldnames:
+            raise ValueError(f'No column {column} in the CSV header')
+        lines = (row[column] or '' for row in reader)
+    for line in lines:
+        value = line.strip()
+        if value:
+            yield value
+
+
+def resolve_values(values: List[str], search: bool = False, limit: int = 10) -> List[str]:
+    """Look up values in the BodyPartIndex singleton, getting one JSON line for each.
+
+    Args:
+        values (List[str]): IDs or codes (without system), or search terms
+        search (bool, optional): Search for the values (see ranked_search()) instead of looking
+            them up by ID or code. Defaults to False.
+        limit (int, optional): Most matches per search term. Defaults to 10.
+
+    Returns:
+        List[str]: {"query": value, "match": body part or null} for each ID or code, or
+            {"query": value, "matches": [body parts]} for each search term
+    """
+    index = BodyPartIndex.get_instance()
+    lines = []
+    for value in values:
+        result: Dict[str, Any] = {'query': value}
+        if search:
+            matches = index.ranked_search(value, limit=limit)
+            result['matches'] = [body_part_record(body_part) for body_part in matches]
+        else:
+            body_part = index.get(value)
+            result['match'] = body_part_record(body_part) if body_part is not None else None
+        lines.append(json.dumps(result, ensure_ascii=False))
+    return lines
+
+
+def dump_tree(args: argparse.Namespace, index: BodyPartIndex, output_file: TextIO) -> int:
+    """Write the hierarchy below the root of the tree subcommand, one body part at a time.
+
+    Args:
+        args (argparse.Namespace): Command line arguments
+        index (BodyPartIndex): Index to take the body parts from
+        output_file (TextIO): File to write the tree to
+
+    Raises:
+        Exception: If no BodyPart has the root ID or code
+
+    Returns:
+        int: Number of body parts written below the root
+    """
+    root = index.get(args.root)
+    if root is None:
+        raise Exception(f'No BodyPart with ID or code {args.root}')
+    pruned_ids = set(args.prune)
+    walk = root.walk(
+        args.order,
+        args.max_depth,
+        (lambda body_part: body_part.radlex_id not in pruned_ids) if pruned_ids else None,
+    )
+    count = 0
+    if args.json:
+        output_file.write(json.dumps({'depth': 0, **body_part_record(root)}) + '\n')
+        for (depth, body_part) in walk:
+            output_file.write(json.dumps({'depth': depth, **body_part_record(body_part)}) + '\n')
+            count += 1
+    else:
+        output_file.write(f'{root}\n')
+        for (depth, body_part) in walk:
+            output_file.write(f'{"  " * depth}{body_part}\n')
+            count += 1
+    return count
+
+
+def _start_worker(verbose: bool, snapshot_filename: Optional[str]) -> None:
+    # A forked worker inherits the index; any other kind of worker loads the parent's snapshot,
+    # rather than fetching or parsing the data again
+    logging.basicConfig(level=logging.DEBUG if verbose else logging.ERROR)
+    if not BodyPartIndex.is_initialized() and snapshot_filename is not None:
+        BodyPartIndex.from_snapshot(snapshot_filename, frozen=True)
+
+
+def _chunks(values: Iterable[Any], size: int) -> Iterator[List[Any]]:
+    iterator = iter(values)
+    chunk = list(itertools.islice(iterator, size))
+    while chunk:
+        yield chunk
+        chunk = list(itertools.islice(iterator, size))
+
+
+def _bounded(
+    values: Iterable[Any], slots: threading.Semaphore, stopped: threading.Event
+) -> Iterator[Any]:
+    # Hand out a value only once a slot is free; the consumer frees one for each result it takes
+    for value in values:
+        slots.acquire()
+        if stopped.is_set():
+            return
+        yield value
+
+
+def run_batch(args: argparse.Namespace, input_file: TextIO, output_file: TextIO) -> int:
+    """Look up the values of the batch subcommand, writing the results as JSON lines.
+
+    The BodyPartIndex singleton has to be set up already; with more than one worker, each worker
+    process inherits it (or, where processes are not forked, loads a snapshot of it).
+
+    Args:
+        args (argparse.Namespace): Command line arguments
+        input_file (TextIO): File to read the values from
+        output_file (TextIO): File to write the results to
+
+    Raises:
+        ValueError: If the number of workers or the chunk size is not positive
+
+    Returns:
+        int: Number of values looked up
+    """
+    if args.workers < 1 or args.chunk_size < 1:
+        raise ValueError('The number of workers and the chunk size must be positive')
+    chunks = _chunks(read_values(input_file, args.column), args.chunk_size)
+    resolve = partial(resolve_values, search=args.search, limit=args.limit)
+    count = 0
+    if args.workers == 1:
+        for lines in map(resolve, chunks):
+            output_file.writelines(line + '\n' for line in lines)
+            count += len(lines)
+        return count
+    # Compute everything otherwise computed on first use once, for the workers to inherit
+    index = BodyPartIndex.get_instance()
+    index.freeze()
+    context = multiprocessing.get_context()
+    with tempfile.TemporaryDirectory() as directory:
+        snapshot_filename = None
+        if context.get_start_method() != 'fork':
+            snapshot_filename = os.path.join(directory, 'body_parts.snapshot')
+            index.save_snapshot(snapshot_filename)
+        # imap() would read the whole input up front, so it is fed a few chunks per worker ahead
+        # of the results written so far
+        slots = threading.Semaphore(args.workers * CHUNKS_PER_WORKER)
+        stopped = threading.Event()
+        with context.Pool(args.workers, _start_worker, (args.verbose, snapshot_filename)) as pool:
+            try:
+                for lines in pool.imap(resolve, _bounded(chunks, slots, stopped)):
+                    slots.release()
+                    output_file.writelines(line + '\n' for line in lines)
+                    count += len(lines)
+            finally:
+                # Wake the feeding thread if it waits for a slot, so the pool can shut down
+                stopped.set()
+                slots.release()
+    return count
+
+
+def batch(args: argparse.Namespace) -> None:
+    """Run the batch subcommand on its input and output files (or standard input and output)."""
+    input_file = sys.stdin if args.input == '-' else open(args.input, encoding='utf-8', newline='')
+    output_file = sys.stdout if args.output == '-' else open(args.output, 'w', encoding='utf-8')
+    try:
+        count = run_batch(args, input_file, output_file)
+    finally:
+        if input_file is not sys.stdin:
+            input_file.close()
+        if output_file is not sys.stdout:
+            output_file.close()
+    logging.getLogger(__name__).info('Looked up %d values', count)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
     """Main function for body_part_index CLI."""
     parser = setup_argparse()
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
     if args.verbose:
         logging.basicConfig(level=logging.DEBUG)
         logging.getLogger('body_part_index').setLevel(logging.DEBUG)
@@ -72,7 +379,23 @@ def main():
         logging.getLogger('body_part_index').setLevel(logging.ERROR)
     logging.getLogger(__name__).warning("Starting body_part_index CLI: %s", args)
     index: BodyPartIndex = setup_index(args)
-    body_part: BodyPart = index.get(args.id_or_code)
+    if args.command == 'batch':
+        batch(args)
+        return
+    if args.command == 'tree':
+        try:
+            dump_tree(args, index, sys.stdout)
+        except BrokenPipeError:
+            # The reader (e.g., head) has seen enough; send whatever is still buffered to devnull, so
+            # that flushing stdout at exit does not fail again
+            os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+            sys.exit(1)
+        return
+    if args.save_snapshot is not None:
+        index.save_snapshot(args.save_snapshot, json_filename=source_json_filename(args))
+        print(f'Saved snapshot to {args.save_snapshot}')
+        return
+    body_part: Optional[BodyPart] = index.get(args.id_or_code)
     if body_part is None:
         raise Exception(f'No BodyPart with ID or code {args.id_or_code}')
     print(body_part_summary(body_part))
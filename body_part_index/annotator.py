@@ -0,0 +1,157 @@
+"""Find mentions of body parts in free text with an Aho-Corasick automaton."""
+from collections import deque
+from typing import Deque, Dict, Iterable, Iterator, List, NamedTuple, Tuple
+
+from .body_part import BodyPart
+
+# Transitions are kept in a single dict keyed by (state << _CHAR_BITS) | ord(char)
+_CHAR_BITS = 21
+
+
+class Annotation(NamedTuple):
+    """An Annotation is a tuple of (start, end, body_part) for a mention of a body part in a text."""
+
+    start: int
+    end: int
+    body_part: BodyPart
+
+
+def _lower_preserving_offsets(text: str) -> str:
+    lowered = text.lower()
+    if len(lowered) == len(text):
+        return lowered
+    # A few characters (e.g., 'İ') lower-case to more than one character; keep those as they are
+    return ''.join(c.lower() if len(c.lower()) == 1 else c for c in text)
+
+
+def _is_word_character(char: str) -> bool:
+    return char.isalnum() or char == '_'
+
+
+class Annotator:
+    """Tags every body part mentioned in a text, by description or synonym, in a single pass.
+
+    The automaton is compiled once from all the descriptions and synonyms of an index, after which
+    annotating a document costs O(length of the document + number of matches). Matching ignores
+    case, only accepts whole words, and prefers the longest of overlapping mentions (so "left
+    uterine adnexa" is one mention rather than also containing "uterine adnexa"). When a term is
+    shared by several body parts, the one using it as its description wins, and otherwise the first
+    in the index.
+    """
+
+    def __init__(self, body_parts: Iterable[BodyPart]) -> None:
+        """Compile the automaton for a collection of body parts.
+
+        Args:
+            body_parts (Iterable[BodyPart]): BodyParts to look for, typically
+                BodyPartIndex.get_all_body_parts()
+        """
+        body_parts = list(body_parts)
+        terms: Dict[str, BodyPart] = {}
+        for body_part in body_parts:
+            terms.setdefault(_lower_preserving_offsets(body_part.description), body_part)
+        for body_part in body_parts:
+            for synonym in body_part.synonyms or ():
+                terms.setdefault(_lower_preserving_offsets(synonym), body_part)
+        terms.pop('', None)
+        self._goto: Dict[int, int] = {}
+        self._fail: List[int] = [0]
+        self._output: List[int] = [-1]
+        self._output_link: List[int] = [0]
+        self._terms: List[Tuple[int, BodyPart]] = []
+        for term, body_part in terms.items():
+            self._add_term(term, body_part)
+        self._link_failures()
+
+    def _add_term(self, term: str, body_part: BodyPart) -> None:
+        state = 0
+        for char in term:
+            key = (state << _CHAR_BITS) | ord(char)
+            next_state = self._goto.get(key)
+            if next_state is None:
+                next_state = len(self._fail)
+                self._goto[key] = next_state
+                self._fail.append(0)
+                self._output.append(-1)
+                self._output_link.append(0)
+            state = next_state
+        self._output[state] = len(self._terms)
+        self._terms.append((len(term), body_part))
+
+    def _link_failures(self) -> None:
+        char_mask = (1 << _CHAR_BITS) - 1
+        children: Dict[int, List[Tuple[int, int]]] = {}
+        for key, state in self._goto.items():
+            children.setdefault(key >> _CHAR_BITS, []).append((key & char_mask, state))
+        queue: Deque[int] = deque(state for (_, state) in children.get(0, ()))
+        while queue:
+            parent = queue.popleft()
+            for (char_code, state) in children.get(parent, ()):
+                fallback = self._fail[parent]
+                while fallback and ((fallback << _CHAR_BITS) | char_code) not in self._goto:
+                    fallback = self._fail[fallback]
+                self._fail[state] = self._goto.get((fallback << _CHAR_BITS) | char_code, 0)
+                # Nearest state along the failure chain that completes a term
+                failure = self._fail[state]
+                if self._output[failure] < 0:
+                    failure = self._output_link[failure]
+                self._output_link[state] = failure
+                queue.append(state)
+
+    def __len__(self) -> int:
+        return len(self._terms)
+
+    def _matches(self, text: str) -> Iterator[Tuple[int, int, int]]:
+        goto = self._goto
+        fail = self._fail
+        state = 0
+        for position, char in enumerate(text):
+            char_code = ord(char)
+            next_state = goto.get((state << _CHAR_BITS) | char_code)
+            while next_state is None and state:
+                state = fail[state]
+                next_state = goto.get((state << _CHAR_BITS) | char_code)
+            state = next_state or 0
+            match_state = state if self._output[state] >= 0 else self._output_link[state]
+            while match_state:
+                term = self._output[match_state]
+                yield (position + 1 - self._terms[term][0], position + 1, term)
+                match_state = self._output_link[match_state]
+
+    def annotate(self, text: str) -> List[Annotation]:
+        """Find the body parts mentioned in a text.
+
+        Args:
+            text (str): Text to annotate (e.g., the body of a radiology report)
+
+        Returns:
+            List[Annotation]: Non-overlapping (start, end, body_part) mentions, in text order, where
+                text[start:end] is the mention
+        """
+        lowered = _lower_preserving_offsets(text)
+        candidates = [
+            (start, end, term)
+            for (start, end, term) in self._matches(lowered)
+            if (start == 0 or not _is_word_character(lowered[start - 1]))
+            and (end == len(lowered) or not _is_word_character(lowered[end]))
+        ]
+        candidates.sort(key=lambda match: (match[0], -match[1]))
+        annotations: List[Annotation] = []
+        covered = 0
+        for (start, end, term) in candidates:
+            if start >= covered:
+                annotations.append(Annotation(start, end, self._terms[term][1]))
+                covered = end
+        return annotations
+
+    def annotate_documents(self, documents: Iterable[str]) -> Iterator[List[Annotation]]:
+        """Annotate a stream of documents, one at a time.
+
+        Args:
+            documents (Iterable[str]): Texts to annotate; may be a generator over a large corpus
+
+        Yields:
+            List[Annotation]: Mentions found in each document, in the same order as the documents
+        """
+        for document in documents:
+            yield self.annotate(document)
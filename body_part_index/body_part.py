@@ -1,12 +1,95 @@
 """Contains the BodyPart class and associated types."""
 
-from dataclasses import dataclass, field
-from functools import cached_property
-from typing import Any, Dict, NamedTuple, Optional, Set, Iterable, Protocol, List, Tuple
+import sys
+from collections import deque
+from dataclasses import dataclass, field, fields
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Generic,
+    NamedTuple,
+    Optional,
+    Set,
+    Iterable,
+    Iterator,
+    Protocol,
+    List,
+    Tuple,
+    TypeVar,
+)
 
 WHOLE_BODY_ID = 'RID39569'
+# Code system name standing for the RadLex IDs of body parts (e.g., in translations)
+RADLEX = 'RADLEX'
 SEXES = ('Female', 'Male')
-INDEX_FUNCTIONS = ('get_by_id', 'get_all_body_parts')
+# Orders in which BodyPart.walk() can visit the BodyParts below one
+DEPTH_FIRST = 'dfs'
+BREADTH_FIRST = 'bfs'
+INDEX_FUNCTIONS = (
+    'get_by_id',
+    'get_all_body_parts',
+    'get_children',
+    'get_part_of_children',
+    'get_descendants',
+    'is_ancestor',
+)
+
+
+_T = TypeVar('_T')
+_C = TypeVar('_C', bound=type)
+
+
+# Store BodyPart fields in __slots__ instead of a per-instance __dict__ (see _add_slots())
+_DATACLASS_SLOTS: Dict[str, bool] = {'slots': True} if sys.version_info >= (3, 10) else {}
+
+
+def _add_slots(cls: _C) -> _C:
+    """Recreate a dataclass with its fields in __slots__, as dataclass(slots=True) does on 3.10+."""
+    if _DATACLASS_SLOTS:
+        return cls
+    names = tuple(data_field.name for data_field in fields(cls))
+    # The field defaults are class attributes, which would clash with the slots of the same names;
+    # the generated __init__ has its own copy of them
+    namespace = {
+        name: value
+        for (name, value) in cls.__dict__.items()
+        if name not in (*names, '__dict__', '__weakref__')
+    }
+    namespace['__slots__'] = names
+    return type(cls)(cls.__name__, cls.__bases__, namespace)
+
+
+class SlotCachedProperty(Generic[_T]):
+    """Like functools.cached_property, but keeps the value in the __slots__ slot named "_<name>".
+
+    Computing a value twice (e.g., from two threads at once) is harmless, so no lock is taken.
+    """
+
+    def __init__(self, function: Callable[[Any], _T]) -> None:
+        self.function = function
+        self.slot_name = f'_{function.__name__}'
+        self.__doc__ = function.__doc__
+
+    def __set_name__(self, owner: type, name: str) -> None:
+        self.slot_name = f'_{name}'
+
+    def __get__(self, instance: Any, owner: Optional[type] = None) -> Any:
+        if instance is None:
+            return self
+        try:
+            return getattr(instance, self.slot_name)
+        except AttributeError:
+            value = self.function(instance)
+            object.__setattr__(instance, self.slot_name, value)
+            return value
+
+    def reset(self, instance: Any) -> None:
+        """Forget the cached value of an instance, so it is computed again on next access."""
+        try:
+            object.__delattr__(instance, self.slot_name)
+        except AttributeError:
+            pass
 
 
 class Code(NamedTuple):
@@ -21,7 +104,8 @@ class Code(NamedTuple):
         return Code(code_dict['system'], code_dict['code'])
 
 
-@dataclass(frozen=True)
+@_add_slots
+@dataclass(frozen=True, **_DATACLASS_SLOTS)
 class BodyPartData:
     """A BodyPartData is a tuple of at least (radlex_id, description, contained_by_id) and optional
        codes, synonyms, sided IDs, part_of_id, and sex specificity.
@@ -103,11 +187,42 @@ class Index(Protocol):
 
     def get_all_body_parts(self) -> Iterable['BodyPart']:
         ...
+
+    def get_children(self, radlex_id: str) -> Iterable['BodyPart']:
+        ...
+
+    def get_part_of_children(self, radlex_id: str) -> Iterable['BodyPart']:
+        ...
+
+    def get_descendants(self, radlex_id: str) -> Iterable['BodyPart']:
+        ...
+
+    def is_ancestor(self, ancestor_id: str, descendant_id: str) -> bool:
+        ...
     # pylint: enable=missing-function-docstring
 
+
+# Values a BodyPart caches (see SlotCachedProperty)
+_CACHED_RELATIONSHIPS = ('contained_by', 'part_of', 'left', 'right', 'unsided', 'snomed_code')
+
+
 class BodyPart(BodyPartData):
     """ "Body part object representing a node in the anatomic location hierarchy."""
 
+    # Only the links to other BodyParts and the SNOMED code are cached on the object itself; sets
+    # of children and descendants come from the index's compact tables each time they are needed
+    __slots__ = (
+        '_index',
+        '_contained_by',
+        '_part_of',
+        '_left',
+        '_right',
+        '_unsided',
+        '_snomed_code',
+        '__weakref__',
+    )
+    _index: Index
+
     def __init__(
         self,
         index: Index,
@@ -121,7 +236,7 @@ class BodyPart(BodyPartData):
         left_id: Optional[str] = None,
         right_id: Optional[str] = None,
         part_of_id: Optional[str] = None,
-        sex_specific: str = None,
+        sex_specific: Optional[str] = None,
     ) -> None:
         """Initialize a BodyPart object, representing an anatomic location, with associated information.
 
@@ -129,8 +244,8 @@ class BodyPart(BodyPartData):
             radlex_id (str): Main identifier for the object
             description (str): Preferred term for the concept (from RadLe)
             contained_by_id (str): Parent object in the anatomic location hierarchy
-            index (BodyPartIndex-like): Typically a BodyPartIndex, but can be anything that offers "get_by_id" and
-                   "get_all_body_parts" methods.
+            index (BodyPartIndex-like): Typically a BodyPartIndex, but can be anything that offers the methods
+                   of the Index protocol (see INDEX_FUNCTIONS).
             codes (Iterable[Code], optional): List of codes for the concept, where each
                    element is a dict like {"system": "SNOMED", "code": "xxxxxx"}. Defaults to None.
             synonyms (Iterable[str], optional): List of synonyms for the concept. Defaults to None.
@@ -161,52 +276,174 @@ class BodyPart(BodyPartData):
                 raise ValueError(
                     f'index must be a BodyPartIndex or at least implement {method}() (got {index})'
                 )
-        self._index: Index = index
+        object.__setattr__(self, '_index', index)
 
-    @cached_property
+    @SlotCachedProperty
     def contained_by(self) -> 'BodyPart':
         """BodyPart: Parent object in the anatomic location (contained by) hierarchy"""
         return self._index.get_by_id(self.contained_by_id)
 
-    @cached_property
+    @SlotCachedProperty
     def part_of(self) -> Optional['BodyPart']:
         """BodyPart: Parent object in the part of hierarchy"""
         return self._index.get_by_id(self.part_of_id) if self.part_of_id is not None else None
 
-    @cached_property
+    @SlotCachedProperty
     def left(self) -> Optional['BodyPart']:
         """BodyPart: Left-sided version of the concept"""
         return self._index.get_by_id(self.left_id) if self.left_id is not None else None
 
-    @cached_property
+    @SlotCachedProperty
     def right(self) -> Optional['BodyPart']:
         """BodyPart: Right-sided version of the concept"""
         return self._index.get_by_id(self.right_id) if self.right_id is not None else None
 
-    @cached_property
+    @SlotCachedProperty
     def unsided(self) -> Optional['BodyPart']:
         """BodyPart: Unisided version of the concept"""
         return self._index.get_by_id(self.unsided_id) if self.unsided_id is not None else None
 
-    @cached_property
+    def _precompute_relationships(self) -> None:
+        # Fill in every cached link up front, so that reading them later never writes to the object
+        for name in _CACHED_RELATIONSHIPS:
+            try:
+                getattr(self, name)
+            except Exception:  # pylint: disable=broad-except
+                # A reference to a missing body part keeps raising whenever it is read, as before
+                pass
+
+    def _forget_relationships(self) -> None:
+        # Drop every cached link, e.g., after the BodyParts it leads to changed
+        for name in _CACHED_RELATIONSHIPS:
+            getattr(BodyPart, name).reset(self)
+
+    @property
     def children(self) -> Set['BodyPart']:
         """Returns the set of children of this BodyPart."""
-        return set(filter(self.is_child, self._index.get_all_body_parts()))
+        return set(self._index.get_children(self.radlex_id))
+
+    @property
+    def part_of_children(self) -> Set['BodyPart']:
+        """Returns the set of BodyParts that are part of this BodyPart."""
+        return set(self._index.get_part_of_children(self.radlex_id))
 
-    @cached_property
+    @property
     def descendants(self) -> Set['BodyPart']:
         """Returns the set of descendants of this BodyPart."""
-        descendants: Set['BodyPart'] = set(self.children)
-        for child in self.children:
-            descendants.update(child.descendants)
-        return descendants
+        return set(self._index.get_descendants(self.radlex_id))
 
-    @cached_property
+    @property
     def ancestors(self) -> List['BodyPart']:
-        """Returns the set of ancestors of this BodyPart."""
-        if self.radlex_id == WHOLE_BODY_ID:
-            return []
-        return [self.contained_by] + self.contained_by.ancestors
+        """Returns the list of ancestors of this BodyPart, from its container up to the whole body.
+
+        Raises:
+            ValueError: If the BodyPart is (indirectly) contained by itself
+        """
+        return list(self.iter_ancestors())
+
+    def iter_ancestors(self) -> Iterator['BodyPart']:
+        """Yield the ancestors of this BodyPart one by one, from its container up to the whole body.
+
+        Each container is only looked up when the previous one has been used, so stopping early
+        (e.g., at the first ancestor with a SNOMED code) skips the rest of the way up.
+
+        Raises:
+            ValueError: If the BodyPart is (indirectly) contained by itself (when the walk gets back
+                to a BodyPart it has yielded)
+        """
+        seen_ids = {self.radlex_id}
+        body_part = self
+        while body_part.radlex_id != WHOLE_BODY_ID:
+            body_part = body_part.contained_by
+            if body_part.radlex_id in seen_ids:
+                raise ValueError(f'{self} is on a cycle of contained_by_id references')
+            seen_ids.add(body_part.radlex_id)
+            yield body_part
+
+    def walk(
+        self,
+        order: str = DEPTH_FIRST,
+        max_depth: Optional[int] = None,
+        predicate: Optional[Callable[['BodyPart'], bool]] = None,
+    ) -> Iterator[Tuple[int, 'BodyPart']]:
+        """Yield the BodyParts contained (directly or indirectly) by this one, with their depth.
+
+        The walk is iterative and lazy: the children of a BodyPart are only looked up when the walk
+        gets to them, so stopping early saves the rest of the work, and deep hierarchies need no
+        recursion. Each BodyPart is visited at most once, even if the data has containment cycles.
+
+        Args:
+            order (str, optional): DEPTH_FIRST ("dfs", each BodyPart followed by everything it
+                contains) or BREADTH_FIRST ("bfs", level by level). Defaults to DEPTH_FIRST.
+            max_depth (int, optional): Deepest level to visit (1 for the children only), or None
+                for all. Defaults to None.
+            predicate (Callable[[BodyPart], bool], optional): Tells whether to visit a BodyPart; one
+                it rejects is skipped along with everything it contains. Defaults to None (visit
+                all).
+
+        Raises:
+            ValueError: If the order is not DEPTH_FIRST or BREADTH_FIRST, or max_depth is negative
+
+        Returns:
+            Iterator[Tuple[int, BodyPart]]: (depth, BodyPart) pairs, where the children of this
+                BodyPart have depth 1
+        """
+        if order not in (DEPTH_FIRST, BREADTH_FIRST):
+            raise ValueError(f'order must be {DEPTH_FIRST!r} or {BREADTH_FIRST!r} (got {order!r})')
+        if max_depth is not None and max_depth < 0:
+            raise ValueError(f'max_depth cannot be negative (got {max_depth})')
+        return self._walk(order, max_depth, predicate)
+
+    def _walk(
+        self,
+        order: str,
+        max_depth: Optional[int],
+        predicate: Optional[Callable[['BodyPart'], bool]],
+    ) -> Iterator[Tuple[int, 'BodyPart']]:
+        seen_ids = {self.radlex_id}
+        # Iterators over the children still to visit, with their depth: a stack for a depth-first
+        # walk (so children come out in their own order) and a queue for a breadth-first one
+        pending: 'deque[Tuple[int, Iterator[BodyPart]]]' = deque()
+        if max_depth != 0:
+            pending.append((1, self._iter_children(self.radlex_id)))
+        take_next = pending.pop if order == DEPTH_FIRST else pending.popleft
+        while pending:
+            (depth, children) = take_next()
+            for child in children:
+                if child.radlex_id in seen_ids or (predicate is not None and not predicate(child)):
+                    continue
+                seen_ids.add(child.radlex_id)
+                if order == DEPTH_FIRST:
+                    # Come back for the remaining siblings after everything below this child
+                    pending.append((depth, children))
+                if max_depth is None or depth < max_depth:
+                    pending.append((depth + 1, self._iter_children(child.radlex_id)))
+                yield (depth, child)
+                if order == DEPTH_FIRST:
+                    break
+
+    def _iter_children(self, radlex_id: str) -> Iterator['BodyPart']:
+        # The children are looked up on the first next(), not when the generator is created
+        yield from self._index.get_children(radlex_id)
+
+    def iter_descendants(
+        self,
+        order: str = DEPTH_FIRST,
+        max_depth: Optional[int] = None,
+        predicate: Optional[Callable[['BodyPart'], bool]] = None,
+    ) -> Iterator['BodyPart']:
+        """Yield the BodyParts contained (directly or indirectly) by this one, lazily.
+
+        Unlike descendants, nothing is collected up front, so a caller can stop at the first match,
+        limit the depth, or prune whole branches (see walk() for the arguments).
+
+        Raises:
+            ValueError: If the order is not DEPTH_FIRST or BREADTH_FIRST, or max_depth is negative
+
+        Returns:
+            Iterator[BodyPart]: The BodyParts below this one, in the given order
+        """
+        return (body_part for (_, body_part) in self.walk(order, max_depth, predicate))
 
     def is_child(self, other: 'BodyPart') -> bool:
         """Check if the other BodyPart is a child of this one.
@@ -221,20 +458,27 @@ class BodyPart(BodyPartData):
 
     def is_contained(self, other: 'BodyPart') -> bool:
         """Check if this BodyPart is contained by other BodyPart.
-        
+
         Args:
             other (BodyPart): BodyPart to check against
 
         Returns:
             bool: True if other among all containing BodyParts, False otherwise
         """
+        return self._index.is_ancestor(other.radlex_id, self.radlex_id)
 
-        if other in self.ancestors:
-            return True
-        else:
-            return False
-    
-    @cached_property
+    def is_ancestor_of(self, other: 'BodyPart') -> bool:
+        """Check if this BodyPart contains (directly or indirectly) the other BodyPart.
+
+        Args:
+            other (BodyPart): BodyPart to check against
+
+        Returns:
+            bool: True if this BodyPart is among all the BodyParts containing other, False otherwise
+        """
+        return self._index.is_ancestor(self.radlex_id, other.radlex_id)
+
+    @SlotCachedProperty
     def snomed_code(self) -> Optional[str]:
         """Return the most appropriate SNOMED code for the body part.
 
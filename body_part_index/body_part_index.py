@@ -1,13 +1,82 @@
 """Routines to pull in the information/hierarchy of BodyPart objects from the standard library."""
+import csv
 import gc
-import json
 import importlib.resources
 import logging
-from typing import List, Dict, Set, Iterable, Optional
+import threading
+import time
+import weakref
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    List,
+    Dict,
+    Set,
+    Iterable,
+    Optional,
+    Sequence,
+    TextIO,
+    Tuple,
+    TypeVar,
+)
 
-from .body_part import BodyPartData
+from .annotator import Annotator
+from .constants import BODY_PART_INDEX_DATA_URL
+from .body_part import _CACHED_RELATIONSHIPS, RADLEX, BodyPartData
+from .delta import apply_change, check_delta
+from .facets import FacetIndex
+from .fuzzy import DEFAULT_MAX_DISTANCE, DeletionIndex
+from .hierarchy import ContainmentHierarchy
+from .instrumentation import (
+    Callback,
+    Instrumentation,
+    TimedCachedProperty,
+    patch,
+    timed_method,
+    unpatch,
+)
+from .memory import deep_sizeof
+from .refresh import DEFAULT_TIMEOUT, fetch_data
+from .shared import write_shared_index
+from .table import COLUMNS, BodyPartTable, RowGroups
+from .streaming import BodyPartStream
+from .snapshot import (
+    DEFAULT_SNAPSHOT_FILENAME,
+    is_default_snapshot_current,
+    read_snapshot,
+    write_snapshot,
+)
+from .text_search import (
+    EXACT_DESCRIPTION_MATCH,
+    EXACT_SYNONYM_MATCH,
+    InvertedIndex,
+    TrigramIndex,
+    normalize,
+)
+from .validation import IntegrityProblem, find_problems
 from . import BodyPart, Code
 
+# asyncio and concurrent.futures are imported by the methods that use them, which keeps them (and
+# their own imports) out of the start-up of programs that never need them, like the CLI
+if TYPE_CHECKING:
+    from concurrent.futures import Executor, Future
+
+# Number of values looked up (or queries searched) by the async batch methods between yields
+DEFAULT_ASYNC_CHUNK_SIZE = 10000
+DEFAULT_ASYNC_SEARCH_CHUNK_SIZE = 100
+
+_Result = TypeVar('_Result')
+
+# Methods timed while instrumentation is enabled, with how to tell a hit from the result (get_by_id
+# raises instead of missing)
+INSTRUMENTED_METHODS: Dict[str, Callable[[Any], bool]] = {
+    'get': lambda result: result is not None,
+    'get_by_id': lambda result: True,
+    'get_by_code': lambda result: result is not None,
+    'search': bool,
+}
+
 
 class BodyPartIndex:
     """Index of BodyPart objects, keyed by RadLex ID.
@@ -17,25 +86,94 @@ class BodyPartIndex:
     """
 
     __the_instance: Optional['BodyPartIndex'] = None
+    __instrumentation: Optional[Instrumentation] = None
+    # Original attributes of the classes patched by enable_instrumentation()
+    __uninstrumented: List[Tuple[type, List[Tuple[str, Any]]]] = []
 
-    # TODO: Add ability to add local codes and synonyms
     def __init__(
-        self, json_data: Optional[Dict] = None, json_filename: Optional[str] = None
+        self,
+        json_data: Optional[Dict] = None,
+        json_filename: Optional[str] = None,
+        snapshot_filename: Optional[str] = None,
+        lazy: bool = False,
+        frozen: bool = False,
+        trusted: Optional[bool] = None,
     ) -> None:
+        """Create the BodyPartIndex singleton.
+
+        Args:
+            json_data (Dict, optional): Body part data, in the format of the packaged JSON file
+            json_filename (str, optional): Name of a JSON file with body part data, which is parsed
+                and indexed one body part at a time (see BodyPartStream)
+            snapshot_filename (str, optional): Name of a snapshot file (see save_snapshot())
+            lazy (bool, optional): Keep only the raw fields of the body parts, and create BodyPart
+                objects the first time they are used (holding them weakly, so unused ones are freed
+                again), and build the indices for search(), ranked_search() and fuzzy_search() on
+                the first search. Start-up time and memory then scale with what a process actually
+                uses. Defaults to False.
+            frozen (bool, optional): Compute everything that is otherwise computed on first use (see
+                freeze()), so the index can be read from any number of threads without locks.
+                Defaults to False.
+            trusted (bool, optional): Skip checking the references between the body parts (see
+                check_integrity()). Defaults to True for snapshots, which were checked when they
+                were built, and False for JSON data.
+
+        With no arguments, the index is built from the packaged data (or its snapshot, if current).
+
+        Raises:
+            Exception: If the singleton has already been initialized, or the data has two body
+                parts with the same ID
+            ValueError: If both lazy and frozen are requested
+        """
         if BodyPartIndex.__the_instance is not None:
             raise Exception(
                 'Singleton already initialized.  Use BodyPartIndex.get_instance() instead.'
             )
-        if json_data is None:
-            if json_filename is None:
-                json_data = json.load(
-                    importlib.resources.open_text('body_part_index.data', 'body_parts.json')
-                )
-            else:
-                json_data = self._get_json_data_from_file(json_filename)
-        self._initialize(json_data)
+        self._load(json_data, json_filename, snapshot_filename, lazy, frozen, trusted)
         BodyPartIndex.__the_instance = self
 
+    def _load(
+        self,
+        json_data: Optional[Dict],
+        json_filename: Optional[str],
+        snapshot_filename: Optional[str],
+        lazy: bool,
+        frozen: bool,
+        trusted: Optional[bool] = None,
+    ) -> None:
+        if lazy and frozen:
+            raise ValueError('A lazy index creates BodyParts on use, so it cannot be frozen')
+        if BodyPartIndex.__instrumentation is not None:
+            BodyPartIndex.__instrumentation.start_build()
+        from_snapshot = snapshot_filename is not None
+        if snapshot_filename is not None:
+            snapshot = self._run_phase('parse', read_snapshot, snapshot_filename)
+            self._initialize_from_snapshot(snapshot, lazy)
+        elif json_data is None and json_filename is None and is_default_snapshot_current():
+            from_snapshot = self._initialize_from_default_snapshot(lazy)
+        elif json_data is not None:
+            self._initialize(json_data, lazy)
+        elif json_filename is not None:
+            with open(json_filename, encoding='utf-8') as json_file:
+                self._initialize_from_json_file(json_file, lazy)
+        else:
+            self._initialize_from_packaged_json(lazy)
+        if not (from_snapshot if trusted is None else trusted):
+            self._run_phase('check', self.check_integrity)
+        if frozen:
+            self._run_phase('freeze', self.freeze)
+
+    def _run_phase(self, phase: str, function: Callable[..., _Result], *args: Any) -> _Result:
+        # Run a step of building the index, timing it if instrumentation is enabled
+        instrumentation = BodyPartIndex.__instrumentation
+        if instrumentation is None:
+            return function(*args)
+        start = time.perf_counter()
+        try:
+            return function(*args)
+        finally:
+            instrumentation.record_phase(phase, time.perf_counter() - start)
+
     @staticmethod
     def get_instance() -> 'BodyPartIndex':
         """Get singleton instance of BodyPartIndex.
@@ -58,60 +196,918 @@ class BodyPartIndex:
         """Check if the singleton instance of BodyPartIndex has been initialized."""
         return BodyPartIndex.__the_instance is not None
 
-    def _get_json_data_from_file(self, json_filename: str) -> Dict:
-        with open(json_filename, encoding='utf-8') as json_file:
-            return json.load(json_file)
+    @staticmethod
+    def enable_instrumentation(callback: Optional[Callback] = None) -> Instrumentation:
+        """Start counting calls, hits and misses, and timing lookups and index builds.
+
+        This swaps timing wrappers in for get(), get_by_id(), get_by_code() and search(), and for
+        the cached BodyPart properties (contained_by, part_of, left, right, unsided and
+        snomed_code), and times the phases of every index built from then on (parsing the data,
+        constructing the table and BodyParts, indexing, checking integrity and freezing). It
+        applies to the singleton and to any index that replaces it (e.g., by refresh()).
+        disable_instrumentation() puts the original methods back, so instrumentation costs nothing
+        while it is not enabled.
+
+        Args:
+            callback (Callback, optional): Function called with (operation, seconds, hit) for
+                every instrumented call and with ("build.<phase>", seconds, None) for every build
+                phase (see Instrumentation). Defaults to None.
+
+        Raises:
+            ValueError: If instrumentation is already enabled
+
+        Returns:
+            Instrumentation: Collects the statistics (see Instrumentation.snapshot())
+        """
+        if BodyPartIndex.__instrumentation is not None:
+            raise ValueError('Instrumentation is already enabled')
+        instrumentation = Instrumentation(callback)
+        index_methods = {
+            name: timed_method(instrumentation, name, BodyPartIndex.__dict__[name], is_hit)
+            for (name, is_hit) in INSTRUMENTED_METHODS.items()
+        }
+        body_part_properties = {
+            name: TimedCachedProperty(instrumentation, f'BodyPart.{name}', BodyPart.__dict__[name])
+            for name in _CACHED_RELATIONSHIPS
+        }
+        BodyPartIndex.__uninstrumented = [
+            (BodyPartIndex, patch(BodyPartIndex, index_methods)),
+            (BodyPart, patch(BodyPart, body_part_properties)),
+        ]
+        BodyPartIndex.__instrumentation = instrumentation
+        return instrumentation
+
+    @staticmethod
+    def disable_instrumentation() -> Optional[Instrumentation]:
+        """Stop instrumentation, putting back the original methods (see enable_instrumentation()).
+
+        Returns:
+            Optional[Instrumentation]: The statistics collected (None if instrumentation was not
+                enabled)
+        """
+        instrumentation = BodyPartIndex.__instrumentation
+        for (owner, originals) in BodyPartIndex.__uninstrumented:
+            unpatch(owner, originals)
+        BodyPartIndex.__uninstrumented = []
+        BodyPartIndex.__instrumentation = None
+        return instrumentation
+
+    @staticmethod
+    def get_instrumentation() -> Optional[Instrumentation]:
+        """Get the statistics being collected, if instrumentation is enabled."""
+        return BodyPartIndex.__instrumentation
+
+    @classmethod
+    def refresh(
+        cls,
+        url: str = BODY_PART_INDEX_DATA_URL,
+        cache_directory: Optional[str] = None,
+        lazy: Optional[bool] = None,
+        frozen: Optional[bool] = None,
+        timeout: float = DEFAULT_TIMEOUT,
+    ) -> bool:
+        """Replace the singleton with an index of the latest data at a URL, if that data changed.
 
-    def _add_to_indices(self, body_part: BodyPart) -> None:
-        def add_to_text_index(text: str, body_part: BodyPart) -> None:
-            if text not in self.__text_index:
-                self.__text_index[text] = []
-            self.__text_index[text].append(body_part)
+        The data is fetched with fetch_data(), so it is only downloaded when the server reports a
+        new version, and the cached copy is used when the server cannot be reached. A new index is
+        built aside and then swapped in as the singleton in a single step: code that already holds
+        the old index (or its BodyParts) keeps using it undisturbed, while get_instance() returns
+        the new one from then on. Local codes and synonyms added to the old index are not carried
+        over.
 
+        Args:
+            url (str, optional): URL of the body part data. Defaults to BODY_PART_INDEX_DATA_URL.
+            cache_directory (str, optional): Directory for the downloaded data. Defaults to
+                default_cache_directory().
+            lazy (bool, optional): Whether the new index is lazy. Defaults to the setting of the
+                current singleton (or False).
+            frozen (bool, optional): Whether the new index is frozen. Defaults to the setting of the
+                current singleton (or False).
+            timeout (float, optional): Seconds to wait for the server. Defaults to DEFAULT_TIMEOUT.
+
+        Raises:
+            OSError: If the data can neither be downloaded nor found in the cache
+
+        Returns:
+            bool: True if a new index was swapped in, False if the singleton already had this data
+        """
+        current = cls.__the_instance
+        cached_data = fetch_data(url, cache_directory, timeout)
+        data_source = (url, cached_data.validator)
+        if current is not None and current.__data_source == data_source:
+            return False
+        cls._build_and_swap_in(
+            cached_data.filename,
+            data_source,
+            lazy=lazy if lazy is not None else current is not None and current.is_lazy,
+            frozen=frozen if frozen is not None else current is not None and current.is_frozen,
+        )
+        return True
+
+    @classmethod
+    def _build_and_swap_in(
+        cls,
+        json_filename: str,
+        data_source: Optional[Tuple[str, str]],
+        lazy: bool,
+        frozen: bool,
+    ) -> 'BodyPartIndex':
+        index = cls.__new__(cls)
+        index._load(
+            json_data=None,
+            json_filename=json_filename,
+            snapshot_filename=None,
+            lazy=lazy,
+            frozen=frozen,
+        )
+        index.__data_source = data_source
+        # Assigning the class attribute is atomic, so every reader sees either index in full
+        cls.__the_instance = index
+        return index
+
+    @classmethod
+    def refresh_in_background(cls, **kwargs: Any) -> 'Future[bool]':
+        """Run refresh() in a background thread, so a running service can keep using the index.
+
+        Args:
+            **kwargs: Arguments for refresh()
+
+        Returns:
+            Future[bool]: Result of refresh() (or the exception it raised), once it is done
+        """
+        from concurrent.futures import Future  # pylint: disable=import-outside-toplevel
+
+        future: 'Future[bool]' = Future()
+
+        def run() -> None:
+            if future.set_running_or_notify_cancel():
+                try:
+                    future.set_result(cls.refresh(**kwargs))
+                except BaseException as error:  # pylint: disable=broad-except
+                    future.set_exception(error)
+
+        threading.Thread(target=run, name='BodyPartIndex.refresh', daemon=True).start()
+        return future
+
+    @classmethod
+    async def aload(
+        cls,
+        url: Optional[str] = None,
+        path: Optional[str] = None,
+        cache_directory: Optional[str] = None,
+        lazy: bool = False,
+        frozen: bool = False,
+        timeout: float = DEFAULT_TIMEOUT,
+        executor: Optional['Executor'] = None,
+    ) -> 'BodyPartIndex':
+        """Load an index from a URL or a JSON file without blocking the event loop.
+
+        Both the download (with fetch_data(), as in refresh()) and the building of the index run in
+        an executor, so the event loop keeps serving other tasks meanwhile. As with refresh(), the
+        new index replaces the singleton in a single step once it is complete, and loading a URL
+        whose data has not changed returns the current singleton without building anything.
+
+        Args:
+            url (str, optional): URL of the body part data. Defaults to BODY_PART_INDEX_DATA_URL
+                if no path is given either.
+            path (str, optional): Name of a JSON file with body part data
+            cache_directory (str, optional): Directory for the downloaded data. Defaults to
+                default_cache_directory().
+            lazy (bool, optional): Whether the index is lazy (see BodyPartIndex()). Defaults to
+                False.
+            frozen (bool, optional): Whether the index is frozen (see freeze()). Defaults to False.
+            timeout (float, optional): Seconds to wait for the server. Defaults to DEFAULT_TIMEOUT.
+            executor (Executor, optional): Executor to run in. Defaults to the event loop's default
+                executor.
+
+        Raises:
+            ValueError: If both a URL and a path are given, or both lazy and frozen are requested
+            OSError: If the data can neither be read nor downloaded (or found in the cache)
+
+        Returns:
+            BodyPartIndex: The new singleton instance
+        """
+        if url is not None and path is not None:
+            raise ValueError('Load an index from either a URL or a path, not both')
+        if lazy and frozen:
+            raise ValueError('A lazy index creates BodyParts on use, so it cannot be frozen')
+        import asyncio  # pylint: disable=import-outside-toplevel
+
+        loop = asyncio.get_running_loop()
+        data_source: Optional[Tuple[str, str]] = None
+        if path is None:
+            url = url if url is not None else BODY_PART_INDEX_DATA_URL
+            cached_data = await loop.run_in_executor(
+                executor, fetch_data, url, cache_directory, timeout
+            )
+            data_source = (url, cached_data.validator)
+            current = cls.__the_instance
+            if current is not None and current.__data_source == data_source:
+                return current
+            path = cached_data.filename
+        return await loop.run_in_executor(
+            executor, cls._build_and_swap_in, path, data_source, lazy, frozen
+        )
+
+    def _initialize_from_packaged_json(self, lazy: bool) -> None:
+        with importlib.resources.open_text('body_part_index.data', 'body_parts.json') as json_file:
+            self._initialize_from_json_file(json_file, lazy)
+
+    def _initialize_from_default_snapshot(self, lazy: bool) -> bool:
+        # Returns whether the snapshot was used (rather than the packaged JSON)
+        try:
+            snapshot = self._run_phase('parse', read_snapshot, DEFAULT_SNAPSHOT_FILENAME)
+            self._initialize_from_snapshot(snapshot, lazy)
+            return True
+        except (OSError, ValueError, EOFError, KeyError, TypeError) as error:
+            log = logging.getLogger('body_part_index')
+            log.warning('Ignoring unreadable snapshot %s: %s', DEFAULT_SNAPSHOT_FILENAME, error)
+            self._initialize_from_packaged_json(lazy)
+            return False
+
+    def _create_indices(self, lazy: bool = False) -> None:
+        self.__version: Optional[str] = None
+        self.__integrity_problems: Optional[List[IntegrityProblem]] = None
+        # (URL, validator) of the data, when the index was built by refresh()
+        self.__data_source: Optional[Tuple[str, str]] = None
+        self.__frozen = False
+        self.__table: BodyPartTable = BodyPartTable()
+        # Materialized BodyParts by row: all of them, or (in lazy mode) those somebody still uses
+        self.__body_parts: Optional[List[BodyPart]] = None if lazy else []
+        self.__lazy_body_parts: 'weakref.WeakValueDictionary[int, BodyPart]' = (
+            weakref.WeakValueDictionary()
+        )
+        self.__code_index: Dict[Code, int] = {}
+        self.__code_text_index: Dict[str, int] = {}
+        # In lazy mode, the text, trigram, ranked and fuzzy indices are built on first use
+        self.__search_indexed = not lazy
+        # Row lists hardly ever hold more than one row, and a tuple is the smallest container
+        self.__text_index: Dict[str, Tuple[int, ...]] = {}
+        self.__trigram_index: TrigramIndex = TrigramIndex()
+        self.__inverted_index: InvertedIndex = InvertedIndex()
+        self.__fuzzy_index: DeletionIndex = DeletionIndex()
+        self.__fuzzy_terms: Dict[str, Tuple[int, ...]] = {}
+        self.__annotator: Optional[Annotator] = None
+        # Bitsets for query(), computed on first use
+        self.__facets: Optional[FacetIndex] = None
+        self.__children_index: RowGroups = RowGroups.from_pairs(0, ())
+        self.__part_of_children_index: RowGroups = RowGroups.from_pairs(0, ())
+        # First code of each system for every row (None where a row has none), for translate()
+        self.__crosswalk: Dict[str, List[Optional[str]]] = {}
+
+    def _add_to_indices(self, row: int) -> None:
+        table = self.__table
         # Harvest codes for code indices
-        for code in body_part.codes:
-            if code in self.__code_index:
-                log = logging.getLogger('body_part_index')
-                log.warning(
-                    'Duplicate BodyParts (%s, %s) with code %s',
-                    body_part,
-                    self.__code_index[code],
-                    code,
-                )
-            else:
-                self.__code_index[code] = body_part
-                if code.code in self.__code_text_index:
-                    log = logging.getLogger('body_part_index')
-                    log.warning(
-                        'Duplicate BodyParts (%s, %s) with code text %s',
-                        body_part,
-                        self.__code_text_index[code.code],
-                        code.code,
-                    )
-                self.__code_text_index[code.code] = body_part
+        for code in table.codes[row]:
+            self._add_to_code_indices(code, row)
+        if self.__search_indexed:
+            self._add_to_search_indices(row)
+        self._add_to_crosswalk(row)
+
+    def _add_to_search_indices(self, row: int) -> None:
+        table = self.__table
         # Harvest text for text indices
-        add_to_text_index(body_part.radlex_id, body_part)
-        add_to_text_index(body_part.description, body_part)
-        if body_part.synonyms and len(body_part.synonyms) > 0:
-            for synonym in body_part.synonyms:
-                add_to_text_index(synonym, body_part)
-        for code in body_part.codes:
-            add_to_text_index(code.code, body_part)
-
-    def _initialize(self, json_data: Dict) -> None:
-        self.__index: Dict[str, BodyPart] = {}
-        self.__code_index: Dict[Code, BodyPart] = {}
-        self.__code_text_index: Dict[str, BodyPart] = {}
-        self.__text_index: Dict[str, List[BodyPart]] = {}
-        for body_part_dict in json_data['bodyParts']:
-            (args, kwargs) = BodyPartData.params_from_json_dict(body_part_dict)
-            body_part: BodyPart = BodyPart(self, *args, **kwargs)
-            if id in self.__index:
-                raise Exception(f'Duplicate BodyPart with ID {id}')
-            self.__index[body_part.radlex_id] = body_part
-            self._add_to_indices(body_part)
-        # TODO: Sanity check for all references
-        # TODO: Sanity check that all body parts have a parent leading to WHOLE_BODY_ID
+        synonyms = table.synonyms[row] or ()
+        self._add_to_text_index(table.radlex_ids[row], row)
+        self._add_to_text_index(table.descriptions[row], row)
+        for synonym in synonyms:
+            self._add_to_text_index(synonym, row)
+        for code in table.codes[row]:
+            self._add_to_text_index(code.code, row)
+        # Harvest terms for fuzzy search
+        for term in [table.descriptions[row], *synonyms]:
+            self._add_to_fuzzy_index(term, row)
+        self._add_to_ranked_index(row)
+
+    def _build_search_indices(self) -> None:
+        # Build the indices a lazy index left out, from the table as it is now
+        if self.__search_indexed:
+            return
+        self.__search_indexed = True
+        for row in range(len(self.__table)):
+            self._add_to_search_indices(row)
+
+    def _add_to_crosswalk(self, row: int) -> None:
+        for code in self.__table.codes[row]:
+            column = self.__crosswalk.get(code.system)
+            if column is None:
+                column = self.__crosswalk[code.system] = []
+            if len(column) <= row:
+                column.extend([None] * (row + 1 - len(column)))
+            if column[row] is None:
+                column[row] = code.code
+
+    def _add_to_code_indices(self, code: Code, row: int) -> None:
+        table = self.__table
+        if code in self.__code_index:
+            log = logging.getLogger('body_part_index')
+            log.warning(
+                'Duplicate BodyParts (%s, %s) with code %s',
+                table.describe(row),
+                table.describe(self.__code_index[code]),
+                code,
+            )
+            return
+        self.__code_index[code] = row
+        if code.code in self.__code_text_index:
+            log = logging.getLogger('body_part_index')
+            log.warning(
+                'Duplicate BodyParts (%s, %s) with code text %s',
+                table.describe(row),
+                table.describe(self.__code_text_index[code.code]),
+                code.code,
+            )
+        self.__code_text_index[code.code] = row
+
+    def _add_to_text_index(self, text: str, row: int) -> None:
+        if text not in self.__text_index:
+            self.__text_index[text] = (row,)
+            self.__trigram_index.add(text)
+        elif row not in self.__text_index[text]:
+            self.__text_index[text] += (row,)
+
+    def _add_to_fuzzy_index(self, term: str, row: int) -> None:
+        normalized_term = normalize(term)
+        if normalized_term not in self.__fuzzy_terms:
+            self.__fuzzy_terms[normalized_term] = (row,)
+            self.__fuzzy_index.add(normalized_term)
+        elif row not in self.__fuzzy_terms[normalized_term]:
+            self.__fuzzy_terms[normalized_term] += (row,)
+
+    def _add_to_ranked_index(self, row: int) -> None:
+        table = self.__table
+        radlex_id = table.radlex_ids[row]
+        self.__inverted_index.add(radlex_id, table.descriptions[row], EXACT_DESCRIPTION_MATCH)
+        self.__inverted_index.add(radlex_id, radlex_id, EXACT_SYNONYM_MATCH)
+        for synonym in table.synonyms[row] or ():
+            self.__inverted_index.add(radlex_id, synonym, EXACT_SYNONYM_MATCH)
+        for code in table.codes[row]:
+            self.__inverted_index.add(radlex_id, code.code, EXACT_SYNONYM_MATCH)
+
+    def _remove_from_indices(self, row: int) -> None:
+        # Undo everything _add_to_indices() did for the row
+        table = self.__table
+        radlex_id = table.radlex_ids[row]
+        synonyms = table.synonyms[row] or ()
+        for code in table.codes[row]:
+            if self.__code_index.get(code) == row:
+                del self.__code_index[code]
+            if self.__code_text_index.get(code.code) == row:
+                del self.__code_text_index[code.code]
+        if self.__search_indexed:
+            code_texts = [code.code for code in table.codes[row]]
+            for text in [radlex_id, table.descriptions[row], *synonyms, *code_texts]:
+                self._remove_from_text_index(text, row)
+            for term in [table.descriptions[row], *synonyms]:
+                self._remove_from_fuzzy_index(term, row)
+            self.__inverted_index.remove(
+                radlex_id, [radlex_id, table.descriptions[row], *synonyms, *code_texts]
+            )
+        for column in self.__crosswalk.values():
+            if row < len(column):
+                column[row] = None
+
+    def _remove_from_text_index(self, text: str, row: int) -> None:
+        rows = self.__text_index.get(text)
+        if rows is None or row not in rows:
+            return
+        if len(rows) == 1:
+            del self.__text_index[text]
+            self.__trigram_index.discard(text)
+        else:
+            self.__text_index[text] = tuple(other for other in rows if other != row)
+
+    def _remove_from_fuzzy_index(self, term: str, row: int) -> None:
+        normalized_term = normalize(term)
+        rows = self.__fuzzy_terms.get(normalized_term)
+        if rows is None or row not in rows:
+            return
+        if len(rows) == 1:
+            del self.__fuzzy_terms[normalized_term]
+            self.__fuzzy_index.discard(normalized_term)
+        else:
+            self.__fuzzy_terms[normalized_term] = tuple(other for other in rows if other != row)
+
+    def _build_child_indices(self) -> None:
+        table = self.__table
+        rows = table.rows
+
+        def child_pairs(parent_ids: Sequence[Optional[str]]) -> Iterable[Tuple[int, int]]:
+            for (row, parent_id) in enumerate(parent_ids):
+                # The whole body is its own container, so it is not its own child
+                if parent_id in rows and parent_id != table.radlex_ids[row]:
+                    yield (rows[parent_id], row)
+
+        row_count = len(table)
+        self.__children_index = RowGroups.from_pairs(row_count, child_pairs(table.contained_by_ids))
+        self.__part_of_children_index = RowGroups.from_pairs(
+            row_count, child_pairs(table.part_of_ids)
+        )
+
+    def _build_hierarchy(self) -> None:
+        table = self.__table
+        self.__hierarchy = ContainmentHierarchy(
+            {radlex_id: table.contained_by_ids[row] for (radlex_id, row) in table.rows.items()}
+        )
+
+    def _materialize_body_parts(self) -> None:
+        if self.__body_parts is not None:
+            self.__body_parts = [
+                BodyPart(self, *self.__table.fields(row)) for row in range(len(self.__table))
+            ]
+
+    def _add_body_parts(self, body_part_dicts: Iterable[Dict]) -> None:
+        if BodyPartIndex.__instrumentation is not None:
+            self._add_body_parts_timed(body_part_dicts, BodyPartIndex.__instrumentation)
+            return
+        for body_part_dict in body_part_dicts:
+            self._add_to_indices(self._append_body_part(body_part_dict))
+
+    def _add_body_parts_timed(
+        self, body_part_dicts: Iterable[Dict], instrumentation: Instrumentation
+    ) -> None:
+        # Like _add_body_parts(), but adding up the time spent parsing (when the body parts come
+        # from a stream), adding them to the table and indexing them
+        clock = time.perf_counter
+        (parse_seconds, construct_seconds, index_seconds) = (0.0, 0.0, 0.0)
+        body_part_dicts = iter(body_part_dicts)
+        while True:
+            start = clock()
+            body_part_dict = next(body_part_dicts, None)
+            parsed = clock()
+            parse_seconds += parsed - start
+            if body_part_dict is None:
+                break
+            row = self._append_body_part(body_part_dict)
+            constructed = clock()
+            self._add_to_indices(row)
+            construct_seconds += constructed - parsed
+            index_seconds += clock() - constructed
+        instrumentation.record_phase('parse', parse_seconds)
+        instrumentation.record_phase('construct', construct_seconds)
+        instrumentation.record_phase('index', index_seconds)
+
+    def _append_body_part(self, body_part_dict: Dict) -> int:
+        (args, kwargs) = BodyPartData.params_from_json_dict(body_part_dict)
+        (radlex_id, description, contained_by_id) = args
+        if radlex_id in self.__table.rows:
+            raise Exception(f'Duplicate BodyPart with ID {radlex_id}')
+        return self.__table.append(radlex_id, description, contained_by_id, **kwargs)
+
+    def _finish_indices(self) -> None:
+        self._run_phase('index', self._build_child_indices)
+        self._run_phase('index', self._build_hierarchy)
+        self._run_phase('construct', self._materialize_body_parts)
+
+    def _initialize(self, json_data: Dict, lazy: bool = False) -> None:
+        self._create_indices(lazy)
+        self.__version = json_data.get('$version')
+        self._add_body_parts(json_data['bodyParts'])
+        self._finish_indices()
+
+    def _initialize_from_json_file(self, json_file: TextIO, lazy: bool = False) -> None:
+        # Each body part goes into the indices as soon as it is parsed, so the whole JSON document
+        # is never in memory at once
+        self._create_indices(lazy)
+        stream = BodyPartStream(json_file)
+        self._add_body_parts(stream)
+        self.__version = stream.header.get('$version')
+        self._finish_indices()
+
+    def _initialize_from_snapshot(self, snapshot: Dict, lazy: bool = False) -> None:
+        self._create_indices(lazy)
+        self.__version = snapshot['version']
+        self.__table = self._run_phase('construct', BodyPartTable.from_columns, snapshot['columns'])
+        self._run_phase('index', self._load_snapshot_indices, snapshot)
+        self._run_phase('construct', self._materialize_body_parts)
+
+    def _load_snapshot_indices(self, snapshot: Dict) -> None:
+        for row in range(len(self.__table)):
+            self._add_to_crosswalk(row)
+        self.__code_index = {
+            Code(system, code): row for (system, code, row) in snapshot['code_index']
+        }
+        self.__code_text_index = snapshot['code_text_index']
+        if self.__search_indexed:
+            for row in range(len(self.__table)):
+                self._add_to_ranked_index(row)
+            self.__text_index = snapshot['text_index']
+            self.__trigram_index.update(self.__text_index)
+            self.__fuzzy_terms = snapshot['fuzzy_terms']
+            self.__fuzzy_index.update(self.__fuzzy_terms)
+        self.__children_index = RowGroups.from_bytes(*snapshot['children_index'])
+        self.__part_of_children_index = RowGroups.from_bytes(*snapshot['part_of_children_index'])
+        self.__hierarchy = ContainmentHierarchy.from_arrays(*snapshot['hierarchy'])
+
+    def _to_snapshot(self) -> Dict:
+        self._build_search_indices()
+        return {
+            'version': self.__version,
+            'columns': self.__table.to_columns(),
+            'code_index': [(code.system, code.code, row) for (code, row) in self.__code_index.items()],
+            'code_text_index': self.__code_text_index,
+            'text_index': self.__text_index,
+            'fuzzy_terms': self.__fuzzy_terms,
+            'children_index': self.__children_index.to_bytes(),
+            'part_of_children_index': self.__part_of_children_index.to_bytes(),
+            'hierarchy': self.__hierarchy.to_arrays(),
+        }
+
+    def save_snapshot(self, snapshot_filename: str, json_filename: Optional[str] = None) -> None:
+        """Save the index, with all its lookup tables already built, to a binary snapshot file.
+
+        Loading a snapshot (see from_snapshot()) is much faster than parsing and indexing the JSON
+        data, so snapshots are meant to be generated once (e.g., at packaging time) and loaded by
+        every process that needs the index.
+
+        Args:
+            snapshot_filename (str): Name of the file to write
+            json_filename (str, optional): Name of the JSON file the index was built from, whose
+                digest is recorded in the snapshot; BodyPartIndex() only uses the packaged snapshot
+                if it records the digest of the packaged JSON file
+        """
+        write_snapshot(snapshot_filename, self._to_snapshot(), json_filename)
+
+    def save_shared_index(self, filename: str) -> None:
+        """Save the index in a binary layout that SharedBodyPartIndex uses in place, via mmap.
+
+        Unlike a snapshot, the file is never loaded into Python objects: every process that opens
+        it with SharedBodyPartIndex maps the same pages, so a pool of workers shares one copy of the
+        index and starts up immediately.
+
+        Args:
+            filename (str): Name of the file to write (e.g., on /dev/shm)
+        """
+        write_shared_index(filename, self._to_snapshot())
+
+    @classmethod
+    def from_snapshot(
+        cls,
+        snapshot_filename: str,
+        lazy: bool = False,
+        frozen: bool = False,
+        trusted: bool = True,
+    ) -> 'BodyPartIndex':
+        """Create the BodyPartIndex singleton from a snapshot written by save_snapshot().
+
+        Args:
+            snapshot_filename (str): Name of the snapshot file
+            lazy (bool, optional): Only create BodyPart objects when they are used (see
+                BodyPartIndex()). Defaults to False.
+            frozen (bool, optional): Compute everything up front for lock-free reads from many
+                threads (see freeze()). Defaults to False.
+            trusted (bool, optional): Skip checking the references between the body parts again
+                (see check_integrity()). Defaults to True.
+
+        Raises:
+            Exception: If the singleton has already been initialized
+            ValueError: If the file is not a snapshot in a format this version can read, or both
+                lazy and frozen are requested
+
+        Returns:
+            BodyPartIndex: The singleton instance of BodyPartIndex
+        """
+        return cls(snapshot_filename=snapshot_filename, lazy=lazy, frozen=frozen, trusted=trusted)
+
+    def check_integrity(self) -> List[IntegrityProblem]:
+        """Check the references between the body parts, logging a warning for each problem.
+
+        This looks for references to missing body parts (in contained_by_id, part_of_id, left_id,
+        right_id and unsided_id), cycles of contained_by_id or part_of_id references, and body
+        parts that are not contained (directly or indirectly) by the whole body, in a single pass
+        over the body parts. It is done while loading JSON data, unless the index is trusted.
+
+        Returns:
+            List[IntegrityProblem]: Problems found (empty if none)
+        """
+        problems = find_problems(self.__table)
+        log = logging.getLogger('body_part_index')
+        for problem in problems:
+            log.warning('Integrity problem (%s) in body part data: %s', problem.kind, problem)
+        self.__integrity_problems = problems
+        return problems
+
+    @property
+    def integrity_problems(self) -> Optional[List[IntegrityProblem]]:
+        """List[IntegrityProblem]: Problems found by the last check_integrity() (None if not run)"""
+        return self.__integrity_problems
+
+    def freeze(self) -> None:
+        """Compute everything that is otherwise computed on first use, making all reads read-only.
+
+        This builds the search postings, the annotator and the facet bitsets of query(), and fills
+        in the cached links of every BodyPart (contained_by, part_of, left, right, unsided and
+        snomed_code); children, descendants and ancestors are always computed from tables that
+        never change after loading.
+        Afterwards, no lookup writes to the index or its BodyParts, so any number of threads can
+        share it without locks. Freezing an index twice has no effect.
+
+        Raises:
+            ValueError: If the index is lazy (it creates BodyParts as they are used)
+        """
+        if self.__frozen:
+            return
+        if self.__body_parts is None:
+            raise ValueError('A lazy index creates BodyParts on use, so it cannot be frozen')
+        self._build_search_indices()
+        self.__trigram_index.index_pending()
+        self.__inverted_index.index_pending()
+        self.__fuzzy_index.index_pending()
+        self.get_annotator()
+        self._facet_index()
+        for body_part in self.__body_parts:
+            body_part._precompute_relationships()  # pylint: disable=protected-access
+        self.__frozen = True
+
+    @property
+    def version(self) -> Optional[str]:
+        """str: Version of the body part data (the "$version" of the JSON data), if known."""
+        return self.__version
+
+    def _row_for_update(self, radlex_id: str) -> int:
+        if self.__frozen:
+            raise ValueError('A frozen index cannot be changed')
+        if radlex_id not in self.__table.rows:
+            raise Exception(f'No BodyPart with ID {radlex_id}')
+        return self.__table.rows[radlex_id]
+
+    def _materialized_body_parts(self, rows: Iterable[int]) -> List[BodyPart]:
+        if self.__body_parts is not None:
+            return [self.__body_parts[row] for row in rows]
+        return [body_part for body_part in map(self.__lazy_body_parts.get, rows) if body_part]
+
+    def add_local_code(self, radlex_id: str, code: Code) -> bool:
+        """Add a (typically institution-specific) code to a BodyPart.
+
+        The code can be used with get_by_code(), get() and the searches right away. Only the lookup
+        tables and cached values that involve the code are updated, so the cost does not depend on
+        the size of the index.
+
+        Args:
+            radlex_id (str): RadLex ID of the BodyPart to add the code to
+            code (Code): Code to add (e.g., Code('LOCAL', 'THX1138')); adding a code the BodyPart
+                already has has no effect
+
+        Raises:
+            Exception: If no BodyPart with the given ID is found
+            ValueError: If the code already belongs to another BodyPart, or the index is frozen
+
+        Returns:
+            bool: Whether the code was added (False if the BodyPart already had it)
+        """
+        row = self._row_for_update(radlex_id)
+        table = self.__table
+        code = table.share_code(Code(*code))
+        existing_row = self.__code_index.get(code)
+        if existing_row == row:
+            return False
+        if existing_row is not None:
+            raise ValueError(f'{code} already belongs to {table.describe(existing_row)}')
+        table.codes[row].append(code)
+        self._add_to_code_indices(code, row)
+        self._add_to_crosswalk(row)
+        if self.__search_indexed:
+            self._add_to_text_index(code.code, row)
+            self.__inverted_index.add(radlex_id, code.code, EXACT_SYNONYM_MATCH)
+        if self.__facets is not None:
+            self.__facets.add_code(row, code.system)
+        if code.system == 'SNOMED':
+            # snomed_code falls back on the unsided version and the container, so the sided
+            # versions and children of the BodyPart may now find a different code
+            related_rows = [row, *self.__children_index[row]]
+            related_rows += [
+                table.rows[sided_id]
+                for sided_id in (table.left_ids[row], table.right_ids[row])
+                if sided_id in table.rows
+            ]
+            for body_part in self._materialized_body_parts(related_rows):
+                BodyPart.snomed_code.reset(body_part)
+        return True
+
+    def add_synonym(self, radlex_id: str, synonym: str) -> bool:
+        """Add a (typically local) synonym to a BodyPart.
+
+        The synonym can be found with the searches and the annotator right away. Only the lookup
+        tables involving the synonym are updated, except for the annotator, which is compiled again
+        the next time it is used.
+
+        Args:
+            radlex_id (str): RadLex ID of the BodyPart to add the synonym to
+            synonym (str): Synonym to add; adding a synonym the BodyPart already has has no effect
+
+        Raises:
+            Exception: If no BodyPart with the given ID is found
+            ValueError: If the index is frozen
+
+        Returns:
+            bool: Whether the synonym was added (False if the BodyPart already had it)
+        """
+        row = self._row_for_update(radlex_id)
+        table = self.__table
+        synonyms = table.synonyms[row]
+        if synonyms is not None and synonym in synonyms:
+            return False
+        if synonyms is None:
+            synonyms = table.synonyms[row] = []
+            # BodyParts share the list with the table, so only those without synonyms need it
+            for body_part in self._materialized_body_parts([row]):
+                object.__setattr__(body_part, 'synonyms', synonyms)
+        synonyms.append(synonym)
+        if self.__search_indexed:
+            self._add_to_text_index(synonym, row)
+            self._add_to_fuzzy_index(synonym, row)
+            self.__inverted_index.add(radlex_id, synonym, EXACT_SYNONYM_MATCH)
+        self.__annotator = None
+        return True
+
+    def load_overlay(self, overlay_filename: str) -> int:
+        """Add the local codes and synonyms listed in a JSON file.
+
+        The file has the format of the body part data, but each entry only needs a "radlexId" and
+        the "codes" and/or "synonyms" to add, e.g.
+        {"bodyParts": [{"radlexId": "RID294", "codes": [{"system": "LOCAL", "code": "THX1138"}]}]}.
+        It is read one entry at a time (see BodyPartStream), so it can be of any size.
+
+        Args:
+            overlay_filename (str): Name of the JSON file
+
+        Raises:
+            Exception: If an entry refers to a BodyPart that is not in the index
+            ValueError: If the file is not valid, a code already belongs to another BodyPart, or
+                the index is frozen
+
+        Returns:
+            int: Number of codes and synonyms added (not counting those the BodyParts already had)
+        """
+        added = 0
+        with open(overlay_filename, encoding='utf-8') as overlay_file:
+            for entry in BodyPartStream(overlay_file):
+                if 'radlexId' not in entry:
+                    raise ValueError(f'Overlay entry without a radlexId in {overlay_filename}')
+                radlex_id = entry['radlexId']
+                for code_dict in entry.get('codes') or ():
+                    added += self.add_local_code(radlex_id, Code(**code_dict))
+                for synonym in entry.get('synonyms') or ():
+                    added += self.add_synonym(radlex_id, synonym)
+        return added
+
+    def apply_delta(self, delta: Dict) -> int:
+        """Update the index to a later version of the data, given the delta between the versions.
+
+        Only the body parts in the delta are re-indexed; the containment tables (children and the
+        hierarchy of descendants and ancestors) are rebuilt from the table of fields, without
+        parsing anything, if body parts were added or removed or moved to another container.
+        Changed BodyParts are updated in place, so references to them stay valid. Their cached
+        links, and those of the BodyParts linking to a changed or removed BodyPart (children, sided
+        versions, parts), are computed again the next time they are used; all other cached values
+        are kept. BodyParts that were removed should no longer be used.
+
+        Args:
+            delta (Dict): Delta from the version of this index (see body_part_index.delta)
+
+        Raises:
+            ValueError: If the delta is not valid, is from another version, adds a body part that
+                is already there, or the index is frozen
+            Exception: If the delta removes or changes a body part that is not in the index
+
+        Returns:
+            int: Number of body parts added, removed or changed
+        """
+        if self.__frozen:
+            raise ValueError('A frozen index cannot be changed')
+        check_delta(delta)
+        from_version = delta.get('fromVersion')
+        if from_version != self.__version:
+            raise ValueError(f'Delta from version {from_version} for version {self.__version}')
+        table = self.__table
+        # Check everything first, so that a delta that does not fit leaves the index as it was
+        for radlex_id in [*delta['removed'], *(change['radlexId'] for change in delta['changed'])]:
+            self._row_for_update(radlex_id)
+        for body_part_dict in delta['added']:
+            if body_part_dict['radlexId'] in table.rows:
+                raise ValueError(f"Duplicate BodyPart with ID {body_part_dict['radlexId']}")
+        new_body_part_dicts = [
+            apply_change(table.to_json_dict(table.rows[change['radlexId']]), change)
+            for change in delta['changed']
+        ]
+
+        # BodyParts whose cached links may lead to a changed or removed BodyPart, before and after
+        touched_ids = set(delta['removed']).union(change['radlexId'] for change in delta['changed'])
+        stale_rows = self._linked_rows(touched_ids)
+        structure_changed = bool(delta['added'] or delta['removed']) or any(
+            'containedById' in change or 'partOfId' in change for change in delta['changed']
+        )
+        for body_part_dict in new_body_part_dicts:
+            row = table.rows[body_part_dict['radlexId']]
+            self._remove_from_indices(row)
+            ((radlex_id, description, contained_by_id), kwargs) = (
+                BodyPartData.params_from_json_dict(body_part_dict)
+            )
+            table.replace(row, radlex_id, description, contained_by_id, **kwargs)
+            self._add_to_indices(row)
+            for body_part in self._materialized_body_parts([row]):
+                for (name, value) in zip(COLUMNS, table.fields(row)):
+                    object.__setattr__(body_part, name, value)
+        stale_body_parts = self._materialized_body_parts(stale_rows)
+        for radlex_id in delta['removed']:
+            self._remove_row(table.rows[radlex_id])
+        self._add_body_parts(delta['added'])
+        if self.__body_parts is not None:
+            self.__body_parts.extend(
+                BodyPart(self, *table.fields(row))
+                for row in range(len(self.__body_parts), len(table))
+            )
+        if structure_changed:
+            self._build_child_indices()
+            self._build_hierarchy()
+        stale_body_parts += self._materialized_body_parts(self._linked_rows(touched_ids))
+        for body_part in stale_body_parts:
+            body_part._forget_relationships()  # pylint: disable=protected-access
+        self.__annotator = None
+        self.__facets = None
+        self.__version = delta.get('toVersion')
+        return len(delta['added']) + len(delta['removed']) + len(delta['changed'])
+
+    def _linked_rows(self, radlex_ids: Iterable[str]) -> Set[int]:
+        """Get the rows of the given body parts and of those whose links lead to them."""
+        table = self.__table
+        linked_rows: Set[int] = set()
+        for radlex_id in radlex_ids:
+            row = table.rows.get(radlex_id)
+            if row is None:
+                continue
+            linked_rows.add(row)
+            linked_rows.update(self.__children_index[row])
+            linked_rows.update(self.__part_of_children_index[row])
+            for sided_id in (table.left_ids[row], table.right_ids[row], table.unsided_ids[row]):
+                if sided_id in table.rows:
+                    linked_rows.add(table.rows[sided_id])
+        return linked_rows
+
+    def _remove_row(self, row: int) -> None:
+        # The last row moves into the place of the removed one, so only it needs re-indexing
+        table = self.__table
+        last_row = len(table) - 1
+        self._remove_from_indices(row)
+        if row != last_row:
+            self._remove_from_indices(last_row)
+        table.remove(row)
+        if row != last_row:
+            self._add_to_indices(row)
+        if self.__body_parts is not None:
+            self.__body_parts[row] = self.__body_parts[last_row]
+            self.__body_parts.pop()
+        else:
+            self.__lazy_body_parts.pop(row, None)
+            moved_body_part = self.__lazy_body_parts.pop(last_row, None)
+            if moved_body_part is not None and row != last_row:
+                self.__lazy_body_parts[row] = moved_body_part
+
+    @property
+    def is_frozen(self) -> bool:
+        """bool: Whether everything has been computed up front for lock-free reads."""
+        return self.__frozen
+
+    @property
+    def is_lazy(self) -> bool:
+        """bool: Whether BodyPart objects are only created when they are used."""
+        return self.__body_parts is None
+
+    def memory_footprint(self) -> Dict[str, int]:
+        """Estimate the memory used by the index, in the style of sys.getsizeof().
+
+        Every object is counted once, under the first component that refers to it (e.g., strings
+        shared by the table and the text index are counted with the table).
+
+        Returns:
+            Dict[str, int]: Bytes used by each component of the index (e.g., "table", "body_parts",
+                "text_index"), and their sum as "total"
+        """
+        # BodyParts refer back to the index, which must not be counted again under each of them
+        seen = {id(self)}
+        footprint = {
+            name.rsplit('__', 1)[-1]: deep_sizeof(value, seen)
+            for (name, value) in vars(self).items()
+        }
+        footprint['total'] = sum(footprint.values())
+        return footprint
+
+    def _body_part(self, row: int) -> BodyPart:
+        if self.__body_parts is not None:
+            return self.__body_parts[row]
+        body_part = self.__lazy_body_parts.get(row)
+        if body_part is None:
+            body_part = BodyPart(self, *self.__table.fields(row))
+            self.__lazy_body_parts[row] = body_part
+        return body_part
+
+    def _body_parts(self, rows: Iterable[int]) -> List[BodyPart]:
+        if self.__body_parts is not None:
+            return list(map(self.__body_parts.__getitem__, rows))
+        return [self._body_part(row) for row in rows]
+
+    def _body_part_by_id(self, radlex_id: str) -> BodyPart:
+        return self._body_part(self.__table.rows[radlex_id])
 
     def get_all_body_parts(self) -> Iterable[BodyPart]:
         """Get all BodyParts in the index.
@@ -119,7 +1115,7 @@ class BodyPartIndex:
         Returns:
             Iterable[BodyPart]: All BodyParts in the index
         """
-        return list(self.__index.values())
+        return self._body_parts(self.__table.rows.values())
 
     def get_by_id(self, radlex_id: str) -> BodyPart:
         """Get BodyPart object by RadLex ID.
@@ -133,9 +1129,90 @@ class BodyPartIndex:
         Returns:
             BodyPart: BodyPart object with the given RadLex ID
         """
-        if radlex_id not in self.__index:
+        if radlex_id not in self.__table.rows:
             raise Exception(f'No BodyPart with ID {radlex_id}')
-        return self.__index[radlex_id]
+        return self._body_part_by_id(radlex_id)
+
+    def get_children(self, radlex_id: str) -> Iterable[BodyPart]:
+        """Get the BodyParts directly contained by the BodyPart with the given RadLex ID.
+
+        Args:
+            radlex_id (str): RadLex ID of the containing BodyPart
+
+        Returns:
+            Iterable[BodyPart]: BodyParts whose contained_by_id is the given ID (empty if none)
+        """
+        row = self.__table.rows.get(radlex_id)
+        if row is None:
+            return ()
+        return tuple(self._body_parts(self.__children_index[row]))
+
+    def get_part_of_children(self, radlex_id: str) -> Iterable[BodyPart]:
+        """Get the BodyParts that are directly part of the BodyPart with the given RadLex ID.
+
+        Args:
+            radlex_id (str): RadLex ID of the BodyPart in the part of hierarchy
+
+        Returns:
+            Iterable[BodyPart]: BodyParts whose part_of_id is the given ID (empty if none)
+        """
+        row = self.__table.rows.get(radlex_id)
+        if row is None:
+            return ()
+        return tuple(self._body_parts(self.__part_of_children_index[row]))
+
+    def get_descendants(self, radlex_id: str) -> Iterable[BodyPart]:
+        """Get all the BodyParts contained (directly or indirectly) by the BodyPart with the given ID.
+
+        Args:
+            radlex_id (str): RadLex ID of the containing BodyPart
+
+        Returns:
+            Iterable[BodyPart]: Descendants of the BodyPart, in pre-order (empty if none)
+        """
+        rows = self.__table.rows
+        descendant_ids = self.__hierarchy.descendant_ids(radlex_id)
+        return self._body_parts(rows[descendant_id] for descendant_id in descendant_ids)
+
+    def is_ancestor(self, ancestor_id: str, descendant_id: str) -> bool:
+        """Check if one BodyPart contains (directly or indirectly) another.
+
+        Args:
+            ancestor_id (str): RadLex ID of the possibly containing BodyPart
+            descendant_id (str): RadLex ID of the possibly contained BodyPart
+
+        Returns:
+            bool: True if the first BodyPart is a proper ancestor of the second, False otherwise
+        """
+        return self.__hierarchy.is_ancestor(ancestor_id, descendant_id)
+
+    def lowest_common_ancestor(self, *body_parts: BodyPart) -> Optional[BodyPart]:
+        """Get the most specific BodyPart that contains (or is) all of the given BodyParts.
+
+        Args:
+            *body_parts (BodyPart): BodyParts to find the common container for
+
+        Returns:
+            Optional[BodyPart]: Lowest common ancestor of the BodyParts (e.g., the abdomen for the
+                liver and the left kidney), or None if there is none
+        """
+        common_id = self.__hierarchy.lowest_common_ancestor(bp.radlex_id for bp in body_parts)
+        return self._body_part_by_id(common_id) if common_id is not None else None
+
+    def lowest_common_ancestors(
+        self, body_part_groups: Iterable[Iterable[BodyPart]]
+    ) -> List[Optional[BodyPart]]:
+        """Get the lowest common ancestor for each of many groups of BodyParts.
+
+        Args:
+            body_part_groups (Iterable[Iterable[BodyPart]]): Groups of BodyParts (e.g., the BodyParts
+                tagged in each exam)
+
+        Returns:
+            List[Optional[BodyPart]]: Lowest common ancestor of each group, in the same order (None for
+                groups without one)
+        """
+        return [self.lowest_common_ancestor(*group) for group in body_part_groups]
 
     def get_by_code(self, code: Code) -> Optional[BodyPart]:
         """Get BodyPart object by code.
@@ -147,7 +1224,7 @@ class BodyPartIndex:
             BodyPart: BodyPart object with the given code (or None if not found)
         """
         if code in self.__code_index:
-            return self.__code_index[code]
+            return self._body_part(self.__code_index[code])
         return None
 
     def get(self, code_text_or_id: str) -> Optional[BodyPart]:
@@ -159,12 +1236,153 @@ class BodyPartIndex:
         Returns:
             BodyPart: BodyPart object with the given code or ID
         """
-        if code_text_or_id in self.__index:
-            return self.__index[code_text_or_id]
+        if code_text_or_id in self.__table.rows:
+            return self._body_part_by_id(code_text_or_id)
         if code_text_or_id in self.__code_text_index:
-            return self.__code_text_index[code_text_or_id]
+            return self._body_part(self.__code_text_index[code_text_or_id])
         return None
 
+    def get_many(
+        self, codes_texts_or_ids: Iterable[str], default: Optional[BodyPart] = None
+    ) -> List[Optional[BodyPart]]:
+        """Get the BodyParts for many codes (without system) or IDs at once, like get().
+
+        Each distinct value is only looked up once, and misses cost no more than hits.
+
+        Args:
+            codes_texts_or_ids (Iterable[str]): Codes or IDs to look up; any iterable of strings,
+                including a NumPy array of strings
+            default (BodyPart, optional): Result for values that match no BodyPart. Defaults to None.
+
+        Returns:
+            List[Optional[BodyPart]]: BodyPart (or default) for each value, in the same order
+        """
+        rows = self.__table.rows
+        code_text_index = self.__code_text_index
+        values = _as_list(codes_texts_or_ids)
+        resolved: Dict[str, Optional[BodyPart]] = {}
+        for value in dict.fromkeys(values):
+            row = rows.get(value)
+            if row is None:
+                row = code_text_index.get(value)
+            resolved[value] = self._body_part(row) if row is not None else default
+        return [resolved[value] for value in values]
+
+    def get_by_codes(
+        self, codes: Iterable[Sequence[str]], default: Optional[BodyPart] = None
+    ) -> List[Optional[BodyPart]]:
+        """Get the BodyParts for many codes at once, like get_by_code().
+
+        Each distinct code is only looked up once, and misses cost no more than hits.
+
+        Args:
+            codes (Iterable[Sequence[str]]): Codes to look up, as Code objects or (system, code)
+                pairs; a NumPy array of strings with shape (n, 2) works too
+            default (BodyPart, optional): Result for codes that match no BodyPart. Defaults to None.
+
+        Returns:
+            List[Optional[BodyPart]]: BodyPart (or default) for each code, in the same order
+        """
+        code_index = self.__code_index
+        # Code is a NamedTuple, so plain (system, code) tuples find the same entries
+        keys = [tuple(map(_decode, code)) for code in _as_list(codes)]
+        resolved: Dict[Tuple[str, ...], Optional[BodyPart]] = {}
+        for key in dict.fromkeys(keys):
+            row = code_index.get(key)  # type: ignore[call-overload]
+            resolved[key] = self._body_part(row) if row is not None else default
+        return [resolved[key] for key in keys]
+
+    @property
+    def code_systems(self) -> List[str]:
+        """List[str]: Code systems (e.g., 'FMA' and 'SNOMED') of the codes in the index, sorted"""
+        return sorted(system for (system, column) in self.__crosswalk.items() if any(column))
+
+    def translate(
+        self,
+        codes: Iterable[Any],
+        target_system: str,
+        source_system: Optional[str] = None,
+        default: Optional[str] = None,
+    ) -> List[Optional[str]]:
+        """Translate many codes into another code system at once.
+
+        Each code is looked up like with get_by_code(), and translated to the first code in the
+        target system of the BodyPart it belongs to (as snomed_code does for SNOMED, but without
+        falling back on related BodyParts). The translations come from a table built at load time,
+        so each distinct code costs two dict/list lookups. Use RADLEX as a system for RadLex IDs.
+
+        Args:
+            codes (Iterable): Codes to translate: Code objects or (system, code) pairs, or just
+                code strings if source_system is given; any iterable (e.g., a column of a table)
+                works, including a NumPy array
+            target_system (str): Code system to translate to (e.g., 'SNOMED', or RADLEX)
+            source_system (str, optional): Code system of all the codes, when they are strings
+            default (str, optional): Result for codes that are not found or have no translation.
+                Defaults to None.
+
+        Returns:
+            List[Optional[str]]: Translated code (or default) for each code, in the same order
+        """
+        table = self.__table
+        code_index = self.__code_index
+        target_column: Sequence[Optional[str]] = (
+            table.radlex_ids if target_system == RADLEX else self.__crosswalk.get(target_system, ())
+        )
+        values = _as_list(codes)
+        if source_system is None:
+            keys = [tuple(map(_decode, code)) for code in values]
+        else:
+            keys = [(source_system, _decode(code)) for code in values]
+        translations: Dict[Tuple[str, ...], Optional[str]] = {}
+        for key in dict.fromkeys(keys):
+            (system, code) = key
+            row = table.rows.get(code) if system == RADLEX else code_index.get(key)  # type: ignore
+            translation = None
+            if row is not None and row < len(target_column):
+                translation = target_column[row]
+            translations[key] = translation if translation is not None else default
+        return [translations[key] for key in keys]
+
+    def crosswalk_table(
+        self, systems: Optional[Sequence[str]] = None
+    ) -> Dict[str, List[Optional[str]]]:
+        """Get the crosswalk between code systems as columns, one row per BodyPart.
+
+        The RADLEX column holds the RadLex IDs, and the other columns the first code of each
+        BodyPart in that system (or None). pandas.DataFrame(index.crosswalk_table()) turns it into
+        a data frame for joins.
+
+        Args:
+            systems (Sequence[str], optional): Code systems to include, in order. Defaults to
+                code_systems.
+
+        Returns:
+            Dict[str, List[Optional[str]]]: Column of codes for RADLEX and each system
+        """
+        row_count = len(self.__table)
+        table: Dict[str, List[Optional[str]]] = {RADLEX: list(self.__table.radlex_ids)}
+        for system in self.code_systems if systems is None else systems:
+            column = self.__crosswalk.get(system, [])[:row_count]
+            table[system] = column + [None] * (row_count - len(column))
+        return table
+
+    def save_crosswalk(self, filename: str, systems: Optional[Sequence[str]] = None) -> None:
+        """Write the crosswalk between code systems to a CSV file (see crosswalk_table()).
+
+        The file has a header row with the system names, and empty fields for missing codes, so it
+        can be loaded into a database table (e.g., with COPY ... CSV HEADER) or read by pandas.
+
+        Args:
+            filename (str): Name of the CSV file
+            systems (Sequence[str], optional): Code systems to include, in order. Defaults to
+                code_systems.
+        """
+        table = self.crosswalk_table(systems)
+        with open(filename, 'w', encoding='utf-8', newline='') as csv_file:
+            writer = csv.writer(csv_file)
+            writer.writerow(table)
+            writer.writerows(zip(*table.values()))
+
     def search(self, query: str) -> Iterable[BodyPart]:
         """Search for BodyParts by query.
 
@@ -174,9 +1392,241 @@ class BodyPartIndex:
         Returns:
             Iterable[BodyPart]: BodyParts matching the query
         """
-        # Look for partial matches
-        results: Set[BodyPart] = set()
-        for text, body_parts in self.__text_index.items():
-            if query in text:
-                results.update(body_parts)
-        return results
+        return set(self._body_parts(self._search_rows(query)))
+
+    def _search_rows(self, query: str) -> Set[int]:
+        self._build_search_indices()
+        # Look for partial matches among the texts sharing the query's trigrams
+        rows: Set[int] = set()
+        for text in self.__trigram_index.find(query):
+            rows.update(self.__text_index[text])
+        return rows
+
+    def search_many(self, queries: Iterable[str]) -> List[Set[BodyPart]]:
+        """Search for BodyParts with many queries at once, like search().
+
+        Args:
+            queries (Iterable[str]): Queries to search for; any iterable of strings, including a
+                NumPy array of strings
+
+        Returns:
+            List[Set[BodyPart]]: BodyParts matching each query (an empty set if none), in the same
+                order; repeated queries share the same set
+        """
+        queries = _as_list(queries)
+        results = {query: set(self.search(query)) for query in dict.fromkeys(queries)}
+        return [results[query] for query in queries]
+
+    async def aget_many(
+        self,
+        codes_texts_or_ids: Iterable[str],
+        default: Optional[BodyPart] = None,
+        chunk_size: int = DEFAULT_ASYNC_CHUNK_SIZE,
+    ) -> List[Optional[BodyPart]]:
+        """Like get_many(), but letting other tasks run every chunk_size values.
+
+        The lookups run on the event loop itself (so the index needs no locks), a chunk at a time,
+        so even a batch of millions of values never stalls the loop for long.
+
+        Args:
+            codes_texts_or_ids (Iterable[str]): Codes or IDs to look up
+            default (BodyPart, optional): Result for values that match no BodyPart. Defaults to None.
+            chunk_size (int, optional): Number of values to look up between yields to the event
+                loop. Defaults to DEFAULT_ASYNC_CHUNK_SIZE.
+
+        Returns:
+            List[Optional[BodyPart]]: BodyPart (or default) for each value, in the same order
+        """
+        return await _in_chunks(
+            lambda chunk: self.get_many(chunk, default), _as_list(codes_texts_or_ids), chunk_size
+        )
+
+    async def aget_by_codes(
+        self,
+        codes: Iterable[Sequence[str]],
+        default: Optional[BodyPart] = None,
+        chunk_size: int = DEFAULT_ASYNC_CHUNK_SIZE,
+    ) -> List[Optional[BodyPart]]:
+        """Like get_by_codes(), but letting other tasks run every chunk_size codes.
+
+        Args:
+            codes (Iterable[Sequence[str]]): Codes to look up, as Code objects or (system, code)
+                pairs
+            default (BodyPart, optional): Result for codes that match no BodyPart. Defaults to None.
+            chunk_size (int, optional): Number of codes to look up between yields to the event
+                loop. Defaults to DEFAULT_ASYNC_CHUNK_SIZE.
+
+        Returns:
+            List[Optional[BodyPart]]: BodyPart (or default) for each code, in the same order
+        """
+        return await _in_chunks(
+            lambda chunk: self.get_by_codes(chunk, default), _as_list(codes), chunk_size
+        )
+
+    async def asearch_many(
+        self, queries: Iterable[str], chunk_size: int = DEFAULT_ASYNC_SEARCH_CHUNK_SIZE
+    ) -> List[Set[BodyPart]]:
+        """Like search_many(), but letting other tasks run every chunk_size queries.
+
+        Args:
+            queries (Iterable[str]): Queries to search for
+            chunk_size (int, optional): Number of queries to run between yields to the event loop.
+                Defaults to DEFAULT_ASYNC_SEARCH_CHUNK_SIZE.
+
+        Returns:
+            List[Set[BodyPart]]: BodyParts matching each query (an empty set if none), in the same
+                order
+        """
+        return await _in_chunks(self.search_many, _as_list(queries), chunk_size)
+
+    def ranked_search(self, query: str, limit: int = 10) -> List[BodyPart]:
+        """Search for the BodyParts best matching a query, ignoring case and punctuation.
+
+        Results are ranked by an exact match of the whole query against the description, then an
+        exact match against a synonym or code, then the BM25 weight of the query words found in the
+        description, synonyms and codes.
+
+        Args:
+            query (str): Words to search for in description, synonyms, and codes
+            limit (int, optional): Maximum number of BodyParts to return. Defaults to 10.
+
+        Returns:
+            List[BodyPart]: Best matching BodyParts, best first
+        """
+        self._build_search_indices()
+        radlex_ids = self.__inverted_index.search(query, limit)
+        return [self._body_part_by_id(radlex_id) for radlex_id in radlex_ids]
+
+    def fuzzy_search(
+        self, term: str, max_distance: int = DEFAULT_MAX_DISTANCE, limit: int = 10
+    ) -> List[BodyPart]:
+        """Find the BodyParts whose description or a synonym is close to a (possibly misspelled) term.
+
+        Matching ignores case and punctuation, and allows up to max_distance single-character
+        insertions, deletions or substitutions (e.g., "adnexxa" finds the uterine adnexa).
+
+        Args:
+            term (str): Term to look up
+            max_distance (int, optional): Largest edit distance allowed (at most 2). Defaults to 2.
+            limit (int, optional): Maximum number of BodyParts to return. Defaults to 10.
+
+        Raises:
+            ValueError: If max_distance is larger than the index supports
+
+        Returns:
+            List[BodyPart]: Matching BodyParts, closest first
+        """
+        self._build_search_indices()
+        rows: Dict[int, None] = {}
+        for (matched_term, _) in self.__fuzzy_index.lookup(normalize(term), max_distance):
+            for row in self.__fuzzy_terms[matched_term]:
+                rows.setdefault(row)
+            if len(rows) >= limit:
+                break
+        return self._body_parts(list(rows)[:limit])
+
+    def get_annotator(self) -> Annotator:
+        """Get an Annotator that finds mentions of the BodyParts in this index in free text.
+
+        The Annotator is compiled on first use and reused afterwards.
+
+        Returns:
+            Annotator: Annotator for the descriptions and synonyms of all BodyParts in the index
+        """
+        if self.__annotator is None:
+            self.__annotator = Annotator(self.get_all_body_parts())
+        return self.__annotator
+
+    def _facet_index(self) -> FacetIndex:
+        if self.__facets is None:
+            self.__facets = FacetIndex(self.__table, self.__hierarchy)
+        return self.__facets
+
+    @property
+    def facets(self) -> List[str]:
+        """List[str]: Facets at least one BodyPart has, for query() (e.g., "code:SNOMED")"""
+        return self._facet_index().facets
+
+    def query(
+        self,
+        *facets: str,
+        any_of: Iterable[str] = (),
+        none_of: Iterable[str] = (),
+        within: Optional[str] = None,
+        text: Optional[str] = None,
+    ) -> List[BodyPart]:
+        """Get the BodyParts that have a combination of facets.
+
+        For example, query('sex:Female', 'left', 'code:SNOMED', within='RID2507') gets the
+        female-specific left versions of body parts in the pelvis that have a SNOMED code.
+
+        Facets are "sex:Female", "sex:Male" and "sex_specific" (any sex); "left" and "right" (the
+        left or right version of a sided body part), "sided" (either of them) and "unsided" (a body
+        part that has sided versions); and "code:<system>" (has a code in that system). The bitset
+        of each facet is computed once, when the first query is made (or the index is frozen), so a
+        query costs a few operations on integers of one bit per BodyPart, however many match.
+
+        Args:
+            *facets (str): Facets the BodyParts must all have
+            any_of (Iterable[str], optional): Facets the BodyParts must have at least one of.
+                Defaults to no such condition.
+            none_of (Iterable[str], optional): Facets the BodyParts must not have. Defaults to ().
+            within (str, optional): RadLex ID of a BodyPart the BodyParts must be contained by
+                (directly or indirectly). Defaults to None.
+            text (str, optional): Query the BodyParts must match, as in search(). Defaults to None.
+
+        Raises:
+            Exception: If no BodyPart with the ID given as within is found
+            ValueError: If a facet is not one of the kinds above (a sex or code system no BodyPart
+                has is fine, and matches nothing)
+
+        Returns:
+            List[BodyPart]: Matching BodyParts, in the pre-order of the containment hierarchy
+        """
+        if within is not None and within not in self.__table.rows:
+            raise Exception(f'No BodyPart with ID {within}')
+        facet_index = self._facet_index()
+        bits = facet_index.all
+        for facet in facets:
+            bits &= facet_index.bits(facet)
+        any_of = list(any_of)
+        if any_of:
+            any_bits = 0
+            for facet in any_of:
+                any_bits |= facet_index.bits(facet)
+            bits &= any_bits
+        for facet in none_of:
+            bits &= ~facet_index.bits(facet)
+        if within is not None:
+            bits &= facet_index.subtree_bits(within)
+        if text is not None and bits:
+            bits &= facet_index.rows_to_bits(self._search_rows(text))
+        return self._body_parts(facet_index.bits_to_rows(bits))
+
+
+async def _in_chunks(
+    lookup: Callable[[List], List[_Result]], values: List, chunk_size: int
+) -> List[_Result]:
+    import asyncio  # pylint: disable=import-outside-toplevel
+
+    if chunk_size < 1:
+        raise ValueError('The chunk size must be positive')
+    results: List[_Result] = []
+    for start in range(0, len(values), chunk_size):
+        if start:
+            # Let other tasks run between chunks
+            await asyncio.sleep(0)
+        results.extend(lookup(values[start:start + chunk_size]))
+    return results
+
+
+def _as_list(values: Iterable) -> List:
+    # NumPy arrays convert to lists of plain Python values (str, or bytes for 'S' arrays) in one go
+    values = values.tolist() if hasattr(values, 'tolist') else list(values)
+    if any(isinstance(value, bytes) for value in values):
+        return [_decode(value) for value in values]
+    return values
+
+
+def _decode(value: Any) -> Any:
+    return value.decode() if isinstance(value, bytes) else value
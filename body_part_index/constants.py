@@ -0,0 +1,5 @@
+"""Constants shared by the modules of the package, kept free of imports to avoid import cycles."""
+
+BODY_PART_INDEX_DATA_URL = (
+    'https://raw.githubusercontent.com/talkasab/anatomiclocations.org/main/data/body_parts.json'
+)
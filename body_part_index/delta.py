@@ -0,0 +1,194 @@
+"""Compact differences (deltas) between two versions of the body part data.
+
+A delta is a JSON document like
+
+    {
+        "deltaFormat": 1,
+        "fromVersion": "...", "toVersion": "...",
+        "added": [<complete body part entries>],
+        "removed": ["RID...", ...],
+        "changed": [
+            {"radlexId": "RID...", "description": "...", "leftId": null,
+             "addedCodes": [...], "removedCodes": [...],
+             "addedSynonyms": [...], "removedSynonyms": [...]},
+            ...
+        ]
+    }
+
+where each changed entry holds only what changed: the new value of each changed field (null for
+a field that was dropped) and the codes and synonyms added and removed. When the codes or synonyms
+were only reordered, the entry holds the whole new list ("codes" or "synonyms") instead.
+
+Compute one with compute_delta() (or "python -m body_part_index.delta OLD.json NEW.json"), and
+apply it to a running index with BodyPartIndex.apply_delta().
+"""
+import argparse
+import json
+import sys
+from typing import Any, Dict, List, Optional, Sequence
+
+DELTA_FORMAT_VERSION = 1
+
+# Fields of a body part entry that hold a single value
+SCALAR_FIELDS = (
+    'description',
+    'containedById',
+    'unsidedId',
+    'leftId',
+    'rightId',
+    'partOfId',
+    'sexSpecific',
+)
+
+# Added and removed members of the list fields, with the key used for each in a changed entry
+LIST_FIELDS = {
+    'codes': ('addedCodes', 'removedCodes'),
+    'synonyms': ('addedSynonyms', 'removedSynonyms'),
+}
+
+
+def compute_delta(old_data: Dict, new_data: Dict) -> Dict[str, Any]:
+    """Compute the delta that turns one version of the body part data into another.
+
+    Args:
+        old_data (Dict): Body part data, in the format of the packaged JSON file
+        new_data (Dict): Later body part data, in the same format
+
+    Raises:
+        ValueError: If either version has two body parts with the same ID
+
+    Returns:
+        Dict[str, Any]: The delta (see the module documentation)
+    """
+    old_body_parts = _by_id(old_data['bodyParts'])
+    new_body_parts = _by_id(new_data['bodyParts'])
+    changed = []
+    for (radlex_id, new_body_part) in new_body_parts.items():
+        old_body_part = old_body_parts.get(radlex_id)
+        if old_body_part is not None:
+            change = _change(old_body_part, new_body_part)
+            if len(change) > 1:
+                changed.append(change)
+    return {
+        'deltaFormat': DELTA_FORMAT_VERSION,
+        'fromVersion': old_data.get('$version'),
+        'toVersion': new_data.get('$version'),
+        'added': [
+            body_part
+            for (radlex_id, body_part) in new_body_parts.items()
+            if radlex_id not in old_body_parts
+        ],
+        'removed': [radlex_id for radlex_id in old_body_parts if radlex_id not in new_body_parts],
+        'changed': changed,
+    }
+
+
+def apply_change(body_part: Dict[str, Any], change: Dict[str, Any]) -> Dict[str, Any]:
+    """Get the new version of a body part entry, given its changed entry from a delta.
+
+    Args:
+        body_part (Dict[str, Any]): Body part entry, in the format of the JSON data
+        change (Dict[str, Any]): Changed entry for the body part from a delta
+
+    Raises:
+        ValueError: If the changed entry is for another body part
+
+    Returns:
+        Dict[str, Any]: The changed body part entry (the given one is left unchanged)
+    """
+    if change['radlexId'] != body_part['radlexId']:
+        raise ValueError(f"Change for {change['radlexId']} applied to {body_part['radlexId']}")
+    new_body_part = dict(body_part)
+    for key in SCALAR_FIELDS:
+        if key in change:
+            if change[key] is None:
+                new_body_part.pop(key, None)
+            else:
+                new_body_part[key] = change[key]
+    for (key, (added_key, removed_key)) in LIST_FIELDS.items():
+        if key in change:
+            values = list(change[key])
+        else:
+            removed = change.get(removed_key, ())
+            values = [value for value in body_part.get(key) or () if value not in removed]
+            values += change.get(added_key, ())
+        if values:
+            new_body_part[key] = values
+        else:
+            new_body_part.pop(key, None)
+    return new_body_part
+
+
+def check_delta(delta: Dict[str, Any]) -> None:
+    """Check that a document is a delta this version of the package can apply.
+
+    Raises:
+        ValueError: If the document is not such a delta
+    """
+    if not isinstance(delta, dict) or delta.get('deltaFormat') != DELTA_FORMAT_VERSION:
+        raise ValueError(f'Not a body part delta in format {DELTA_FORMAT_VERSION}')
+    for key in ('added', 'removed', 'changed'):
+        if not isinstance(delta.get(key), list):
+            raise ValueError(f'Body part delta without a list of {key} body parts')
+
+
+def _by_id(body_parts: Sequence[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    by_id: Dict[str, Dict[str, Any]] = {}
+    for body_part in body_parts:
+        radlex_id = body_part['radlexId']
+        if radlex_id in by_id:
+            raise ValueError(f'Duplicate BodyPart with ID {radlex_id}')
+        by_id[radlex_id] = body_part
+    return by_id
+
+
+def _change(old_body_part: Dict[str, Any], new_body_part: Dict[str, Any]) -> Dict[str, Any]:
+    change: Dict[str, Any] = {'radlexId': new_body_part['radlexId']}
+    for key in SCALAR_FIELDS:
+        if old_body_part.get(key) != new_body_part.get(key):
+            change[key] = new_body_part.get(key)
+    for (key, (added_key, removed_key)) in LIST_FIELDS.items():
+        old_values: List[Any] = old_body_part.get(key) or []
+        new_values: List[Any] = new_body_part.get(key) or []
+        if old_values == new_values:
+            continue
+        removed = [value for value in old_values if value not in new_values]
+        added = [value for value in new_values if value not in old_values]
+        # Removing and appending keeps the order of the rest; otherwise send the whole list
+        if [value for value in old_values if value not in removed] + added != new_values:
+            change[key] = new_values
+            continue
+        if added:
+            change[added_key] = added
+        if removed:
+            change[removed_key] = removed
+    return change
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    """Write the delta between two body part data files."""
+    parser = argparse.ArgumentParser(
+        prog='python -m body_part_index.delta',
+        description='Compute the changes between two versions of the body part data',
+    )
+    parser.add_argument('old_filename', help='Earlier version of the body part data file')
+    parser.add_argument('new_filename', help='Later version of the body part data file')
+    parser.add_argument(
+        '-o', '--output', type=str, help='File to write the delta to (by default, standard output)'
+    )
+    args = parser.parse_args(argv)
+    with open(args.old_filename, encoding='utf-8') as old_file:
+        old_data = json.load(old_file)
+    with open(args.new_filename, encoding='utf-8') as new_file:
+        new_data = json.load(new_file)
+    delta = compute_delta(old_data, new_data)
+    text = json.dumps(delta, separators=(',', ':'), ensure_ascii=False)
+    if args.output is None:
+        sys.stdout.write(text + '\n')
+    else:
+        with open(args.output, 'w', encoding='utf-8') as output_file:
+            output_file.write(text)
+
+
+if __name__ == '__main__':
+    main()
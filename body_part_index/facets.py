@@ -0,0 +1,133 @@
+"""Bitsets of the body parts having each facet, for combining facets with bitwise AND and OR.
+
+Facets are named by strings:
+
+- "sex:Female", "sex:Male": sex_specific is that value; "sex_specific": it has any value
+- "left", "right": the body part is the left (right) version of a sided body part, i.e., another
+  body part's left_id (right_id) refers to it; "sided": either of them
+- "unsided": the body part has sided versions, i.e., another body part's unsided_id refers to it
+- "code:<system>" (e.g., "code:SNOMED"): the body part has a code in that system
+
+Bit i of every bitset stands for the body part at position i of the pre-order of the containment
+hierarchy (see ContainmentHierarchy), so the body parts contained by one are a contiguous run of
+bits and a subtree needs no precomputed bitset of its own.
+"""
+import re
+from array import array
+from typing import Dict, Iterable, List
+
+from .hierarchy import ContainmentHierarchy
+from .table import BodyPartTable
+
+SEX_PREFIX = 'sex:'
+CODE_PREFIX = 'code:'
+SEX_SPECIFIC = 'sex_specific'
+LEFT = 'left'
+RIGHT = 'right'
+SIDED = 'sided'
+UNSIDED = 'unsided'
+
+_NONZERO_BYTE = re.compile(b'[^\x00]')
+# Offsets of the bits set in each byte value
+_BIT_OFFSETS = tuple(
+    tuple(offset for offset in range(8) if byte & (1 << offset)) for byte in range(256)
+)
+
+
+class FacetIndex:
+    """Bitsets (as Python ints) of the body parts having each facet, and of each subtree."""
+
+    def __init__(self, table: BodyPartTable, hierarchy: ContainmentHierarchy) -> None:
+        """Compute the bitset of every facet in one pass over the table.
+
+        Args:
+            table (BodyPartTable): Fields of the body parts
+            hierarchy (ContainmentHierarchy): Containment hierarchy of the same body parts
+        """
+        self._hierarchy = hierarchy
+        self._byte_count = (len(table) + 7) // 8
+        self._positions = array(
+            'i', (hierarchy.subtree_range(radlex_id)[0] for radlex_id in table.radlex_ids)
+        )
+        self._rows_by_position = array('i', bytes(4 * len(table)))
+        for (row, position) in enumerate(self._positions):
+            self._rows_by_position[position] = row
+        self.all = (1 << len(table)) - 1
+        buffers: Dict[str, bytearray] = {}
+
+        def mark(facet: str, row: int) -> None:
+            buffer = buffers.get(facet)
+            if buffer is None:
+                buffer = buffers[facet] = bytearray(self._byte_count)
+            position = self._positions[row]
+            buffer[position >> 3] |= 1 << (position & 7)
+
+        rows = table.rows
+        for row in range(len(table)):
+            sex = table.sex_specifics[row]
+            if sex is not None:
+                mark(SEX_PREFIX + sex, row)
+                mark(SEX_SPECIFIC, row)
+            for code in table.codes[row]:
+                mark(CODE_PREFIX + code.system, row)
+            # Sidedness is a property of the body part the IDs refer to
+            for (facet, referenced_id) in (
+                (LEFT, table.left_ids[row]),
+                (RIGHT, table.right_ids[row]),
+                (UNSIDED, table.unsided_ids[row]),
+            ):
+                if referenced_id in rows:
+                    mark(facet, rows[referenced_id])
+        self._bitsets: Dict[str, int] = {
+            facet: int.from_bytes(buffer, 'little') for (facet, buffer) in buffers.items()
+        }
+        self._bitsets[SIDED] = self._bitsets.get(LEFT, 0) | self._bitsets.get(RIGHT, 0)
+
+    @property
+    def facets(self) -> List[str]:
+        """List[str]: Names of the facets at least one body part has"""
+        return sorted(facet for (facet, bits) in self._bitsets.items() if bits)
+
+    def bits(self, facet: str) -> int:
+        """Get the bitset of the body parts having a facet.
+
+        Raises:
+            ValueError: If the name is not one of the kinds of facets (an unknown sex or code
+                system is fine, and has no body parts)
+        """
+        if facet in self._bitsets:
+            return self._bitsets[facet]
+        if facet.startswith((SEX_PREFIX, CODE_PREFIX)):
+            return 0
+        if facet in (SEX_SPECIFIC, LEFT, RIGHT, UNSIDED):
+            return 0
+        raise ValueError(f'Unknown facet {facet!r}')
+
+    def subtree_bits(self, radlex_id: str) -> int:
+        """Get the bitset of the body parts contained (directly or indirectly) by a body part."""
+        (start, end) = self._hierarchy.subtree_range(radlex_id)
+        return ((1 << (end - start - 1)) - 1) << (start + 1)
+
+    def rows_to_bits(self, rows: Iterable[int]) -> int:
+        """Get the bitset of the given rows of the table."""
+        buffer = bytearray(self._byte_count)
+        for row in rows:
+            position = self._positions[row]
+            buffer[position >> 3] |= 1 << (position & 7)
+        return int.from_bytes(buffer, 'little')
+
+    def bits_to_rows(self, bits: int) -> List[int]:
+        """Get the rows of the table in a bitset, in the pre-order of the hierarchy."""
+        data = (bits & self.all).to_bytes(self._byte_count, 'little')
+        rows_by_position = self._rows_by_position
+        rows = []
+        for match in _NONZERO_BYTE.finditer(data):
+            base = match.start() << 3
+            for offset in _BIT_OFFSETS[data[match.start()]]:
+                rows.append(rows_by_position[base + offset])
+        return rows
+
+    def add_code(self, row: int, system: str) -> None:
+        """Record that a row now has a code in a system (e.g., after a local code was added)."""
+        facet = CODE_PREFIX + system
+        self._bitsets[facet] = self._bitsets.get(facet, 0) | (1 << self._positions[row])
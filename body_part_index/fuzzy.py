@@ -0,0 +1,156 @@
+"""Typo-tolerant term lookup using a SymSpell-style deletion index."""
+from itertools import combinations
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+DEFAULT_MAX_DISTANCE = 2
+DEFAULT_PREFIX_LENGTH = 7
+
+
+def levenshtein_distance(first: str, second: str, max_distance: int) -> Optional[int]:
+    """Compute the edit distance between two strings, giving up early past a maximum.
+
+    Args:
+        first (str): First string
+        second (str): Second string
+        max_distance (int): Largest distance of interest
+
+    Returns:
+        Optional[int]: Levenshtein distance between the strings, or None if it exceeds max_distance
+    """
+    if abs(len(first) - len(second)) > max_distance:
+        return None
+    # Matching prefixes and suffixes never add to the distance, and candidates usually share them
+    start = 0
+    while start < len(first) and start < len(second) and first[start] == second[start]:
+        start += 1
+    (first, second) = (first[start:], second[start:])
+    while first and second and first[-1] == second[-1]:
+        (first, second) = (first[:-1], second[:-1])
+    if len(first) > len(second):
+        (first, second) = (second, first)
+    if not first:
+        return len(second)
+    # Only cells within max_distance of the diagonal can lead to a small enough distance
+    too_far = max_distance + 1
+    previous = list(range(len(first) + 1))
+    for i, second_char in enumerate(second, 1):
+        current = [i] + [too_far] * len(first)
+        for j in range(max(1, i - max_distance), min(len(first), i + max_distance) + 1):
+            current[j] = min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (first[j - 1] != second_char),
+            )
+        if min(current) > max_distance:
+            return None
+        previous = current
+    return previous[-1] if previous[-1] <= max_distance else None
+
+
+def deletes(text: str, max_distance: int) -> Set[str]:
+    """Get every string that can be made by removing up to max_distance characters from a text."""
+    results = {text}
+    for count in range(1, min(max_distance, len(text)) + 1):
+        for positions in combinations(range(len(text)), count):
+            results.add(''.join(c for i, c in enumerate(text) if i not in positions))
+    return results
+
+
+class DeletionIndex:
+    """Index of terms by the strings obtained by deleting characters from their prefixes.
+
+    Two strings within edit distance d of each other can both be reduced to a common string with
+    at most d deletions each, and this still holds for their prefixes. Looking up the deletions of
+    a query's prefix therefore finds every candidate term without comparing against all of them;
+    only the candidates are checked with a real edit distance (this is the SymSpell approach).
+    """
+
+    def __init__(
+        self, max_distance: int = DEFAULT_MAX_DISTANCE, prefix_length: int = DEFAULT_PREFIX_LENGTH
+    ) -> None:
+        self.max_distance = max_distance
+        self.prefix_length = prefix_length
+        # Order in which the terms were added (which breaks ties between matches)
+        self._terms: Dict[str, int] = {}
+        self._added_count = 0
+        self._pending: List[str] = []
+        self._deletes: Dict[str, List[str]] = {}
+
+    def __len__(self) -> int:
+        return len(self._terms)
+
+    def add(self, term: str) -> None:
+        """Add a term to the index (adding a term twice has no effect)."""
+        if term not in self._terms:
+            self._terms[term] = self._added_count
+            self._added_count += 1
+            self._pending.append(term)
+
+    def discard(self, term: str) -> None:
+        """Remove a term from the index (if it is there)."""
+        if term not in self._terms:
+            return
+        del self._terms[term]
+        # A pending term is skipped when the deletions are generated, so only indexed ones need
+        # removing
+        for deleted in deletes(term[:self.prefix_length], self.max_distance):
+            terms = self._deletes.get(deleted)
+            if terms is not None and term in terms:
+                terms.remove(term)
+                if not terms:
+                    del self._deletes[deleted]
+
+    def update(self, terms: Iterable[str]) -> None:
+        """Add several terms to the index."""
+        for term in terms:
+            self.add(term)
+
+    def index_pending(self) -> None:
+        """Generate the deletions of the terms added since the last lookup now.
+
+        Lookups do this on demand, so loading stays cheap; call it up front to make later lookups
+        read-only (e.g., before sharing the index between threads).
+        """
+        # A term removed and added again while pending is listed twice
+        for term in dict.fromkeys(self._pending):
+            if term not in self._terms:
+                continue
+            for deleted in deletes(term[:self.prefix_length], self.max_distance):
+                self._deletes.setdefault(deleted, []).append(term)
+        self._pending.clear()
+
+    def lookup(self, query: str, max_distance: Optional[int] = None) -> List[Tuple[str, int]]:
+        """Find the indexed terms within an edit distance of a query.
+
+        Args:
+            query (str): Possibly misspelled term
+            max_distance (int, optional): Largest edit distance allowed; cannot be more than the
+                index was built for. Defaults to the index's max_distance.
+
+        Raises:
+            ValueError: If max_distance is larger than the index supports
+
+        Returns:
+            List[Tuple[str, int]]: (term, distance) pairs, closest first (ties in the order the
+                terms were added)
+        """
+        if max_distance is None:
+            max_distance = self.max_distance
+        if max_distance > self.max_distance:
+            raise ValueError(
+                f'max_distance can be at most {self.max_distance} for this index (got {max_distance})'
+            )
+        if self._pending:
+            self.index_pending()
+        candidates: Set[str] = set()
+        for deleted in deletes(query[:self.prefix_length], max_distance):
+            candidates.update(self._deletes.get(deleted, ()))
+        (shortest, longest) = (len(query) - max_distance, len(query) + max_distance)
+        matches: List[Tuple[str, int]] = []
+        for term in candidates:
+            if shortest <= len(term) <= longest:
+                distance = levenshtein_distance(query, term, max_distance)
+                if distance is not None:
+                    matches.append((term, distance))
+        matches.sort(key=lambda match: (match[1], self._terms[match[0]]))
+        return matches
@@ -0,0 +1,187 @@
+"""Interval labeling of the contained-by hierarchy of BodyParts."""
+from array import array
+from typing import Dict, Iterable, List, Mapping, Optional, Sequence, Tuple
+
+
+class ContainmentHierarchy:
+    """Pre-order (Euler tour) numbering of the contained-by hierarchy.
+
+    Every body part gets an enter number (its position in a pre-order walk of the tree) and an
+    exit number (one past the position of its last descendant). Containment checks become integer
+    comparisons, and the descendants of a body part are a contiguous slice of the pre-order.
+
+    Body parts whose container is missing (or is themselves, like the whole body) are treated as
+    roots, so a partial data file still yields a well-formed forest.
+
+    A binary lifting table (the 2**k-th container of every body part) is kept alongside the
+    numbering, so lowest common ancestors can be found in O(log depth).
+    """
+
+    def __init__(self, parents: Mapping[str, str]) -> None:
+        """Label the hierarchy described by a mapping of RadLex ID to contained_by_id.
+
+        Args:
+            parents (Mapping[str, str]): Containing RadLex ID for each RadLex ID in the hierarchy,
+                in the order the body parts should be visited
+        """
+        children: Dict[str, List[str]] = {}
+        roots: List[str] = []
+        for radlex_id, parent_id in parents.items():
+            if parent_id == radlex_id or parent_id not in parents:
+                roots.append(radlex_id)
+            else:
+                children.setdefault(parent_id, []).append(radlex_id)
+        self._order: List[str] = []
+        self._position: Dict[str, int] = {}
+        # Positions are kept in int arrays: 4 bytes each, rather than a pointer plus an int object
+        self._end: 'array[int]' = array('i')
+        self._parent: 'array[int]' = array('i')
+        # Body parts caught in a containment cycle are unreachable from any root; start a new tree
+        # at the first one we come across so that every body part still gets a label
+        for root_id in roots + list(parents):
+            if root_id not in self._position:
+                self._label_tree(root_id, children)
+        self._ancestor_table: List['array[int]'] = self._build_ancestor_table()
+
+    @classmethod
+    def from_arrays(
+        cls, order: Sequence[str], end: Sequence[int], parent: Sequence[int]
+    ) -> 'ContainmentHierarchy':
+        """Recreate a hierarchy from the arrays returned by to_arrays(), without walking the tree.
+
+        Args:
+            order (Sequence[str]): RadLex IDs in pre-order
+            end (Sequence[int]): Exit number of each position
+            parent (Sequence[int]): Position of the container of each position (-1 for roots)
+
+        Returns:
+            ContainmentHierarchy: The hierarchy the arrays were taken from
+        """
+        hierarchy = cls.__new__(cls)
+        hierarchy._order = list(order)
+        hierarchy._position = {radlex_id: position for (position, radlex_id) in enumerate(order)}
+        hierarchy._end = array('i', end)
+        hierarchy._parent = array('i', parent)
+        hierarchy._ancestor_table = hierarchy._build_ancestor_table()
+        return hierarchy
+
+    def to_arrays(self) -> Tuple[List[str], List[int], List[int]]:
+        """Get the pre-order, exit numbers and container positions that define this hierarchy."""
+        return (list(self._order), list(self._end), list(self._parent))
+
+    def _label_tree(self, root_id: str, children: Mapping[str, Sequence[str]]) -> None:
+        stack: List[Tuple[int, int]] = [(self._enter(root_id, -1), 0)]
+        while stack:
+            position, next_child = stack[-1]
+            child_ids = children.get(self._order[position], ())
+            while next_child < len(child_ids) and child_ids[next_child] in self._position:
+                next_child += 1
+            if next_child < len(child_ids):
+                stack[-1] = (position, next_child + 1)
+                stack.append((self._enter(child_ids[next_child], position), 0))
+            else:
+                stack.pop()
+                self._end[position] = len(self._order)
+
+    def _enter(self, radlex_id: str, parent: int) -> int:
+        position = len(self._order)
+        self._order.append(radlex_id)
+        self._position[radlex_id] = position
+        self._end.append(position + 1)
+        self._parent.append(parent)
+        return position
+
+    def _build_ancestor_table(self) -> List['array[int]']:
+        # Row k holds the position of the 2**k-th container of each position (-1 past a root)
+        table: List['array[int]'] = [self._parent]
+        while any(ancestor >= 0 for ancestor in table[-1]):
+            previous = table[-1]
+            table.append(
+                array('i', [previous[ancestor] if ancestor >= 0 else -1 for ancestor in previous])
+            )
+        return table
+
+    def _contains_or_is(self, ancestor: int, descendant: int) -> bool:
+        return ancestor <= descendant < self._end[ancestor]
+
+    def _lowest_common_ancestor(self, first: int, second: int) -> int:
+        if self._contains_or_is(first, second):
+            return first
+        if self._contains_or_is(second, first):
+            return second
+        # Climb from first as far as possible without reaching a container of second
+        for ancestors in reversed(self._ancestor_table):
+            ancestor = ancestors[first]
+            if ancestor >= 0 and not self._contains_or_is(ancestor, second):
+                first = ancestor
+        return self._parent[first]
+
+    def __len__(self) -> int:
+        return len(self._order)
+
+    def __contains__(self, radlex_id: object) -> bool:
+        return radlex_id in self._position
+
+    def subtree_range(self, radlex_id: str) -> Tuple[int, int]:
+        """Get the enter and exit numbers of a body part.
+
+        Args:
+            radlex_id (str): RadLex ID of the body part
+
+        Returns:
+            Tuple[int, int]: Position of the body part in the pre-order, and one past the position
+                of its last descendant
+        """
+        position = self._position[radlex_id]
+        return (position, self._end[position])
+
+    def is_ancestor(self, ancestor_id: str, descendant_id: str) -> bool:
+        """Check if one body part (strictly) contains another.
+
+        Args:
+            ancestor_id (str): RadLex ID of the possible container
+            descendant_id (str): RadLex ID of the possibly contained body part
+
+        Returns:
+            bool: True if ancestor_id is a proper ancestor of descendant_id, False otherwise
+                (including when either ID is not in the hierarchy)
+        """
+        ancestor = self._position.get(ancestor_id)
+        descendant = self._position.get(descendant_id)
+        if ancestor is None or descendant is None:
+            return False
+        return ancestor < descendant < self._end[ancestor]
+
+    def descendant_ids(self, radlex_id: str) -> Sequence[str]:
+        """Get the RadLex IDs of all the body parts contained (directly or not) by a body part.
+
+        Args:
+            radlex_id (str): RadLex ID of the containing body part
+
+        Returns:
+            Sequence[str]: RadLex IDs of the descendants, in pre-order (empty if the ID is unknown)
+        """
+        position = self._position.get(radlex_id)
+        if position is None:
+            return ()
+        return self._order[position + 1:self._end[position]]
+
+    def lowest_common_ancestor(self, radlex_ids: Iterable[str]) -> Optional[str]:
+        """Get the most specific body part that contains (or is) each of the given body parts.
+
+        Args:
+            radlex_ids (Iterable[str]): RadLex IDs of the body parts
+
+        Returns:
+            Optional[str]: RadLex ID of the lowest common ancestor, or None if there are no IDs, one
+                of them is not in the hierarchy, or they are in different trees
+        """
+        common = -1
+        for radlex_id in radlex_ids:
+            position = self._position.get(radlex_id)
+            if position is None:
+                return None
+            common = position if common < 0 else self._lowest_common_ancestor(common, position)
+            if common < 0:
+                return None
+        return self._order[common] if common >= 0 else None
@@ -0,0 +1,242 @@
+"""Optional call counts, hit rates, latency histograms and build timings for BodyPartIndex.
+
+Instrumentation is switched on with BodyPartIndex.enable_instrumentation(), which swaps timing
+wrappers in for the instrumented methods and properties, and off with
+BodyPartIndex.disable_instrumentation(), which puts the originals back. While it is off, lookups run
+the original code, so they pay nothing for it.
+"""
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# Upper bounds (in seconds) of the latency histogram buckets; one more bucket holds slower calls
+LATENCY_BUCKETS = (
+    1e-6, 2e-6, 5e-6,
+    1e-5, 2e-5, 5e-5,
+    1e-4, 2e-4, 5e-4,
+    1e-3, 2e-3, 5e-3,
+    1e-2, 2e-2, 5e-2,
+    1e-1, 2e-1, 5e-1,
+    1.0,
+)
+
+# Phases of building an index, in the order they happen (a build may skip some of them)
+BUILD_PHASES = ('parse', 'construct', 'index', 'check', 'freeze')
+
+# Called with (operation, seconds, hit) for every instrumented call, where hit is None for calls
+# that cannot miss, and with ("build.<phase>", seconds, None) at the end of each build phase
+Callback = Callable[[str, float, Optional[bool]], None]
+
+
+class OperationStats:
+    """Call count, hits and misses, and latency histogram of one instrumented operation."""
+
+    __slots__ = ('calls', 'hits', 'misses', 'total_seconds', 'histogram')
+
+    def __init__(self) -> None:
+        self.calls = 0
+        self.hits = 0
+        self.misses = 0
+        self.total_seconds = 0.0
+        self.histogram = [0] * (len(LATENCY_BUCKETS) + 1)
+
+    def record(self, seconds: float, hit: Optional[bool]) -> None:
+        """Count a call that took the given time (and hit or missed, unless hit is None)."""
+        self.calls += 1
+        if hit is not None:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+        self.total_seconds += seconds
+        bucket = 0
+        while bucket < len(LATENCY_BUCKETS) and seconds > LATENCY_BUCKETS[bucket]:
+            bucket += 1
+        self.histogram[bucket] += 1
+
+    def percentile(self, fraction: float) -> Optional[float]:
+        """Get the upper bound of the bucket holding the given fraction (e.g., 0.99) of the calls.
+
+        Returns:
+            Optional[float]: Bound in seconds (None if there were no calls, or the calls are slower
+                than the largest bucket)
+        """
+        if not self.calls:
+            return None
+        count = 0
+        for (bucket, bucket_count) in enumerate(self.histogram):
+            count += bucket_count
+            if count >= fraction * self.calls:
+                return LATENCY_BUCKETS[bucket] if bucket < len(LATENCY_BUCKETS) else None
+        return None
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Get the statistics as a JSON-compatible dict."""
+        lookups = self.hits + self.misses
+        return {
+            'calls': self.calls,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': self.hits / lookups if lookups else None,
+            'total_seconds': self.total_seconds,
+            'mean_seconds': self.total_seconds / self.calls if self.calls else None,
+            'p50_seconds': self.percentile(0.5),
+            'p99_seconds': self.percentile(0.99),
+            # (upper bound in seconds, calls) pairs; the last bound is None for the slowest calls
+            'histogram': [
+                [bound, count]
+                for (bound, count) in zip((*LATENCY_BUCKETS, None), self.histogram)
+            ],
+        }
+
+
+class Instrumentation:
+    """Statistics collected while instrumentation is enabled (see enable_instrumentation()).
+
+    Operations are named after what they instrument, e.g., "get", "search" or
+    "BodyPart.contained_by"; a hit is a lookup that found something, or for the cached BodyPart
+    properties, a value that was already cached (so a miss is a computation).
+    """
+
+    def __init__(self, callback: Optional[Callback] = None) -> None:
+        """Create an empty set of statistics.
+
+        Args:
+            callback (Callback, optional): Function called with (operation, seconds, hit) for
+                every instrumented call, and with ("build.<phase>", seconds, None) for every build
+                phase, e.g., to forward them to a metrics system. Defaults to None.
+        """
+        self.callback = callback
+        self._lock = threading.Lock()
+        self._operations: Dict[str, OperationStats] = {}
+        self._build_phases: Dict[str, float] = {}
+        self._build_count = 0
+
+    def record(self, operation: str, seconds: float, hit: Optional[bool] = None) -> None:
+        """Record an instrumented call.
+
+        Args:
+            operation (str): Name of the operation
+            seconds (float): Time the call took
+            hit (bool, optional): Whether the call found (or had cached) what it looked for, or
+                None if it cannot miss. Defaults to None.
+        """
+        with self._lock:
+            stats = self._operations.get(operation)
+            if stats is None:
+                stats = self._operations[operation] = OperationStats()
+            stats.record(seconds, hit)
+        if self.callback is not None:
+            self.callback(operation, seconds, hit)
+
+    def start_build(self) -> None:
+        """Forget the build phase timings of the previous build, as a new one starts."""
+        with self._lock:
+            self._build_phases = {}
+            self._build_count += 1
+
+    def record_phase(self, phase: str, seconds: float) -> None:
+        """Add time spent in a build phase (see BUILD_PHASES) of the current build."""
+        with self._lock:
+            self._build_phases[phase] = self._build_phases.get(phase, 0.0) + seconds
+        if self.callback is not None:
+            self.callback(f'build.{phase}', seconds, None)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Get a copy of the statistics collected so far, as a JSON-compatible dict.
+
+        Returns:
+            Dict[str, Any]: {"operations": {operation: statistics (see OperationStats.to_dict())},
+                "builds": number of builds, "build_phases": {phase: seconds of the last build}}
+        """
+        with self._lock:
+            return {
+                'operations': {
+                    operation: stats.to_dict()
+                    for (operation, stats) in sorted(self._operations.items())
+                },
+                'builds': self._build_count,
+                'build_phases': dict(self._build_phases),
+            }
+
+    def reset(self) -> None:
+        """Forget all the statistics collected so far."""
+        with self._lock:
+            self._operations = {}
+            self._build_phases = {}
+            self._build_count = 0
+
+
+def timed_method(
+    instrumentation: Instrumentation,
+    operation: str,
+    method: Callable[..., Any],
+    is_hit: Optional[Callable[[Any], bool]],
+) -> Callable[..., Any]:
+    """Wrap a method so that each call is recorded (a call that raises counts as a miss).
+
+    Args:
+        instrumentation (Instrumentation): Where to record the calls
+        operation (str): Name of the operation
+        method (Callable[..., Any]): Method to wrap
+        is_hit (Callable[[Any], bool], optional): Tells from a result whether the call hit, or None
+            if calls cannot miss
+
+    Returns:
+        Callable[..., Any]: The wrapped method
+    """
+    clock = time.perf_counter
+
+    def timed(*args: Any, **kwargs: Any) -> Any:
+        start = clock()
+        try:
+            result = method(*args, **kwargs)
+        except Exception:
+            instrumentation.record(operation, clock() - start, False)
+            raise
+        hit = is_hit(result) if is_hit is not None else None
+        instrumentation.record(operation, clock() - start, hit)
+        return result
+
+    timed.__name__ = method.__name__
+    timed.__doc__ = method.__doc__
+    timed.__wrapped__ = method  # type: ignore[attr-defined]
+    return timed
+
+
+class TimedCachedProperty:
+    """Stands in for a SlotCachedProperty, recording whether each read found the value cached."""
+
+    def __init__(self, instrumentation: Instrumentation, operation: str, cached: Any) -> None:
+        self.instrumentation = instrumentation
+        self.operation = operation
+        self.cached = cached
+        self.__doc__ = cached.__doc__
+
+    def __get__(self, instance: Any, owner: Optional[type] = None) -> Any:
+        if instance is None:
+            return self
+        start = time.perf_counter()
+        hit = hasattr(instance, self.cached.slot_name)
+        try:
+            return self.cached.__get__(instance, owner)
+        finally:
+            self.instrumentation.record(self.operation, time.perf_counter() - start, hit)
+
+    def reset(self, instance: Any) -> None:
+        """Forget the cached value of an instance (see SlotCachedProperty.reset())."""
+        self.cached.reset(instance)
+
+
+def patch(owner: type, replacements: Dict[str, Any]) -> List[Tuple[str, Any]]:
+    """Replace attributes of a class, returning the originals (to pass to unpatch())."""
+    originals = [(name, owner.__dict__[name]) for name in replacements]
+    for (name, replacement) in replacements.items():
+        setattr(owner, name, replacement)
+    return originals
+
+
+def unpatch(owner: type, originals: List[Tuple[str, Any]]) -> None:
+    """Put back the attributes of a class replaced by patch()."""
+    for (name, original) in originals:
+        setattr(owner, name, original)
@@ -0,0 +1,50 @@
+"""Estimate the memory used by the data structures of an index."""
+import sys
+from typing import Any, Iterable, Optional, Set
+
+
+def deep_sizeof(obj: Any, seen: Optional[Set[int]] = None) -> int:
+    """Get the size of an object and everything it refers to, in the style of sys.getsizeof().
+
+    Containers (dicts, lists, tuples, sets, arrays), objects with a __dict__ or __slots__, and the
+    objects they hold are followed; every object is counted once, however often it is referenced,
+    so sharing (e.g., interned strings) shows up as savings.
+
+    Args:
+        obj (Any): Object to measure
+        seen (Set[int], optional): IDs of objects already counted (and not to be counted again);
+            updated in place, so several calls sharing it measure only what each adds. Defaults to
+            None.
+
+    Returns:
+        int: Size in bytes
+    """
+    if seen is None:
+        seen = set()
+    total = 0
+    stack = [obj]
+    while stack:
+        current = stack.pop()
+        if id(current) in seen:
+            continue
+        seen.add(id(current))
+        total += sys.getsizeof(current)
+        stack.extend(_referents(current))
+    return total
+
+
+def _referents(obj: Any) -> Iterable[Any]:
+    if isinstance(obj, (str, bytes, int, float, bool, type(None), type)):
+        return ()
+    if isinstance(obj, dict):
+        return [*obj.keys(), *obj.values()]
+    if isinstance(obj, (list, tuple, set, frozenset)):
+        return obj
+    referents = []
+    if hasattr(obj, '__dict__'):
+        referents.append(vars(obj))
+    for cls in type(obj).__mro__:
+        for slot in cls.__dict__.get('__slots__', ()):
+            if slot not in ('__dict__', '__weakref__') and hasattr(obj, slot):
+                referents.append(getattr(obj, slot))
+    return referents
@@ -0,0 +1,125 @@
+"""Downloading the body part data, with a local cache and conditional requests."""
+import hashlib
+import json
+import logging
+import os
+import tempfile
+from typing import Dict, NamedTuple, Optional
+
+from .constants import BODY_PART_INDEX_DATA_URL
+
+DEFAULT_TIMEOUT = 10.0
+
+
+def default_cache_directory() -> str:
+    """Get the directory where downloaded data is cached by default (under $XDG_CACHE_HOME)."""
+    cache_home = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(cache_home, 'body_part_index')
+
+
+class CachedData(NamedTuple):
+    """A CachedData is a tuple of (filename, validator, changed) for a download in the cache.
+
+    The validator (the ETag or Last-Modified of the download) identifies the content of the file,
+    and changed is True if the file was (re-)downloaded rather than confirmed as still current.
+    """
+
+    filename: str
+    validator: str
+    changed: bool
+
+
+def _cache_filenames(url: str, cache_directory: str) -> Dict[str, str]:
+    key = hashlib.sha256(url.encode('utf-8')).hexdigest()[:16]
+    return {
+        'data': os.path.join(cache_directory, f'{key}.json'),
+        'meta': os.path.join(cache_directory, f'{key}.meta.json'),
+    }
+
+
+def _read_meta(meta_filename: str, data_filename: str) -> Dict[str, str]:
+    try:
+        with open(meta_filename, encoding='utf-8') as meta_file:
+            meta = json.load(meta_file)
+    except (OSError, ValueError):
+        return {}
+    # A meta file without a validator (e.g., from an older version) is as good as none
+    if not isinstance(meta, dict) or 'validator' not in meta or not os.path.exists(data_filename):
+        return {}
+    return meta
+
+
+def _write_atomically(filename: str, content: bytes) -> None:
+    # Readers of the cache only ever see a complete old file or a complete new one
+    (handle, temporary_filename) = tempfile.mkstemp(dir=os.path.dirname(filename))
+    try:
+        with os.fdopen(handle, 'wb') as temporary_file:
+            temporary_file.write(content)
+        os.replace(temporary_filename, filename)
+    except BaseException:
+        os.unlink(temporary_filename)
+        raise
+
+
+def fetch_data(
+    url: str = BODY_PART_INDEX_DATA_URL,
+    cache_directory: Optional[str] = None,
+    timeout: float = DEFAULT_TIMEOUT,
+) -> CachedData:
+    """Get a current copy of the data at a URL, downloading it only if it changed.
+
+    The downloaded file is kept in the cache directory together with its ETag and Last-Modified
+    headers, which are sent back (as If-None-Match and If-Modified-Since) on the next call, so an
+    unchanged file costs a "304 Not Modified" round trip rather than a download. If the server
+    cannot be reached or answers with an error, the cached copy (if any) is used.
+
+    Args:
+        url (str, optional): URL of the body part data. Defaults to BODY_PART_INDEX_DATA_URL.
+        cache_directory (str, optional): Directory for the cached files. Defaults to
+            default_cache_directory().
+        timeout (float, optional): Seconds to wait for the server. Defaults to DEFAULT_TIMEOUT.
+
+    Raises:
+        OSError: If the data can neither be downloaded nor found in the cache (urllib.error.URLError
+            and urllib.error.HTTPError, for any status other than 304, are OSErrors)
+
+    Returns:
+        CachedData: Name of the cached file, its validator, and whether it changed
+    """
+    # Imported here, so that indices built from local data never load the HTTP client
+    import urllib.error  # pylint: disable=import-outside-toplevel
+    import urllib.request  # pylint: disable=import-outside-toplevel
+
+    if cache_directory is None:
+        cache_directory = default_cache_directory()
+    os.makedirs(cache_directory, exist_ok=True)
+    filenames = _cache_filenames(url, cache_directory)
+    meta = _read_meta(filenames['meta'], filenames['data'])
+    request = urllib.request.Request(url)
+    if meta.get('etag'):
+        request.add_header('If-None-Match', meta['etag'])
+    if meta.get('last_modified'):
+        request.add_header('If-Modified-Since', meta['last_modified'])
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:  # nosec B310
+            content = response.read()
+            headers = response.headers
+    except OSError as error:
+        if not meta:
+            raise
+        if not (isinstance(error, urllib.error.HTTPError) and error.code == 304):
+            log = logging.getLogger('body_part_index')
+            log.warning('Using cached body part data; could not get %s: %s', url, error)
+        return CachedData(filenames['data'], meta['validator'], False)
+    new_meta = {
+        'url': url,
+        'etag': headers.get('ETag', ''),
+        'last_modified': headers.get('Last-Modified', ''),
+    }
+    # Without either header, the content itself tells versions apart
+    new_meta['validator'] = (
+        new_meta['etag'] or new_meta['last_modified'] or hashlib.sha256(content).hexdigest()
+    )
+    _write_atomically(filenames['data'], content)
+    _write_atomically(filenames['meta'], json.dumps(new_meta).encode('utf-8'))
+    return CachedData(filenames['data'], new_meta['validator'], True)
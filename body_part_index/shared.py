@@ -0,0 +1,508 @@
+"""Read-only, memory-mapped index that many processes can share without copying."""
+import bisect
+import json
+import mmap
+import struct
+import weakref
+import zlib
+from array import array
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Set, Tuple
+
+from .body_part import BodyPart, Code
+from .text_search import TRIGRAM_LENGTH, trigrams
+
+SHARED_INDEX_MAGIC = b'BPSHM'
+SHARED_INDEX_FORMAT_VERSION = 2
+
+# Sections of the file, in order; all but "meta", "strings" and "texts" are arrays of int32
+_SECTIONS = (
+    'meta',
+    'strings',
+    'string_offsets',
+    'fields',
+    'code_offsets',
+    'codes',
+    'synonym_offsets',
+    'synonyms',
+    'children_offsets',
+    'children',
+    'part_of_children_offsets',
+    'part_of_children',
+    'positions',
+    'order',
+    'ends',
+    'id_keys',
+    'id_rows',
+    'code_keys',
+    'code_rows',
+    'code_text_keys',
+    'code_text_rows',
+    'texts',
+    'text_offsets',
+    'posting_offsets',
+    'postings',
+    'trigram_keys',
+    'trigram_rows',
+    'trigram_offsets',
+    'trigram_texts',
+)
+# Columns of the "fields" section, as string numbers (-1 for None)
+_FIELDS = (
+    'radlex_id',
+    'description',
+    'contained_by_id',
+    'unsided_id',
+    'left_id',
+    'right_id',
+    'part_of_id',
+    'sex_specific',
+)
+_HEADER = struct.Struct(f'<{len(SHARED_INDEX_MAGIC)}sBxxI')
+_SECTION_ENTRY = struct.Struct('<QQ')
+_ALIGNMENT = 8
+_NO_STRING = -1
+_CODE_SEPARATOR = '\x1f'
+_TEXT_SEPARATOR = b'\n'
+
+
+class _Strings:
+    """Collects the distinct strings of the index and numbers them."""
+
+    def __init__(self) -> None:
+        self.numbers: Dict[str, int] = {}
+
+    def number(self, text: Optional[str]) -> int:
+        if text is None:
+            return _NO_STRING
+        return self.numbers.setdefault(text, len(self.numbers))
+
+    def sections(self) -> Tuple[bytes, 'array[int]']:
+        blob = bytearray()
+        offsets = array('i', [0])
+        for text in self.numbers:
+            blob += text.encode('utf-8')
+            offsets.append(len(blob))
+        return (bytes(blob), offsets)
+
+
+def _hash(key: bytes) -> int:
+    return zlib.crc32(key)
+
+
+def _hash_table(
+    keys: Sequence[int], rows: Sequence[int], strings: _Strings
+) -> Tuple['array[int]', 'array[int]']:
+    """Lay out an open-addressing hash table from (the string numbers of) keys to rows."""
+    key_texts = list(strings.numbers)
+    capacity = 8
+    while capacity < 2 * len(keys):
+        capacity *= 2
+    slot_keys = array('i', [_NO_STRING]) * capacity
+    slot_rows = array('i', [0]) * capacity
+    for (key, row) in zip(keys, rows):
+        slot = _hash(key_texts[key].encode('utf-8')) & (capacity - 1)
+        while slot_keys[slot] != _NO_STRING:
+            slot = (slot + 1) & (capacity - 1)
+        slot_keys[slot] = key
+        slot_rows[slot] = row
+    return (slot_keys, slot_rows)
+
+
+def _group_offsets(groups: Sequence[Sequence[int]]) -> Tuple['array[int]', 'array[int]']:
+    offsets = array('i', [0])
+    members = array('i')
+    for group in groups:
+        members.extend(group)
+        offsets.append(len(members))
+    return (offsets, members)
+
+
+def write_shared_index(filename: str, snapshot: Dict) -> None:
+    """Write the data of an index (in the form saved to snapshots) in the shared index layout.
+
+    Every table is laid out as a flat array, so SharedBodyPartIndex can use the file in place,
+    through a memory map, without parsing or copying it. Integers are in native byte order, so the
+    file is meant for the machine (architecture) that wrote it.
+
+    Args:
+        filename (str): Name of the file to write
+        snapshot (Dict): Index data, as written to snapshots
+    """
+    strings = _Strings()
+    (
+        radlex_ids,
+        descriptions,
+        contained_by_ids,
+        codes,
+        synonyms,
+        unsided_ids,
+        left_ids,
+        right_ids,
+        part_of_ids,
+        sex_specifics,
+    ) = snapshot['columns']
+    row_count = len(radlex_ids)
+    fields = array('i')
+    for row in range(row_count):
+        for column in (
+            radlex_ids,
+            descriptions,
+            contained_by_ids,
+            unsided_ids,
+            left_ids,
+            right_ids,
+            part_of_ids,
+            sex_specifics,
+        ):
+            fields.append(strings.number(column[row]))
+    (code_offsets, code_numbers) = _group_offsets(
+        [[strings.number(text) for code in row_codes for text in code] for row_codes in codes]
+    )
+    (synonym_offsets, synonym_numbers) = _group_offsets(
+        [[strings.number(synonym) for synonym in row_synonyms or ()] for row_synonyms in synonyms]
+    )
+    rows = {radlex_id: row for (row, radlex_id) in enumerate(radlex_ids)}
+    (order_ids, ends, _) = snapshot['hierarchy']
+    order = array('i', (rows[radlex_id] for radlex_id in order_ids))
+    positions = array('i', [0]) * row_count
+    for (position, row) in enumerate(order):
+        positions[row] = position
+    id_keys = [strings.number(radlex_id) for radlex_id in radlex_ids]
+    code_keys = [
+        strings.number(f'{system}{_CODE_SEPARATOR}{code}')
+        for (system, code, _) in snapshot['code_index']
+    ]
+    code_text_keys = [strings.number(code) for code in snapshot['code_text_index']]
+    texts = list(snapshot['text_index'])
+    text_blob = bytearray()
+    text_offsets = array('i')
+    for text in texts:
+        text_offsets.append(len(text_blob))
+        text_blob += text.encode('utf-8') + _TEXT_SEPARATOR
+    text_offsets.append(len(text_blob))
+    (posting_offsets, postings) = _group_offsets([snapshot['text_index'][text] for text in texts])
+    # Trigram postings (to the numbers of the texts), so searches need not scan every text
+    trigram_texts: Dict[str, List[int]] = {}
+    for (number, text) in enumerate(texts):
+        for trigram in trigrams(text):
+            trigram_texts.setdefault(trigram, []).append(number)
+    trigram_keys = [strings.number(trigram) for trigram in trigram_texts]
+    (trigram_offsets, trigram_text_numbers) = _group_offsets(list(trigram_texts.values()))
+    meta = {'version': snapshot['version'], 'row_count': row_count}
+
+    sections: Dict[str, Any] = {
+        'fields': fields,
+        'code_offsets': code_offsets,
+        'codes': code_numbers,
+        'synonym_offsets': synonym_offsets,
+        'synonyms': synonym_numbers,
+        'positions': positions,
+        'order': order,
+        'ends': array('i', ends),
+        'texts': bytes(text_blob),
+        'text_offsets': text_offsets,
+        'posting_offsets': posting_offsets,
+        'postings': postings,
+        'trigram_offsets': trigram_offsets,
+        'trigram_texts': trigram_text_numbers,
+    }
+    (sections['children_offsets'], sections['children']) = map(
+        lambda data: array('i', data), snapshot['children_index']
+    )
+    (sections['part_of_children_offsets'], sections['part_of_children']) = map(
+        lambda data: array('i', data), snapshot['part_of_children_index']
+    )
+    (sections['id_keys'], sections['id_rows']) = _hash_table(id_keys, range(row_count), strings)
+    (sections['code_keys'], sections['code_rows']) = _hash_table(
+        code_keys, [row for (_, _, row) in snapshot['code_index']], strings
+    )
+    (sections['code_text_keys'], sections['code_text_rows']) = _hash_table(
+        code_text_keys, list(snapshot['code_text_index'].values()), strings
+    )
+    (sections['trigram_keys'], sections['trigram_rows']) = _hash_table(
+        trigram_keys, range(len(trigram_keys)), strings
+    )
+    # Strings are complete once every table has numbered its keys
+    (sections['strings'], sections['string_offsets']) = strings.sections()
+    sections['meta'] = json.dumps(meta).encode('utf-8')
+
+    position = _HEADER.size + len(_SECTIONS) * _SECTION_ENTRY.size
+    entries = []
+    blobs = []
+    for name in _SECTIONS:
+        data = sections[name]
+        data = data.tobytes() if isinstance(data, array) else data
+        padding = -position % _ALIGNMENT
+        blobs.append(bytes(padding) + data)
+        position += padding
+        entries.append(_SECTION_ENTRY.pack(position, len(data)))
+        position += len(data)
+    with open(filename, 'wb') as shared_file:
+        shared_file.write(
+            _HEADER.pack(SHARED_INDEX_MAGIC, SHARED_INDEX_FORMAT_VERSION, len(_SECTIONS))
+        )
+        shared_file.write(b''.join(entries))
+        shared_file.write(b''.join(blobs))
+
+
+class SharedBodyPartIndex:
+    """Read-only index over a file written by BodyPartIndex.save_shared_index(), used in place.
+
+    The file is memory-mapped, and every lookup reads the mapped tables directly, so opening it
+    takes constant time and every process mapping the same file shares one copy of the data in the
+    operating system's page cache (put the file on a tmpfs such as /dev/shm to keep it in memory).
+    BodyPart objects are created as they are used, and work just like those of a BodyPartIndex.
+
+    A SharedBodyPartIndex pickles as its file name, so it can be handed to multiprocessing workers,
+    which then map the same file.
+    """
+
+    def __init__(self, filename: str) -> None:
+        """Map a shared index file.
+
+        Args:
+            filename (str): Name of a file written by BodyPartIndex.save_shared_index()
+
+        Raises:
+            ValueError: If the file is not a shared index in a format this version can read
+        """
+        self.filename = filename
+        with open(filename, 'rb') as shared_file:
+            self._map = mmap.mmap(shared_file.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            (magic, format_version, section_count) = _HEADER.unpack_from(self._map)
+        except struct.error as error:
+            raise ValueError(f'{filename} is not a shared body part index') from error
+        if magic != SHARED_INDEX_MAGIC:
+            raise ValueError(f'{filename} is not a shared body part index')
+        if format_version != SHARED_INDEX_FORMAT_VERSION or section_count != len(_SECTIONS):
+            raise ValueError(
+                f'{filename} has an unsupported shared index format '
+                f'(expected {SHARED_INDEX_FORMAT_VERSION})'
+            )
+        self._sections: Dict[str, Tuple[int, int]] = {}
+        for (number, name) in enumerate(_SECTIONS):
+            self._sections[name] = _SECTION_ENTRY.unpack_from(
+                self._map, _HEADER.size + number * _SECTION_ENTRY.size
+            )
+        self._view = memoryview(self._map)
+        self._arrays: Dict[str, memoryview] = {
+            name: self._view[start:start + length].cast('i')
+            for (name, (start, length)) in self._sections.items()
+            if name not in ('meta', 'strings', 'texts')
+        }
+        self._strings_start = self._sections['strings'][0]
+        self._string_offsets = self._arrays['string_offsets']
+        (start, length) = self._sections['meta']
+        meta = json.loads(self._map[start:start + length])
+        self._version: Optional[str] = meta['version']
+        self._row_count: int = meta['row_count']
+        self._body_parts: 'weakref.WeakValueDictionary[int, BodyPart]' = (
+            weakref.WeakValueDictionary()
+        )
+
+    def __reduce__(self) -> Tuple[Any, ...]:
+        return (SharedBodyPartIndex, (self.filename,))
+
+    def close(self) -> None:
+        """Unmap the file; the index (and its BodyParts) cannot be used afterwards."""
+        for view in self._arrays.values():
+            view.release()
+        self._arrays.clear()
+        self._view.release()
+        self._map.close()
+
+    def __enter__(self) -> 'SharedBodyPartIndex':
+        return self
+
+    def __exit__(self, *_: Any) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        return self._row_count
+
+    @property
+    def version(self) -> Optional[str]:
+        """str: Version of the body part data, if known."""
+        return self._version
+
+    def _string(self, number: int) -> Optional[str]:
+        if number == _NO_STRING:
+            return None
+        (offsets, start) = (self._string_offsets, self._strings_start)
+        return self._map[start + offsets[number]:start + offsets[number + 1]].decode('utf-8')
+
+    def _required_string(self, number: int) -> str:
+        text = self._string(number)
+        assert text is not None, 'Missing string for a required field'
+        return text
+
+    def _find_row(self, table: str, key: str) -> Optional[int]:
+        slot_keys = self._arrays[f'{table}_keys']
+        capacity = len(slot_keys)
+        encoded = key.encode('utf-8')
+        (offsets, start) = (self._string_offsets, self._strings_start)
+        slot = _hash(encoded) & (capacity - 1)
+        number = slot_keys[slot]
+        while number != _NO_STRING:
+            (key_start, key_end) = (start + offsets[number], start + offsets[number + 1])
+            if key_end - key_start == len(encoded) and self._map[key_start:key_end] == encoded:
+                return self._arrays[f'{table}_rows'][slot]
+            slot = (slot + 1) & (capacity - 1)
+            number = slot_keys[slot]
+        return None
+
+    def _group(self, offsets_name: str, members_name: str, row: int) -> memoryview:
+        offsets = self._arrays[offsets_name]
+        return self._arrays[members_name][offsets[row]:offsets[row + 1]]
+
+    def _body_part(self, row: int) -> BodyPart:
+        body_part = self._body_parts.get(row)
+        if body_part is None:
+            fields = self._arrays['fields'][row * len(_FIELDS):(row + 1) * len(_FIELDS)]
+            (radlex_id, description, contained_by_id) = map(self._required_string, fields[:3])
+            related_ids = map(self._string, fields[3:])
+            code_numbers = self._group('code_offsets', 'codes', row)
+            codes = [
+                Code(
+                    self._required_string(code_numbers[i]),
+                    self._required_string(code_numbers[i + 1]),
+                )
+                for i in range(0, len(code_numbers), 2)
+            ]
+            synonyms = [
+                self._required_string(number)
+                for number in self._group('synonym_offsets', 'synonyms', row)
+            ]
+            (unsided_id, left_id, right_id, part_of_id, sex_specific) = related_ids
+            body_part = BodyPart(
+                self,
+                radlex_id,
+                description,
+                contained_by_id,
+                codes=codes,
+                synonyms=synonyms or None,
+                unsided_id=unsided_id,
+                left_id=left_id,
+                right_id=right_id,
+                part_of_id=part_of_id,
+                sex_specific=sex_specific,
+            )
+            self._body_parts[row] = body_part
+        return body_part
+
+    def _body_parts_for(self, rows: Iterable[int]) -> List[BodyPart]:
+        return [self._body_part(row) for row in rows]
+
+    def get_all_body_parts(self) -> Iterable[BodyPart]:
+        """Get all BodyParts in the index."""
+        return self._body_parts_for(range(self._row_count))
+
+    def get_by_id(self, radlex_id: str) -> BodyPart:
+        """Get BodyPart object by RadLex ID (see BodyPartIndex.get_by_id()).
+
+        Raises:
+            Exception: If no BodyPart with the given ID is found
+        """
+        row = self._find_row('id', radlex_id)
+        if row is None:
+            raise Exception(f'No BodyPart with ID {radlex_id}')
+        return self._body_part(row)
+
+    def get_children(self, radlex_id: str) -> Iterable[BodyPart]:
+        """Get the BodyParts directly contained by the BodyPart with the given RadLex ID."""
+        row = self._find_row('id', radlex_id)
+        if row is None:
+            return ()
+        return tuple(self._body_parts_for(self._group('children_offsets', 'children', row)))
+
+    def get_part_of_children(self, radlex_id: str) -> Iterable[BodyPart]:
+        """Get the BodyParts that are directly part of the BodyPart with the given RadLex ID."""
+        row = self._find_row('id', radlex_id)
+        if row is None:
+            return ()
+        group = self._group('part_of_children_offsets', 'part_of_children', row)
+        return tuple(self._body_parts_for(group))
+
+    def get_descendants(self, radlex_id: str) -> Iterable[BodyPart]:
+        """Get all the BodyParts contained (directly or indirectly) by the given one (pre-order)."""
+        row = self._find_row('id', radlex_id)
+        if row is None:
+            return []
+        position = self._arrays['positions'][row]
+        order = self._arrays['order']
+        return self._body_parts_for(order[position + 1:self._arrays['ends'][position]])
+
+    def is_ancestor(self, ancestor_id: str, descendant_id: str) -> bool:
+        """Check if one BodyPart contains (directly or indirectly) another."""
+        ancestor = self._find_row('id', ancestor_id)
+        descendant = self._find_row('id', descendant_id)
+        if ancestor is None or descendant is None:
+            return False
+        positions = self._arrays['positions']
+        (ancestor, descendant) = (positions[ancestor], positions[descendant])
+        return ancestor < descendant < self._arrays['ends'][ancestor]
+
+    def get_by_code(self, code: Code) -> Optional[BodyPart]:
+        """Get BodyPart object by code (or None if not found)."""
+        row = self._find_row('code', f'{code.system}{_CODE_SEPARATOR}{code.code}')
+        return self._body_part(row) if row is not None else None
+
+    def get(self, code_text_or_id: str) -> Optional[BodyPart]:
+        """Get BodyPart object by code (without system) or ID (or None if not found)."""
+        row = self._find_row('id', code_text_or_id)
+        if row is None:
+            row = self._find_row('code_text', code_text_or_id)
+        return self._body_part(row) if row is not None else None
+
+    def search(self, query: str) -> Iterable[BodyPart]:
+        """Search for BodyParts whose ID, description, synonyms or codes contain the query.
+
+        Matches the same BodyParts as BodyPartIndex.search(), using the mapped trigram postings.
+        """
+        encoded = query.encode('utf-8')
+        if _TEXT_SEPARATOR in encoded:
+            return set()
+        if len(query) < TRIGRAM_LENGTH:
+            # Too short to have a trigram; scan every text
+            texts: Iterable[int] = self._scanned_texts(encoded)
+        else:
+            texts = self._trigram_texts(query, encoded)
+        rows: Set[int] = set()
+        for text in texts:
+            rows.update(self._group('posting_offsets', 'postings', text))
+        return set(self._body_parts_for(rows))
+
+    def _trigram_texts(self, query: str, encoded: bytes) -> List[int]:
+        postings: List[memoryview] = []
+        for trigram in trigrams(query):
+            group = self._find_row('trigram', trigram)
+            if group is None:
+                return []
+            postings.append(self._group('trigram_offsets', 'trigram_texts', group))
+        postings.sort(key=len)
+        candidates = set(postings[0])
+        for posting in postings[1:]:
+            candidates.intersection_update(posting)
+            if not candidates:
+                return []
+        start = self._sections['texts'][0]
+        text_offsets = self._arrays['text_offsets']
+        # The trigrams only narrow down the texts; each candidate still needs a substring test
+        return [
+            text
+            for text in candidates
+            if encoded in self._map[start + text_offsets[text]:start + text_offsets[text + 1] - 1]
+        ]
+
+    def _scanned_texts(self, query: bytes) -> Iterator[int]:
+        (start, length) = self._sections['texts']
+        end = start + length
+        text_offsets = self._arrays['text_offsets']
+        found = self._map.find(query, start, end)
+        # An empty query also "matches" at the very end
+        while 0 <= found < end:
+            text = bisect.bisect_right(text_offsets, found - start) - 1
+            yield text
+            # Each text only needs to be found once
+            found = self._map.find(query, start + text_offsets[text + 1], end)
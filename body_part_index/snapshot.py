@@ -0,0 +1,125 @@
+"""Reading and writing binary snapshots of a prebuilt BodyPartIndex."""
+import hashlib
+import marshal
+import os
+from typing import BinaryIO, Dict, Optional
+
+from .streaming import BodyPartStream
+
+SNAPSHOT_MAGIC = b'BPIDX'
+SNAPSHOT_FORMAT_VERSION = 4
+
+_DATA_DIRECTORY = os.path.join(os.path.dirname(__file__), 'data')
+DEFAULT_JSON_FILENAME = os.path.join(_DATA_DIRECTORY, 'body_parts.json')
+DEFAULT_SNAPSHOT_FILENAME = os.path.join(_DATA_DIRECTORY, 'body_parts.snapshot')
+
+
+def json_digest(json_filename: str) -> str:
+    """Get the SHA-256 digest (in hex) of the contents of a JSON data file."""
+    digest = hashlib.sha256()
+    with open(json_filename, 'rb') as json_file:
+        for chunk in iter(lambda: json_file.read(1 << 16), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def read_json_version(json_filename: str) -> Optional[str]:
+    """Get the "$version" of a JSON data file, reading no further than needed to find it."""
+    with open(json_filename, encoding='utf-8') as json_file:
+        stream = BodyPartStream(json_file)
+        for _ in stream:
+            # "$version" normally comes before the body parts
+            if '$version' in stream.header:
+                break
+        return stream.header.get('$version')
+
+
+def write_snapshot(
+    snapshot_filename: str, snapshot: Dict, json_filename: Optional[str] = None
+) -> None:
+    """Write snapshot data (built-in types only) to a file.
+
+    The file starts with SNAPSHOT_MAGIC and the format version, followed by a header and the data,
+    both serialized with marshal, which loads plain containers and strings much faster than parsing
+    JSON. The header holds the version of the data and the SHA-256 digest of the JSON file it was
+    built from (if given), so the snapshot can be checked against that file without loading it.
+
+    Args:
+        snapshot_filename (str): Name of the file to write
+        snapshot (Dict): Data to save
+        json_filename (str, optional): Name of the JSON data file the snapshot was built from
+    """
+    header = {
+        'version': snapshot.get('version'),
+        'json_digest': json_digest(json_filename) if json_filename is not None else None,
+    }
+    with open(snapshot_filename, 'wb') as snapshot_file:
+        snapshot_file.write(SNAPSHOT_MAGIC + bytes([SNAPSHOT_FORMAT_VERSION]))
+        marshal.dump(header, snapshot_file)
+        marshal.dump(snapshot, snapshot_file)
+
+
+def _read_header(snapshot_filename: str, snapshot_file: BinaryIO) -> Dict:
+    header = snapshot_file.read(len(SNAPSHOT_MAGIC) + 1)
+    if header[:len(SNAPSHOT_MAGIC)] != SNAPSHOT_MAGIC:
+        raise ValueError(f'{snapshot_filename} is not a body part index snapshot')
+    if header[len(SNAPSHOT_MAGIC):] != bytes([SNAPSHOT_FORMAT_VERSION]):
+        raise ValueError(
+            f'{snapshot_filename} has an unsupported snapshot format (expected {SNAPSHOT_FORMAT_VERSION})'
+        )
+    snapshot_header = marshal.load(snapshot_file)
+    if not isinstance(snapshot_header, dict):
+        raise ValueError(f'{snapshot_filename} does not have a snapshot header')
+    return snapshot_header
+
+
+def read_snapshot_header(snapshot_filename: str) -> Dict:
+    """Read the header written by write_snapshot(), without loading the data.
+
+    Args:
+        snapshot_filename (str): Name of the snapshot file
+
+    Raises:
+        ValueError: If the file is not a snapshot, or has a format this version cannot read
+
+    Returns:
+        Dict: The version of the data ("version") and the digest of its JSON file ("json_digest")
+    """
+    with open(snapshot_filename, 'rb') as snapshot_file:
+        return _read_header(snapshot_filename, snapshot_file)
+
+
+def read_snapshot(snapshot_filename: str) -> Dict:
+    """Read snapshot data written by write_snapshot().
+
+    Args:
+        snapshot_filename (str): Name of the snapshot file
+
+    Raises:
+        ValueError: If the file is not a snapshot, or has a format this version cannot read
+
+    Returns:
+        Dict: The snapshot data
+    """
+    with open(snapshot_filename, 'rb') as snapshot_file:
+        _read_header(snapshot_filename, snapshot_file)
+        snapshot = marshal.load(snapshot_file)
+    if not isinstance(snapshot, dict):
+        raise ValueError(f'{snapshot_filename} does not contain snapshot data')
+    return snapshot
+
+
+def is_default_snapshot_current() -> bool:
+    """Check if the packaged snapshot exists and was built from the packaged JSON data as it is now.
+
+    Both the "$version" and the SHA-256 digest of the JSON file recorded in the snapshot header
+    must match the packaged JSON file; modification times are not reliable once the files have been
+    copied around by packaging tools.
+    """
+    try:
+        header = read_snapshot_header(DEFAULT_SNAPSHOT_FILENAME)
+        if header.get('json_digest') != json_digest(DEFAULT_JSON_FILENAME):
+            return False
+        return header.get('version') == read_json_version(DEFAULT_JSON_FILENAME)
+    except (OSError, ValueError, EOFError, TypeError):
+        return False
@@ -0,0 +1,142 @@
+"""Incremental parsing of body part JSON files too large to load as a whole."""
+import json
+from typing import Any, Dict, Iterator, List, TextIO
+
+DEFAULT_CHUNK_SIZE = 1 << 16
+# Largest value (in characters) to keep reading for; body part entries are well under a kilobyte
+DEFAULT_MAX_VALUE_SIZE = 1 << 20
+
+# A value cut off by the end of the buffer fails to decode at most this far from the end (e.g., at
+# the start of "fals" or "\\u12"), except for a string, which fails where the string starts
+_TRUNCATION_MARGIN = 16
+_UNTERMINATED_STRING = 'Unterminated string'
+
+_WHITESPACE = ' \t\n\r'
+
+
+class BodyPartStream:
+    """Iterates over the "bodyParts" entries of a JSON data file, reading it a chunk at a time.
+
+    Only the entry being parsed (and one chunk of the file) is held in memory, so a file of any
+    size can be fed into an index entry by entry. The other top-level members of the document
+    (e.g., "$version") are collected in header as they are read; since they may come after the
+    body parts, header is only complete once iteration has finished.
+    """
+
+    def __init__(
+        self,
+        json_file: TextIO,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        max_value_size: int = DEFAULT_MAX_VALUE_SIZE,
+    ) -> None:
+        """Prepare to stream the body parts of an open JSON file.
+
+        Args:
+            json_file (TextIO): File (opened in text mode) with a document in the format of the
+                packaged JSON data
+            chunk_size (int, optional): Number of characters to read at a time. Defaults to
+                DEFAULT_CHUNK_SIZE.
+            max_value_size (int, optional): Number of characters an entry (or header member) may
+                take before it is rejected as malformed, so that a broken file is not read into
+                memory looking for its end. Defaults to DEFAULT_MAX_VALUE_SIZE.
+        """
+        self.header: Dict[str, Any] = {}
+        self._file = json_file
+        self._chunk_size = chunk_size
+        self._max_value_size = max_value_size
+        self._decoder = json.JSONDecoder()
+        self._buffer = ''
+        self._position = 0
+        self._at_end = False
+
+    def _read_more(self, at_least: int = 1) -> bool:
+        """Read at least one chunk and at least the given number of characters, if there are any."""
+        if self._at_end:
+            return False
+        chunks: List[str] = []
+        size = 0
+        while size < at_least or not chunks:
+            chunk = self._file.read(self._chunk_size)
+            if not chunk:
+                self._at_end = True
+                break
+            chunks.append(chunk)
+            size += len(chunk)
+        if not chunks:
+            return False
+        # Drop what has been parsed already, so the buffer never grows much beyond a chunk
+        self._buffer = ''.join([self._buffer[self._position:], *chunks])
+        self._position = 0
+        return True
+
+    def _next_character(self) -> str:
+        """Skip whitespace and get the next character (without consuming it), or '' at the end."""
+        while True:
+            buffer = self._buffer
+            while self._position < len(buffer) and buffer[self._position] in _WHITESPACE:
+                self._position += 1
+            if self._position < len(buffer):
+                return buffer[self._position]
+            if not self._read_more():
+                return ''
+
+    def _expect(self, characters: str) -> str:
+        character = self._next_character()
+        if not character or character not in characters:
+            found = repr(character) if character else 'end of file'
+            raise ValueError(f'Expected one of {characters!r} in body part JSON, found {found}')
+        self._position += 1
+        return character
+
+    def _value(self) -> Any:
+        self._next_character()
+        while True:
+            try:
+                (value, end) = self._decoder.raw_decode(self._buffer, self._position)
+            except json.JSONDecodeError as error:
+                # Doubling the unparsed tail on every retry keeps the copying linear in its size
+                tail_size = len(self._buffer) - self._position
+                if not self._may_continue(error) or not self._read_more(tail_size):
+                    raise ValueError(f'Invalid body part JSON: {error}') from error
+                continue
+            # A number at the very end of the buffer may still have more digits to come
+            if end == len(self._buffer) and self._read_more():
+                continue
+            self._position = end
+            return value
+
+    def _may_continue(self, error: json.JSONDecodeError) -> bool:
+        """Check if more of the file could fix a decoding error, i.e., the value was cut off."""
+        if len(self._buffer) - self._position >= self._max_value_size:
+            return False
+        return (
+            error.msg.startswith(_UNTERMINATED_STRING)
+            or error.pos >= len(self._buffer) - _TRUNCATION_MARGIN
+        )
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        self._expect('{')
+        if self._next_character() == '}':
+            self._position += 1
+            return
+        while True:
+            key = self._value()
+            if not isinstance(key, str):
+                raise ValueError(f'Expected a member name in body part JSON, found {key!r}')
+            self._expect(':')
+            if key == 'bodyParts':
+                yield from self._body_parts()
+            else:
+                self.header[key] = self._value()
+            if self._expect(',}') == '}':
+                return
+
+    def _body_parts(self) -> Iterator[Dict[str, Any]]:
+        self._expect('[')
+        if self._next_character() == ']':
+            self._position += 1
+            return
+        while True:
+            yield self._value()
+            if self._expect(',]') == ']':
+                return
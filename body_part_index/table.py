@@ -0,0 +1,330 @@
+"""Columnar storage of the raw fields of BodyParts."""
+import sys
+from array import array
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from .body_part import Code
+
+# Raw fields stored for each body part, in the order of the positional BodyPart arguments
+COLUMNS = (
+    'radlex_id',
+    'description',
+    'contained_by_id',
+    'codes',
+    'synonyms',
+    'unsided_id',
+    'left_id',
+    'right_id',
+    'part_of_id',
+    'sex_specific',
+)
+
+
+class BodyPartTable:
+    """Parallel columns holding the fields of every body part, one row per body part.
+
+    The table lets an index keep its lookup tables in terms of row numbers, and create BodyPart
+    objects only for the rows somebody actually asks for.
+    """
+
+    def __init__(self) -> None:
+        self.radlex_ids: List[str] = []
+        self.descriptions: List[str] = []
+        self.contained_by_ids: List[str] = []
+        self.codes: List[List[Code]] = []
+        self.synonyms: List[Optional[List[str]]] = []
+        self.unsided_ids: List[Optional[str]] = []
+        self.left_ids: List[Optional[str]] = []
+        self.right_ids: List[Optional[str]] = []
+        self.part_of_ids: List[Optional[str]] = []
+        self.sex_specifics: List[Optional[str]] = []
+        self.rows: Dict[str, int] = {}
+        # One shared Code object for each distinct code in the table
+        self._shared_codes: Dict[Code, Code] = {}
+
+    def __len__(self) -> int:
+        return len(self.radlex_ids)
+
+    def _columns(self) -> Tuple[List[Any], ...]:
+        return (
+            self.radlex_ids,
+            self.descriptions,
+            self.contained_by_ids,
+            self.codes,
+            self.synonyms,
+            self.unsided_ids,
+            self.left_ids,
+            self.right_ids,
+            self.part_of_ids,
+            self.sex_specifics,
+        )
+
+    def append(
+        self,
+        radlex_id: str,
+        description: str,
+        contained_by_id: str,
+        /,
+        codes: Optional[Iterable[Code]] = None,
+        synonyms: Optional[List[str]] = None,
+        unsided_id: Optional[str] = None,
+        left_id: Optional[str] = None,
+        right_id: Optional[str] = None,
+        part_of_id: Optional[str] = None,
+        sex_specific: Optional[str] = None,
+    ) -> int:
+        """Add a row, taking the same arguments as the BodyPartData constructor.
+
+        Returns:
+            int: Number of the new row
+        """
+        row = len(self.radlex_ids)
+        values = self._row_values(
+            radlex_id,
+            description,
+            contained_by_id,
+            codes,
+            synonyms,
+            unsided_id,
+            left_id,
+            right_id,
+            part_of_id,
+            sex_specific,
+        )
+        for column, value in zip(self._columns(), values):
+            column.append(value)
+        self.rows[radlex_id] = row
+        return row
+
+    def replace(
+        self,
+        row: int,
+        radlex_id: str,
+        description: str,
+        contained_by_id: str,
+        /,
+        codes: Optional[Iterable[Code]] = None,
+        synonyms: Optional[List[str]] = None,
+        unsided_id: Optional[str] = None,
+        left_id: Optional[str] = None,
+        right_id: Optional[str] = None,
+        part_of_id: Optional[str] = None,
+        sex_specific: Optional[str] = None,
+    ) -> None:
+        """Replace the fields of a row (keeping its RadLex ID), taking the arguments of append().
+
+        Raises:
+            ValueError: If radlex_id is not the ID of the row
+        """
+        if self.radlex_ids[row] != radlex_id:
+            raise ValueError(f'Row {row} holds {self.radlex_ids[row]}, not {radlex_id}')
+        values = self._row_values(
+            radlex_id,
+            description,
+            contained_by_id,
+            codes,
+            synonyms,
+            unsided_id,
+            left_id,
+            right_id,
+            part_of_id,
+            sex_specific,
+        )
+        for column, value in zip(self._columns(), values):
+            column[row] = value
+
+    def remove(self, row: int) -> Optional[int]:
+        """Remove a row by moving the last row into its place, so no other row is renumbered.
+
+        Returns:
+            Optional[int]: Former number of the row moved into the place of the removed one (None if
+                the removed row was the last one)
+        """
+        last_row = len(self.radlex_ids) - 1
+        del self.rows[self.radlex_ids[row]]
+        for column in self._columns():
+            if row != last_row:
+                column[row] = column[last_row]
+            column.pop()
+        if row == last_row:
+            return None
+        self.rows[self.radlex_ids[row]] = row
+        return last_row
+
+    def _row_values(
+        self,
+        radlex_id: str,
+        description: str,
+        contained_by_id: str,
+        codes: Optional[Iterable[Code]],
+        synonyms: Optional[List[str]],
+        unsided_id: Optional[str],
+        left_id: Optional[str],
+        right_id: Optional[str],
+        part_of_id: Optional[str],
+        sex_specific: Optional[str],
+    ) -> Tuple[Any, ...]:
+        # IDs and code systems repeat across rows, so every row refers to a single copy of each
+        return (
+            _intern(radlex_id),
+            description,
+            _intern(contained_by_id),
+            self._share_codes(codes or ()),
+            list(synonyms) if synonyms else None,
+            _intern(unsided_id),
+            _intern(left_id),
+            _intern(right_id),
+            _intern(part_of_id),
+            _intern(sex_specific),
+        )
+
+    def share_code(self, code: Code) -> Code:
+        """Get the Code object the table uses for a code, so that equal codes are stored once."""
+        shared_code = self._shared_codes.get(code)
+        if shared_code is None:
+            shared_code = Code(sys.intern(code.system), code.code)
+            self._shared_codes[shared_code] = shared_code
+        return shared_code
+
+    def _share_codes(self, codes: Iterable[Code]) -> List[Code]:
+        return [self.share_code(code) for code in codes]
+
+    def fields(self, row: int) -> Tuple[Any, ...]:
+        """Get the fields of a row, as positional BodyPart constructor arguments (after the index).
+
+        The lists of codes and synonyms are the table's own, so BodyParts share them with the table.
+        """
+        return (
+            self.radlex_ids[row],
+            self.descriptions[row],
+            self.contained_by_ids[row],
+            self.codes[row],
+            self.synonyms[row],
+            self.unsided_ids[row],
+            self.left_ids[row],
+            self.right_ids[row],
+            self.part_of_ids[row],
+            self.sex_specifics[row],
+        )
+
+    def to_json_dict(self, row: int) -> Dict[str, Any]:
+        """Get the fields of a row as an entry of the JSON data (see params_from_json_dict())."""
+        body_part_dict: Dict[str, Any] = {
+            'radlexId': self.radlex_ids[row],
+            'description': self.descriptions[row],
+            'containedById': self.contained_by_ids[row],
+        }
+        if self.codes[row]:
+            body_part_dict['codes'] = [
+                {'system': code.system, 'code': code.code} for code in self.codes[row]
+            ]
+        synonyms = self.synonyms[row]
+        if synonyms:
+            body_part_dict['synonyms'] = list(synonyms)
+        for (key, value) in (
+            ('unsidedId', self.unsided_ids[row]),
+            ('leftId', self.left_ids[row]),
+            ('rightId', self.right_ids[row]),
+            ('partOfId', self.part_of_ids[row]),
+            ('sexSpecific', self.sex_specifics[row]),
+        ):
+            if value is not None:
+                body_part_dict[key] = value
+        return body_part_dict
+
+    def describe(self, row: int) -> str:
+        """Get the same text as str() of the BodyPart in a row."""
+        return f'{self.radlex_ids[row]}: {self.descriptions[row]}'
+
+    def to_columns(self) -> Tuple[List[Any], ...]:
+        """Get the columns (in COLUMNS order) as lists of built-in types, for serialization."""
+        codes = [[tuple(code) for code in row_codes] for row_codes in self.codes]
+        return tuple(codes if column is self.codes else column for column in self._columns())
+
+    @classmethod
+    def from_columns(cls, columns: Sequence[List[Any]]) -> 'BodyPartTable':
+        """Recreate a table from the columns returned by to_columns().
+
+        Args:
+            columns (Sequence[List[Any]]): Columns in COLUMNS order
+
+        Returns:
+            BodyPartTable: Table holding the columns
+        """
+        table = cls()
+        (
+            radlex_ids,
+            table.descriptions,
+            contained_by_ids,
+            codes,
+            synonyms,
+            unsided_ids,
+            left_ids,
+            right_ids,
+            part_of_ids,
+            sex_specifics,
+        ) = columns
+        table.radlex_ids = [sys.intern(radlex_id) for radlex_id in radlex_ids]
+        table.contained_by_ids = [sys.intern(radlex_id) for radlex_id in contained_by_ids]
+        table.codes = [table._share_codes(Code(*code) for code in row_codes) for row_codes in codes]
+        table.synonyms = [list(names) if names else None for names in synonyms]
+        table.unsided_ids = list(map(_intern, unsided_ids))
+        table.left_ids = list(map(_intern, left_ids))
+        table.right_ids = list(map(_intern, right_ids))
+        table.part_of_ids = list(map(_intern, part_of_ids))
+        table.sex_specifics = list(map(_intern, sex_specifics))
+        table.rows = {radlex_id: row for (row, radlex_id) in enumerate(table.radlex_ids)}
+        return table
+
+
+def _intern(text: Optional[str]) -> Optional[str]:
+    return sys.intern(text) if text is not None else None
+
+
+class RowGroups:
+    """Rows grouped under other rows (e.g., children under their container), as two int arrays.
+
+    The rows of every group are stored back to back in one flat array, with a second array holding
+    where each group starts; a group costs 4 bytes per member plus 4 bytes, instead of a list object
+    (and an int object per member) for each group.
+    """
+
+    def __init__(self, offsets: 'array[int]', members: 'array[int]') -> None:
+        self._offsets = offsets
+        self._members = members
+
+    @classmethod
+    def from_pairs(cls, group_count: int, pairs: Iterable[Tuple[int, int]]) -> 'RowGroups':
+        """Group rows from (group, member) pairs, keeping the members of a group in pair order.
+
+        Args:
+            group_count (int): Number of groups (i.e., rows in the table)
+            pairs (Iterable[Tuple[int, int]]): (group row, member row) pairs
+
+        Returns:
+            RowGroups: Members of each group
+        """
+        pairs = list(pairs)
+        offsets = array('i', bytes(4 * (group_count + 1)))
+        for (group, _) in pairs:
+            offsets[group + 1] += 1
+        for group in range(group_count):
+            offsets[group + 1] += offsets[group]
+        members = array('i', bytes(4 * len(pairs)))
+        next_slot = offsets[:-1]
+        for (group, member) in pairs:
+            members[next_slot[group]] = member
+            next_slot[group] += 1
+        return cls(offsets, members)
+
+    def __getitem__(self, group: int) -> 'array[int]':
+        return self._members[self._offsets[group]:self._offsets[group + 1]]
+
+    def to_bytes(self) -> Tuple[bytes, bytes]:
+        """Get the two arrays as bytes, for serialization."""
+        return (self._offsets.tobytes(), self._members.tobytes())
+
+    @classmethod
+    def from_bytes(cls, offsets: bytes, members: bytes) -> 'RowGroups':
+        """Recreate the groups from the bytes returned by to_bytes()."""
+        return cls(array('i', offsets), array('i', members))
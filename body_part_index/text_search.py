@@ -0,0 +1,227 @@
+"""Text search structures used by BodyPartIndex."""
+import heapq
+import math
+import re
+from typing import Dict, Iterable, List, Set, Tuple
+
+TRIGRAM_LENGTH = 3
+
+# How strongly an exact match on a whole field outranks partial (token) matches
+EXACT_DESCRIPTION_MATCH = 2
+EXACT_SYNONYM_MATCH = 1
+TOKEN_MATCH = 0
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+_NON_WORD_PATTERN = re.compile(r'[\W_]+')
+
+
+def normalize(text: str) -> str:
+    """Normalize a text for case- and punctuation-insensitive matching."""
+    return _NON_WORD_PATTERN.sub(' ', text.casefold()).strip()
+
+
+def tokenize(text: str) -> List[str]:
+    """Split a text into normalized tokens."""
+    return normalize(text).split()
+
+
+def trigrams(text: str) -> Set[str]:
+    """Get the set of (overlapping) three-character substrings of a text."""
+    return {text[i:i + TRIGRAM_LENGTH] for i in range(len(text) - TRIGRAM_LENGTH + 1)}
+
+
+class TrigramIndex:
+    """Posting lists from each trigram to the texts that contain it.
+
+    A text can only contain a query if it contains every trigram of the query, so intersecting the
+    postings of the query's trigrams gives a (usually very small) set of candidate texts, which then
+    only need to be checked with a plain substring test.
+    """
+
+    def __init__(self) -> None:
+        self._texts: Set[str] = set()
+        self._pending: List[str] = []
+        self._postings: Dict[str, Set[str]] = {}
+
+    def __len__(self) -> int:
+        return len(self._texts)
+
+    def add(self, text: str) -> None:
+        """Add a text to the index (adding a text twice has no effect)."""
+        if text not in self._texts:
+            self._texts.add(text)
+            self._pending.append(text)
+
+    def update(self, texts: Iterable[str]) -> None:
+        """Add several texts to the index."""
+        for text in texts:
+            self.add(text)
+
+    def discard(self, text: str) -> None:
+        """Remove a text from the index (if it is there)."""
+        if text not in self._texts:
+            return
+        self._texts.remove(text)
+        # A pending text is skipped when the postings are built, so only indexed ones need removing
+        for trigram in trigrams(text):
+            posting = self._postings.get(trigram)
+            if posting is not None:
+                posting.discard(text)
+                if not posting:
+                    del self._postings[trigram]
+
+    def index_pending(self) -> None:
+        """Build the postings of the texts added since the last search now.
+
+        Searches do this on demand, so loading stays cheap; call it up front to make later searches
+        read-only (e.g., before sharing the index between threads).
+        """
+        postings = self._postings
+        for text in self._pending:
+            if text not in self._texts:
+                continue
+            for trigram in trigrams(text):
+                posting = postings.get(trigram)
+                if posting is None:
+                    postings[trigram] = {text}
+                else:
+                    posting.add(text)
+        self._pending.clear()
+
+    def find(self, query: str) -> Iterable[str]:
+        """Find the indexed texts containing the query as a substring.
+
+        Args:
+            query (str): Substring to look for
+
+        Returns:
+            Iterable[str]: Indexed texts containing the query
+        """
+        if len(query) < TRIGRAM_LENGTH:
+            # Too short to have a trigram; check every text
+            return [text for text in self._texts if query in text]
+        if self._pending:
+            self.index_pending()
+        postings: List[Set[str]] = []
+        for trigram in trigrams(query):
+            posting = self._postings.get(trigram)
+            if posting is None:
+                return []
+            postings.append(posting)
+        postings.sort(key=len)
+        candidates = set(postings[0])
+        for posting in postings[1:]:
+            candidates.intersection_update(posting)
+            if not candidates:
+                return []
+        return [text for text in candidates if query in text]
+
+
+class InvertedIndex:
+    """Token posting lists over documents made of several text fields, with ranked retrieval.
+
+    Documents are ranked first by the best exact (normalized) match of the whole query against one
+    of their fields (see EXACT_DESCRIPTION_MATCH and EXACT_SYNONYM_MATCH), then by the BM25 weight
+    of the query tokens they contain.
+    """
+
+    def __init__(self) -> None:
+        # Fields waiting to be tokenized, by document
+        self._pending: Dict[str, List[Tuple[str, int]]] = {}
+        self._postings: Dict[str, Dict[str, int]] = {}
+        self._exact_matches: Dict[str, Dict[str, int]] = {}
+        self._document_lengths: Dict[str, int] = {}
+        self._total_length = 0
+
+    def __len__(self) -> int:
+        if self._pending:
+            self.index_pending()
+        return len(self._document_lengths)
+
+    def add(self, document_id: str, text: str, exact_match: int = TOKEN_MATCH) -> None:
+        """Add a text field to a document.
+
+        Args:
+            document_id (str): Identifier of the document the field belongs to
+            text (str): Text of the field
+            exact_match (int, optional): Rank given to the document when a query matches the whole
+                field exactly. Defaults to TOKEN_MATCH.
+        """
+        self._pending.setdefault(document_id, []).append((text, exact_match))
+
+    def remove(self, document_id: str, texts: Iterable[str]) -> None:
+        """Remove a document from the index.
+
+        Args:
+            document_id (str): Identifier of the document
+            texts (Iterable[str]): Text of every field added to the document
+        """
+        self._pending.pop(document_id, None)
+        if document_id not in self._document_lengths:
+            return
+        for text in texts:
+            tokens = tokenize(text)
+            for token in tokens:
+                posting = self._postings.get(token)
+                if posting is not None and posting.pop(document_id, None) is not None:
+                    if not posting:
+                        del self._postings[token]
+            matches = self._exact_matches.get(' '.join(tokens))
+            if matches is not None and matches.pop(document_id, None) is not None:
+                if not matches:
+                    del self._exact_matches[' '.join(tokens)]
+        self._total_length -= self._document_lengths.pop(document_id)
+
+    def index_pending(self) -> None:
+        """Tokenize the fields added since the last search now (see TrigramIndex.index_pending())."""
+        for (document_id, fields) in self._pending.items():
+            for (text, exact_match) in fields:
+                self._index_field(document_id, text, exact_match)
+        self._pending.clear()
+
+    def _index_field(self, document_id: str, text: str, exact_match: int) -> None:
+        tokens = tokenize(text)
+        for token in tokens:
+            posting = self._postings.setdefault(token, {})
+            posting[document_id] = posting.get(document_id, 0) + 1
+        self._document_lengths[document_id] = self._document_lengths.get(document_id, 0) + len(tokens)
+        self._total_length += len(tokens)
+        if exact_match > TOKEN_MATCH and tokens:
+            matches = self._exact_matches.setdefault(' '.join(tokens), {})
+            matches[document_id] = max(matches.get(document_id, TOKEN_MATCH), exact_match)
+
+    def search(self, query: str, limit: int) -> List[str]:
+        """Get the documents best matching a query.
+
+        Args:
+            query (str): Free-text query
+            limit (int): Maximum number of documents to return
+
+        Returns:
+            List[str]: IDs of the best matching documents, best first
+        """
+        if self._pending:
+            self.index_pending()
+        tokens = tokenize(query)
+        if not tokens or not self._document_lengths:
+            return []
+        document_count = len(self._document_lengths)
+        average_length = self._total_length / document_count or 1.0
+        scores: Dict[str, float] = {}
+        for token in dict.fromkeys(tokens):
+            posting = self._postings.get(token)
+            if posting is None:
+                continue
+            idf = math.log(1.0 + (document_count - len(posting) + 0.5) / (len(posting) + 0.5))
+            for document_id, frequency in posting.items():
+                length_norm = 1.0 - BM25_B + BM25_B * self._document_lengths[document_id] / average_length
+                weight = idf * frequency * (BM25_K1 + 1.0) / (frequency + BM25_K1 * length_norm)
+                scores[document_id] = scores.get(document_id, 0.0) + weight
+        exact_matches = self._exact_matches.get(' '.join(tokens), {})
+
+        def rank(document_id: str) -> Tuple[int, float]:
+            return (exact_matches.get(document_id, TOKEN_MATCH), scores[document_id])
+
+        return heapq.nlargest(limit, scores, key=rank)
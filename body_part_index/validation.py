@@ -0,0 +1,152 @@
+"""Checks of the references between body parts, in time linear in the number of body parts."""
+from typing import Dict, List, NamedTuple, Optional, Sequence
+
+from .body_part import WHOLE_BODY_ID
+from .table import BodyPartTable
+
+# Kinds of problems
+DANGLING_REFERENCE = 'dangling reference'
+CYCLE = 'cycle'
+ORPHAN = 'orphan'
+
+# Fields referring to other body parts, with the name of their column in BodyPartTable
+REFERENCES = {
+    'contained_by_id': 'contained_by_ids',
+    'part_of_id': 'part_of_ids',
+    'left_id': 'left_ids',
+    'right_id': 'right_ids',
+    'unsided_id': 'unsided_ids',
+}
+
+# State of a body part while looking for cycles and for the root of its tree
+_UNVISITED = -1
+_ON_PATH = -2
+_REACHES_ROOT = 0
+_ORPHANED = 1
+
+
+class IntegrityProblem(NamedTuple):
+    """An IntegrityProblem is a tuple of (kind, radlex_id, message) for a problem in the data.
+
+    The kind is DANGLING_REFERENCE (a field refers to a body part that is not there), CYCLE (the
+    body part is on a cycle of contained_by_id or part_of_id references) or ORPHAN (the body part
+    is the top of a tree of body parts that are not contained by the whole body).
+    """
+
+    kind: str
+    radlex_id: str
+    message: str
+
+    def __str__(self) -> str:
+        return f'{self.radlex_id}: {self.message}'
+
+
+def find_problems(table: BodyPartTable) -> List[IntegrityProblem]:
+    """Find dangling references, containment cycles and orphans among the rows of a table.
+
+    Every row is visited a constant number of times per check, so this takes O(N) time for N rows.
+    (Duplicate IDs cannot get into a table: BodyPartIndex rejects them while loading.)
+
+    Args:
+        table (BodyPartTable): Table of body parts to check
+
+    Returns:
+        List[IntegrityProblem]: Problems found (empty if none), by kind and then in row order
+    """
+    problems: List[IntegrityProblem] = []
+    rows = table.rows
+    for (field, column_name) in REFERENCES.items():
+        for (row, referenced_id) in enumerate(getattr(table, column_name)):
+            if referenced_id is not None and referenced_id not in rows:
+                problems.append(
+                    IntegrityProblem(
+                        DANGLING_REFERENCE,
+                        table.radlex_ids[row],
+                        f'{field} refers to missing body part {referenced_id}',
+                    )
+                )
+    for (field, parents) in (
+        ('contained_by_id', _parent_rows(table, table.contained_by_ids)),
+        ('part_of_id', _parent_rows(table, table.part_of_ids)),
+    ):
+        problems += _find_cycles(table, field, parents)
+    problems += _find_orphans(table)
+    return problems
+
+
+def _parent_rows(table: BodyPartTable, parent_ids: Sequence[Optional[str]]) -> List[int]:
+    # Row of the parent of each row, or -1 for none (a missing parent, or the whole body, which is
+    # its own container)
+    rows = table.rows
+    return [
+        -1 if parent_id not in rows or parent_id == radlex_id == WHOLE_BODY_ID else rows[parent_id]
+        for (radlex_id, parent_id) in zip(table.radlex_ids, parent_ids)
+    ]
+
+
+def _find_cycles(table: BodyPartTable, field: str, parents: List[int]) -> List[IntegrityProblem]:
+    # Each row has at most one parent, so following parents from each unvisited row either ends,
+    # joins an earlier path, or runs into itself (a cycle); every row is followed only once
+    problems: List[IntegrityProblem] = []
+    visited_in = [_UNVISITED] * len(parents)
+    for start in range(len(parents)):
+        row = start
+        while row >= 0 and visited_in[row] == _UNVISITED:
+            visited_in[row] = start
+            row = parents[row]
+        if row >= 0 and visited_in[row] == start:
+            cycle = [table.radlex_ids[row]]
+            member = parents[row]
+            while member != row:
+                cycle.append(table.radlex_ids[member])
+                member = parents[member]
+            problems.append(
+                IntegrityProblem(
+                    CYCLE, cycle[0], f'{field} references form a cycle: {" -> ".join(cycle)}'
+                )
+            )
+    return problems
+
+
+def _find_orphans(table: BodyPartTable) -> List[IntegrityProblem]:
+    rows = table.rows
+    parents = _parent_rows(table, table.contained_by_ids)
+    whole_body_row = rows.get(WHOLE_BODY_ID, -1)
+    state = [_UNVISITED] * len(parents)
+    # Top of the tree each orphaned row hangs from, and the number of rows in that tree
+    tops: Dict[int, int] = {}
+    top_of = [-1] * len(parents)
+    for start in range(len(parents)):
+        path: List[int] = []
+        row = start
+        while row >= 0 and state[row] == _UNVISITED:
+            state[row] = _ON_PATH
+            path.append(row)
+            row = parents[row]
+        if row < 0:
+            # The path ended at a row without a (present) container
+            top = path[-1]
+            reached = _REACHES_ROOT if top == whole_body_row else _ORPHANED
+        elif state[row] == _ON_PATH:
+            # A cycle hangs from nothing, so the row closing it stands for the top of the tree
+            (top, reached) = (row, _ORPHANED)
+        else:
+            (top, reached) = (top_of[row], state[row])
+        for member in path:
+            state[member] = reached
+            top_of[member] = top
+            if reached == _ORPHANED:
+                tops[top] = tops.get(top, 0) + 1
+    problems = []
+    for (top, count) in sorted(tops.items()):
+        container_id = table.contained_by_ids[top]
+        reason = f'its container {container_id} is missing' if parents[top] < 0 else 'a cycle'
+        problems.append(
+            IntegrityProblem(
+                ORPHAN,
+                table.radlex_ids[top],
+                f'not contained by {WHOLE_BODY_ID} because of {reason}, so {count} body part(s) '
+                'are outside the hierarchy',
+            )
+        )
+    return problems
@@ -1,6 +1,9 @@
 # pylint: disable=missing-module-docstring
 import os
 import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Iterator, List, Optional
 import pytest
 
 from body_part_index.body_part_index import BodyPartIndex
@@ -32,3 +35,61 @@ def sample_body_part_index():
     if BodyPartIndex.is_initialized():
         return BodyPartIndex.get_instance()
     return BodyPartIndex(json_filename=get_filename_in_tests_dir(SAMPLE_BODYPARTS_FILENAME))
+
+
+class StubDataServer(ThreadingHTTPServer):
+    """Local HTTP server for one JSON document, honoring If-None-Match like a real server."""
+
+    def __init__(self, document: Dict) -> None:
+        super().__init__(('127.0.0.1', 0), _StubDataHandler)
+        self.statuses: List[int] = []
+        # Status to answer every request with instead of the document (e.g., 503)
+        self.error_status: Optional[int] = None
+        self.set_document(document)
+
+    def set_document(self, document: Dict) -> None:
+        """Change the document served (and its ETag)."""
+        self.content = json.dumps(document).encode('utf-8')
+        self.etag = f'"{hash(self.content) & 0xFFFFFFFF:x}"'
+
+    @property
+    def url(self) -> str:
+        """URL of the document."""
+        return f'http://127.0.0.1:{self.server_address[1]}/body_parts.json'
+
+
+class _StubDataHandler(BaseHTTPRequestHandler):
+    server: StubDataServer
+
+    def do_GET(self) -> None:  # noqa: N802 (the name BaseHTTPRequestHandler looks for)
+        """Serve the document, or 304 if the client has the current version."""
+        if self.server.error_status is not None:
+            self.server.statuses.append(self.server.error_status)
+            self.send_error(self.server.error_status)
+            return
+        if self.headers.get('If-None-Match') == self.server.etag:
+            self.server.statuses.append(304)
+            self.send_response(304)
+            self.end_headers()
+            return
+        self.server.statuses.append(200)
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('ETag', self.server.etag)
+        self.send_header('Content-Length', str(len(self.server.content)))
+        self.end_headers()
+        self.wfile.write(self.server.content)
+
+    def log_message(self, *args) -> None:  # pylint: disable=arguments-differ
+        pass
+
+
+@pytest.fixture
+def stub_server(sample_json_data) -> Iterator[StubDataServer]:
+    """Returns a running StubDataServer serving the sample data."""
+    server = StubDataServer(sample_json_data)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
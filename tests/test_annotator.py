@@ -0,0 +1,60 @@
+# pylint: disable=missing-module-docstring
+from body_part_index import Annotation, Annotator, BodyPartIndex
+
+# pylint: disable=no-name-in-module
+from . import (
+    ABDOMEN_ID,
+    PELVIS_ID,
+    UTERINE_ADNEXA_ID,
+    LEFT_UTERINE_ADNEXA_ID,
+    RIGHT_OVARIAN_ARTERY_ID,
+    NIPPLE_OF_MALE_BREAST_ID,
+)
+
+# pylint: enable=no-name-in-module
+
+
+def annotated_ids(annotations):
+    """Turn annotations into comparable (start, end, radlex_id) tuples."""
+    return [(a.start, a.end, a.body_part.radlex_id) for a in annotations]
+
+
+def test_annotate(sample_body_part_index: BodyPartIndex):
+    """Make sure we find descriptions and synonyms, ignoring case."""
+    annotator: Annotator = sample_body_part_index.get_annotator()
+    text = 'Pelvis: the left uterine adnexa and the Adnexa are normal.'
+    annotations = annotator.annotate(text)
+    assert annotated_ids(annotations) == [
+        (0, 6, PELVIS_ID),
+        (12, 31, LEFT_UTERINE_ADNEXA_ID),
+        (40, 46, UTERINE_ADNEXA_ID),
+    ]
+    assert all(isinstance(a, Annotation) for a in annotations)
+    assert text[12:31] == 'left uterine adnexa'
+
+
+def test_annotate_word_boundaries(sample_body_part_index: BodyPartIndex):
+    """Make sure mentions inside longer words are not reported."""
+    annotator = sample_body_part_index.get_annotator()
+    assert annotator.annotate('pelvises and abdomenal wall') == []
+    assert annotated_ids(annotator.annotate('(abdomen)')) == [(1, 8, ABDOMEN_ID)]
+
+
+def test_annotate_longest_match(sample_body_part_index: BodyPartIndex):
+    """Make sure overlapping terms resolve to the longest mention."""
+    annotator = sample_body_part_index.get_annotator()
+    annotations = annotator.annotate('right ovarian artery; male nipple')
+    assert annotated_ids(annotations) == [
+        (0, 20, RIGHT_OVARIAN_ARTERY_ID),
+        (22, 33, NIPPLE_OF_MALE_BREAST_ID),
+    ]
+
+
+def test_annotate_documents(sample_body_part_index: BodyPartIndex):
+    """Make sure a stream of documents is annotated lazily and in order."""
+    annotator = sample_body_part_index.get_annotator()
+    documents = (text for text in ['abdomen', 'no findings', 'true pelvis'])
+    results = annotator.annotate_documents(documents)
+    assert annotated_ids(next(results)) == [(0, 7, ABDOMEN_ID)]
+    assert next(results) == []
+    assert annotated_ids(next(results)) == [(0, 11, PELVIS_ID)]
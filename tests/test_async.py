@@ -0,0 +1,79 @@
+# pylint: disable=missing-module-docstring
+import asyncio
+from typing import List
+import pytest
+from body_part_index import BodyPartIndex, Code
+
+# pylint: disable=no-name-in-module
+from . import ABDOMEN_ID, PELVIS_ID, UTERINE_ADNEXA_ID
+from .conftest import StubDataServer
+
+# pylint: enable=no-name-in-module
+
+
+async def _load_while_ticking(**kwargs) -> List:
+    """Load an index while counting how often another task gets to run."""
+    ticks = 0
+    done = False
+
+    async def tick() -> None:
+        nonlocal ticks
+        while not done:
+            ticks += 1
+            await asyncio.sleep(0)
+
+    ticker = asyncio.ensure_future(tick())
+    try:
+        index = await BodyPartIndex.aload(**kwargs)
+    finally:
+        done = True
+        await ticker
+    return [index, ticks]
+
+
+def test_aload_path(sample_json_data_filename):
+    """Make sure a file is loaded into the singleton without blocking the event loop."""
+    (index, ticks) = asyncio.run(_load_while_ticking(path=sample_json_data_filename))
+    assert BodyPartIndex.get_instance() is index
+    assert index.get_by_id(PELVIS_ID).description == 'pelvis'
+    assert ticks > 1
+
+
+def test_aload_url(stub_server: StubDataServer, sample_json_data, tmp_path):
+    """Make sure a URL is loaded, and not rebuilt while its data is unchanged."""
+    (index, ticks) = asyncio.run(
+        _load_while_ticking(url=stub_server.url, cache_directory=str(tmp_path), frozen=True)
+    )
+    assert ticks > 1
+    assert index.is_frozen
+    assert index.version == sample_json_data['$version']
+    again = asyncio.run(BodyPartIndex.aload(url=stub_server.url, cache_directory=str(tmp_path)))
+    assert again is index
+    assert stub_server.statuses == [200, 304]
+    BodyPartIndex.reset_instance()
+
+
+def test_aload_arguments():
+    """Make sure contradictory arguments are rejected."""
+    with pytest.raises(ValueError, match='either a URL or a path'):
+        asyncio.run(BodyPartIndex.aload(url='http://example.com/', path='body_parts.json'))
+    with pytest.raises(ValueError, match='cannot be frozen'):
+        asyncio.run(BodyPartIndex.aload(path='body_parts.json', lazy=True, frozen=True))
+
+
+def test_async_batches(sample_body_part_index: BodyPartIndex):
+    """Make sure the async batch methods match the sync ones, whatever the chunk size."""
+    bpi = sample_body_part_index
+    ids = [PELVIS_ID, 'unknown', UTERINE_ADNEXA_ID, ABDOMEN_ID, PELVIS_ID]
+    codes = [Code('SNOMED', '818983003'), ('FMA', 'unknown'), ('SNOMED', '818983003')]
+    queries = ['adnexa', 'pelvis', 'no such thing']
+    for chunk_size in (1, 2, 100):
+        assert asyncio.run(bpi.aget_many(ids, chunk_size=chunk_size)) == bpi.get_many(ids)
+        assert asyncio.run(bpi.aget_by_codes(codes, chunk_size=chunk_size)) == bpi.get_by_codes(
+            codes
+        )
+        assert asyncio.run(bpi.asearch_many(queries, chunk_size=chunk_size)) == bpi.search_many(
+            queries
+        )
+    with pytest.raises(ValueError, match='chunk size must be positive'):
+        asyncio.run(bpi.aget_many(ids, chunk_size=0))
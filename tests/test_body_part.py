@@ -116,6 +116,17 @@ def test_children(sample_body_part_index: BodyPartIndex):
     assert body_part.children == expected
 
 
+def test_part_of_children(sample_body_part_index: BodyPartIndex):
+    """Make sure we can get the BodyParts that are part of another BodyPart."""
+    body_part = sample_body_part_index.get_by_id(FEMALE_GENITAL_SYSTEM_ID)
+    expected = {
+        sample_body_part_index.get_by_id(UTERINE_ADNEXA_ID),
+        sample_body_part_index.get_by_id(LEFT_UTERINE_ADNEXA_ID),
+        sample_body_part_index.get_by_id(RIGHT_UTERINE_ADNEXA_ID),
+    }
+    assert body_part.part_of_children == expected
+
+
 def test_descendants(sample_body_part_index: BodyPartIndex):
     """Make sure we can get the all the BodyParts that are contained by another BodyPart."""
     body_part = sample_body_part_index.get_by_id(WHOLE_BODY_ID)
@@ -142,6 +153,17 @@ def test_is_contained(sample_body_part_index: BodyPartIndex):
     assert body_part1.is_contained(body_part2) == True
     assert body_part1.is_contained(body_part3) == False
 
+
+def test_is_ancestor_of(sample_body_part_index: BodyPartIndex):
+    """Make sure containment can be checked from the containing BodyPart."""
+    whole_body = sample_body_part_index.get_by_id(WHOLE_BODY_ID)
+    pelvis = sample_body_part_index.get_by_id(PELVIS_ID)
+    right_adnexa = sample_body_part_index.get_by_id(RIGHT_UTERINE_ADNEXA_ID)
+    assert whole_body.is_ancestor_of(right_adnexa)
+    assert pelvis.is_ancestor_of(right_adnexa)
+    assert not right_adnexa.is_ancestor_of(pelvis)
+    assert not pelvis.is_ancestor_of(pelvis)
+
 def test_snomed_code_direct_assignment(sample_body_part_index: BodyPartIndex):
     """Test snomed_code property when SNOMED code is directly assigned."""
     body_part = sample_body_part_index.get_by_id(RIGHT_UTERINE_ADNEXA_ID)
@@ -161,3 +183,119 @@ def test_no_snomed_code(sample_body_part_index: BodyPartIndex):
     """Test snomed_code property when no SNOMED code is available."""
     body_part = sample_body_part_index.get_by_id(NIPPLE_OF_MALE_BREAST_ID)
     assert body_part.snomed_code is None
+
+
+def test_compact_body_parts(sample_body_part_index: BodyPartIndex):
+    """Make sure BodyParts keep their fields in slots and share IDs and codes with each other."""
+    pelvis = sample_body_part_index.get_by_id(PELVIS_ID)
+    adnexa = sample_body_part_index.get_by_id(UTERINE_ADNEXA_ID)
+    assert not hasattr(pelvis, '__dict__')
+    assert pelvis.contained_by is pelvis.contained_by
+    assert adnexa.contained_by_id is pelvis.radlex_id
+    codes = [code for bp in sample_body_part_index.get_all_body_parts() for code in bp.codes]
+    assert len({id(code.system) for code in codes}) == len({code.system for code in codes})
+
+
+class _TreeIndex:
+    """Minimal Index over a dict of RadLex ID to contained_by_id, with children in that order."""
+
+    def __init__(self, parents):
+        self.body_parts = {
+            radlex_id: BodyPart(self, radlex_id, radlex_id.lower(), parent_id)
+            for (radlex_id, parent_id) in parents.items()
+        }
+
+    def get_by_id(self, radlex_id):
+        return self.body_parts[radlex_id]
+
+    def get_all_body_parts(self):
+        return self.body_parts.values()
+
+    def get_children(self, radlex_id):
+        return [
+            body_part
+            for body_part in self.body_parts.values()
+            if body_part.contained_by_id == radlex_id and body_part.radlex_id != radlex_id
+        ]
+
+    def get_part_of_children(self, radlex_id):
+        return []
+
+    def get_descendants(self, radlex_id):
+        return list(self.get_by_id(radlex_id).iter_descendants())
+
+    def is_ancestor(self, ancestor_id, descendant_id):
+        ancestors = self.get_by_id(descendant_id).iter_ancestors()
+        return any(body_part.radlex_id == ancestor_id for body_part in ancestors)
+
+
+@pytest.fixture
+def tree_index() -> _TreeIndex:
+    """Returns an index of a whole body containing A and B, with A1 and A2 in A, and B1 in B."""
+    return _TreeIndex({
+        WHOLE_BODY_ID: WHOLE_BODY_ID,
+        'A': WHOLE_BODY_ID,
+        'B': WHOLE_BODY_ID,
+        'A1': 'A',
+        'A2': 'A',
+        'B1': 'B',
+        'A1a': 'A1',
+    })
+
+
+def _ids(body_parts) -> list:
+    return [body_part.radlex_id for body_part in body_parts]
+
+
+def test_iter_descendants_orders(tree_index):
+    """Make sure descendants come out depth-first or breadth-first, as asked."""
+    whole_body = tree_index.get_by_id(WHOLE_BODY_ID)
+    assert _ids(whole_body.iter_descendants()) == ['A', 'A1', 'A1a', 'A2', 'B', 'B1']
+    assert _ids(whole_body.iter_descendants('bfs')) == ['A', 'B', 'A1', 'A2', 'B1', 'A1a']
+    assert [depth for (depth, _) in whole_body.walk('bfs')] == [1, 1, 2, 2, 2, 3]
+    with pytest.raises(ValueError, match='order must be'):
+        whole_body.iter_descendants('inorder')
+
+
+def test_iter_descendants_depth_and_pruning(tree_index):
+    """Make sure the walk stops at max_depth and skips the branches the predicate rejects."""
+    whole_body = tree_index.get_by_id(WHOLE_BODY_ID)
+    assert _ids(whole_body.iter_descendants(max_depth=1)) == ['A', 'B']
+    assert _ids(whole_body.iter_descendants(max_depth=0)) == []
+    with pytest.raises(ValueError, match='max_depth cannot be negative'):
+        whole_body.iter_descendants(max_depth=-1)
+
+    def not_a1(body_part: BodyPart) -> bool:
+        return body_part.radlex_id != 'A1'
+
+    assert _ids(whole_body.iter_descendants(predicate=not_a1)) == ['A', 'A2', 'B', 'B1']
+    assert _ids(whole_body.iter_descendants('bfs', predicate=not_a1)) == ['A', 'B', 'A2', 'B1']
+
+
+def test_iter_descendants_is_lazy(tree_index):
+    """Make sure the children of a body part are only looked up when the walk gets to them."""
+    looked_up = []
+    get_children = tree_index.get_children
+    tree_index.get_children = lambda radlex_id: looked_up.append(radlex_id) or get_children(
+        radlex_id
+    )
+    descendants = tree_index.get_by_id(WHOLE_BODY_ID).iter_descendants()
+    assert next(descendants).radlex_id == 'A'
+    assert looked_up == [WHOLE_BODY_ID]
+
+
+def test_iter_descendants_cycle():
+    """Make sure a containment cycle does not make the walk go on forever."""
+    index = _TreeIndex({WHOLE_BODY_ID: WHOLE_BODY_ID, 'X': 'Y', 'Y': 'X'})
+    assert _ids(index.get_by_id('X').iter_descendants()) == ['Y']
+    with pytest.raises(ValueError, match='cycle of contained_by_id references'):
+        list(index.get_by_id('X').iter_ancestors())
+
+
+def test_iter_ancestors(sample_body_part_index: BodyPartIndex):
+    """Make sure ancestors come out one at a time, from the container up."""
+    body_part = sample_body_part_index.get_by_id(LEFT_UTERINE_ADNEXA_ID)
+    ancestors = body_part.iter_ancestors()
+    assert next(ancestors).radlex_id == PELVIS_ID
+    assert _ids(ancestors) == [WHOLE_BODY_ID]
+    assert _ids(body_part.ancestors) == [PELVIS_ID, WHOLE_BODY_ID]
@@ -1,6 +1,10 @@
 # pylint: disable=missing-module-docstring
+import csv
+import json
+import sys
 from typing import Set
-from body_part_index import __version__, BodyPartIndex, BodyPart, Code, WHOLE_BODY_ID
+import pytest
+from body_part_index import __version__, BodyPartIndex, BodyPart, Code, RADLEX, WHOLE_BODY_ID
 
 # pylint: disable=no-name-in-module
 from . import (
@@ -111,3 +115,358 @@ def test_search(sample_body_part_index: BodyPartIndex):
     assert len(search_results3) == 3
     expected = {UTERINE_ADNEXA_ID, LEFT_UTERINE_ADNEXA_ID, RIGHT_UTERINE_ADNEXA_ID}
     assert {r.radlex_id for r in search_results3} == expected
+
+
+def test_get_children(sample_body_part_index: BodyPartIndex):
+    """Make sure we can get the BodyParts directly contained by a BodyPart."""
+    children = sample_body_part_index.get_children(PELVIS_ID)
+    expected = {
+        UTERINE_ADNEXA_ID,
+        LEFT_UTERINE_ADNEXA_ID,
+        RIGHT_UTERINE_ADNEXA_ID,
+        FEMALE_GENITAL_SYSTEM_ID,
+        OVARIAN_ARTERY_ID,
+        RIGHT_OVARIAN_ARTERY_ID,
+    }
+    assert {bp.radlex_id for bp in children} == expected
+    # The whole body contains itself, but is not its own child
+    whole_body_children = sample_body_part_index.get_children(WHOLE_BODY_ID)
+    assert {bp.radlex_id for bp in whole_body_children} == {ABDOMEN_ID, PELVIS_ID}
+    assert len(sample_body_part_index.get_children(ABDOMEN_ID)) == 0
+    assert len(sample_body_part_index.get_children('RID_NOT_THERE')) == 0
+
+
+def test_get_part_of_children(sample_body_part_index: BodyPartIndex):
+    """Make sure we can get the BodyParts that are part of a BodyPart."""
+    part_of_children = sample_body_part_index.get_part_of_children(FEMALE_GENITAL_SYSTEM_ID)
+    expected = {UTERINE_ADNEXA_ID, LEFT_UTERINE_ADNEXA_ID, RIGHT_UTERINE_ADNEXA_ID}
+    assert {bp.radlex_id for bp in part_of_children} == expected
+    assert len(sample_body_part_index.get_part_of_children(PELVIS_ID)) == 0
+
+
+def test_get_descendants(sample_body_part_index: BodyPartIndex):
+    """Make sure we can get all the BodyParts below a BodyPart."""
+    descendants = sample_body_part_index.get_descendants(PELVIS_ID)
+    expected = {
+        UTERINE_ADNEXA_ID,
+        LEFT_UTERINE_ADNEXA_ID,
+        RIGHT_UTERINE_ADNEXA_ID,
+        FEMALE_GENITAL_SYSTEM_ID,
+        OVARIAN_ARTERY_ID,
+        RIGHT_OVARIAN_ARTERY_ID,
+    }
+    assert {bp.radlex_id for bp in descendants} == expected
+    assert len(sample_body_part_index.get_descendants(ABDOMEN_ID)) == 0
+    assert len(sample_body_part_index.get_descendants('RID_NOT_THERE')) == 0
+
+
+def test_is_ancestor(sample_body_part_index: BodyPartIndex):
+    """Make sure containment is checked across the whole hierarchy."""
+    assert sample_body_part_index.is_ancestor(WHOLE_BODY_ID, RIGHT_UTERINE_ADNEXA_ID)
+    assert sample_body_part_index.is_ancestor(PELVIS_ID, FEMALE_GENITAL_SYSTEM_ID)
+    assert not sample_body_part_index.is_ancestor(ABDOMEN_ID, FEMALE_GENITAL_SYSTEM_ID)
+    assert not sample_body_part_index.is_ancestor(PELVIS_ID, PELVIS_ID)
+    # The male breast's container is not in the sample data, so it starts its own tree
+    assert sample_body_part_index.is_ancestor(MALE_BREAST_ID, NIPPLE_OF_MALE_BREAST_ID)
+    assert not sample_body_part_index.is_ancestor(WHOLE_BODY_ID, MALE_BREAST_ID)
+
+
+def test_lowest_common_ancestor(sample_body_part_index: BodyPartIndex):
+    """Make sure we can find the most specific BodyPart covering several BodyParts."""
+    def get(radlex_id: str) -> BodyPart:
+        return sample_body_part_index.get_by_id(radlex_id)
+
+    lca = sample_body_part_index.lowest_common_ancestor(
+        get(LEFT_UTERINE_ADNEXA_ID), get(RIGHT_OVARIAN_ARTERY_ID)
+    )
+    assert lca == get(PELVIS_ID)
+    lca = sample_body_part_index.lowest_common_ancestor(get(ABDOMEN_ID), get(UTERINE_ADNEXA_ID))
+    assert lca == get(WHOLE_BODY_ID)
+    assert sample_body_part_index.lowest_common_ancestor(get(PELVIS_ID)) == get(PELVIS_ID)
+    assert sample_body_part_index.lowest_common_ancestor(get(ABDOMEN_ID), get(MALE_BREAST_ID)) is None
+
+
+def test_lowest_common_ancestors(sample_body_part_index: BodyPartIndex):
+    """Make sure we can find the lowest common ancestors of many groups at once."""
+    def get(radlex_id: str) -> BodyPart:
+        return sample_body_part_index.get_by_id(radlex_id)
+
+    groups = [
+        [get(LEFT_UTERINE_ADNEXA_ID), get(RIGHT_UTERINE_ADNEXA_ID)],
+        [get(NIPPLE_OF_MALE_BREAST_ID), get(AREOLA_OF_MALE_BREAST_ID)],
+        [],
+    ]
+    expected = [get(PELVIS_ID), get(AREOLA_OF_MALE_BREAST_ID), None]
+    assert sample_body_part_index.lowest_common_ancestors(groups) == expected
+
+
+def test_ranked_search(sample_body_part_index: BodyPartIndex):
+    """Make sure ranked search ignores case and puts the best matches first."""
+    results = sample_body_part_index.ranked_search('Adnexa')
+    assert results[0].radlex_id == UTERINE_ADNEXA_ID
+    assert {r.radlex_id for r in results} == {
+        UTERINE_ADNEXA_ID,
+        LEFT_UTERINE_ADNEXA_ID,
+        RIGHT_UTERINE_ADNEXA_ID,
+    }
+    assert sample_body_part_index.ranked_search('TRUE PELVIS')[0].radlex_id == PELVIS_ID
+    assert len(sample_body_part_index.ranked_search('adnexa', limit=1)) == 1
+
+
+def test_fuzzy_search(sample_body_part_index: BodyPartIndex):
+    """Make sure misspelled terms still find the right BodyParts."""
+    results = sample_body_part_index.fuzzy_search('Adnexxa')
+    assert [r.radlex_id for r in results] == [UTERINE_ADNEXA_ID]
+    results = sample_body_part_index.fuzzy_search('left uterin adnexa', max_distance=1)
+    assert [r.radlex_id for r in results] == [LEFT_UTERINE_ADNEXA_ID]
+    assert sample_body_part_index.fuzzy_search('adnexa', limit=0) == []
+    assert sample_body_part_index.fuzzy_search('kidney') == []
+
+
+def test_query(sample_body_part_index: BodyPartIndex):
+    """Make sure facets, subtrees and text searches combine into one query."""
+    bpi = sample_body_part_index
+    assert {'sex:Female', 'sex:Male', 'left', 'right', 'sided', 'unsided'} <= set(bpi.facets)
+    results = bpi.query('sex:Female', 'left', 'code:SNOMED', within=PELVIS_ID)
+    assert [r.radlex_id for r in results] == [LEFT_UTERINE_ADNEXA_ID]
+    # Results come in pre-order
+    results = bpi.query('sided', within=PELVIS_ID)
+    assert [r.radlex_id for r in results] == [
+        LEFT_UTERINE_ADNEXA_ID,
+        RIGHT_UTERINE_ADNEXA_ID,
+        RIGHT_OVARIAN_ARTERY_ID,
+    ]
+    results = bpi.query(any_of=['unsided', 'sex:Male'], none_of=['code:SNOMED'])
+    assert {r.radlex_id for r in results} == {NIPPLE_OF_MALE_BREAST_ID, AREOLA_OF_MALE_BREAST_ID}
+    results = bpi.query('sex_specific', text='adnexa', none_of=['unsided'])
+    assert {r.radlex_id for r in results} == {LEFT_UTERINE_ADNEXA_ID, RIGHT_UTERINE_ADNEXA_ID}
+    assert bpi.query('code:NO SUCH SYSTEM') == []
+    assert len(bpi.query()) == len(list(bpi.get_all_body_parts()))
+    with pytest.raises(ValueError, match="Unknown facet 'laterality:left'"):
+        bpi.query('laterality:left')
+    with pytest.raises(Exception, match='No BodyPart with ID RID0'):
+        bpi.query(within='RID0')
+
+
+def test_lazy_index(sample_json_data_filename: str):
+    """Make sure a lazy index creates BodyParts on demand and lets unused ones go."""
+    # pylint: disable=import-outside-toplevel
+    import gc
+    import weakref
+
+    if BodyPartIndex.is_initialized():
+        BodyPartIndex.reset_instance()
+    bpi = BodyPartIndex(json_filename=sample_json_data_filename, lazy=True)
+    assert bpi.is_lazy
+    pelvis = bpi.get_by_id(PELVIS_ID)
+    assert isinstance(pelvis, BodyPart)
+    assert bpi.get(PELVIS_ID) is pelvis
+    assert pelvis.synonyms == ['lesser pelvis', 'pelvis minor', 'true pelvis']
+    assert {bp.radlex_id for bp in pelvis.children} >= {UTERINE_ADNEXA_ID, OVARIAN_ARTERY_ID}
+    assert pelvis.is_contained(bpi.get_by_id(WHOLE_BODY_ID))
+    assert bpi.get_by_code(Code(SNOMED_SYSTEM, ABDOMEN_SNOMED_CODE)).radlex_id == ABDOMEN_ID
+    # The search indices are only built by the first search, including what was added before it
+    footprint = bpi.memory_footprint()
+    assert footprint['text_index'] == footprint['fuzzy_terms'] == sys.getsizeof({})
+    bpi.add_synonym(OVARIAN_ARTERY_ID, 'gonadal artery')
+    assert {r.radlex_id for r in bpi.search('adnexa')} == {
+        UTERINE_ADNEXA_ID,
+        LEFT_UTERINE_ADNEXA_ID,
+        RIGHT_UTERINE_ADNEXA_ID,
+    }
+    assert bpi.memory_footprint()['text_index'] > footprint['text_index']
+    assert [r.radlex_id for r in bpi.ranked_search('gonadal artery', 1)] == [OVARIAN_ARTERY_ID]
+    assert len(bpi.get_all_body_parts()) == 12
+    abdomen_ref = weakref.ref(bpi.get_by_id(ABDOMEN_ID))
+    gc.collect()
+    assert abdomen_ref() is None
+    assert bpi.get_by_id(ABDOMEN_ID).description == 'abdomen'
+    BodyPartIndex.reset_instance()
+
+
+def test_memory_footprint(sample_body_part_index: BodyPartIndex):
+    """Make sure the memory footprint covers the components of the index and adds up."""
+    footprint = sample_body_part_index.memory_footprint()
+    assert footprint['table'] > 0
+    assert footprint['body_parts'] > 0
+    assert footprint['total'] == sum(size for (name, size) in footprint.items() if name != 'total')
+
+
+def test_get_many(sample_body_part_index: BodyPartIndex):
+    """Make sure batch lookups by code text or ID are aligned with the input, with misses as None."""
+    values = [PELVIS_ID, ABDOMEN_SNOMED_CODE, 'RID0', PELVIS_ID]
+    results = sample_body_part_index.get_many(values)
+    expected = [PELVIS_ID, ABDOMEN_ID, None, PELVIS_ID]
+    assert [bp.radlex_id if bp else None for bp in results] == expected
+    assert results[0] is results[3]
+    pelvis = sample_body_part_index.get_by_id(PELVIS_ID)
+    assert sample_body_part_index.get_many(iter(['RID0']), default=pelvis) == [pelvis]
+    assert sample_body_part_index.get_many([b'RID56']) == [sample_body_part_index.get(ABDOMEN_ID)]
+    assert not sample_body_part_index.get_many([])
+
+
+def test_get_by_codes(sample_body_part_index: BodyPartIndex):
+    """Make sure batch lookups by code accept Codes and pairs and are aligned with the input."""
+    codes = [
+        Code(SNOMED_SYSTEM, ABDOMEN_SNOMED_CODE),
+        (SNOMED_SYSTEM, 'no such code'),
+        [SNOMED_SYSTEM, ABDOMEN_SNOMED_CODE],
+    ]
+    results = sample_body_part_index.get_by_codes(codes)
+    assert [bp.radlex_id if bp else None for bp in results] == [ABDOMEN_ID, None, ABDOMEN_ID]
+
+
+def test_search_many(sample_body_part_index: BodyPartIndex):
+    """Make sure batch searches give the same results as one search per query."""
+    queries = ['adnexa', 'no such body part', 'adnexa']
+    results = sample_body_part_index.search_many(queries)
+    assert results == [sample_body_part_index.search(query) for query in queries]
+    assert not results[1]
+
+
+def test_batch_lookups_with_numpy(sample_body_part_index: BodyPartIndex):
+    """Make sure batch lookups accept NumPy string arrays."""
+    numpy = pytest.importorskip('numpy')
+    abdomen = sample_body_part_index.get_by_id(ABDOMEN_ID)
+    assert sample_body_part_index.get_many(numpy.array([ABDOMEN_ID, 'RID0'])) == [abdomen, None]
+    assert sample_body_part_index.get_many(numpy.array([ABDOMEN_ID], dtype='S')) == [abdomen]
+    codes = numpy.array([[SNOMED_SYSTEM, ABDOMEN_SNOMED_CODE]])
+    assert sample_body_part_index.get_by_codes(codes) == [abdomen]
+    radlex_ids = numpy.array([ABDOMEN_ID, 'RID0'], dtype='S')
+    assert sample_body_part_index.translate(radlex_ids, 'SNOMED', source_system=RADLEX) == [
+        ABDOMEN_SNOMED_CODE,
+        None,
+    ]
+
+
+@pytest.fixture
+def fresh_body_part_index(sample_json_data_filename: str):
+    """Returns a new sample BodyPartIndex that a test can change, and discards it afterwards."""
+    if BodyPartIndex.is_initialized():
+        BodyPartIndex.reset_instance()
+    yield BodyPartIndex(json_filename=sample_json_data_filename)
+    BodyPartIndex.reset_instance()
+
+
+def test_add_local_code(fresh_body_part_index: BodyPartIndex):
+    """Make sure a local code can be used for lookups and searches right away."""
+    bpi = fresh_body_part_index
+    adnexa = bpi.get_by_id(UTERINE_ADNEXA_ID)
+    assert bpi.ranked_search('THX1138') == []
+    assert bpi.add_local_code(UTERINE_ADNEXA_ID, Code('LOCAL', 'THX1138'))
+    assert not bpi.add_local_code(UTERINE_ADNEXA_ID, Code('LOCAL', 'THX1138'))
+    assert Code('LOCAL', 'THX1138') in adnexa.codes
+    assert bpi.get('THX1138') is adnexa
+    assert bpi.get_by_code(Code('LOCAL', 'THX1138')) is adnexa
+    assert bpi.search('THX11') == {adnexa}
+    assert bpi.ranked_search('thx1138') == [adnexa]
+    with pytest.raises(ValueError, match='already belongs to'):
+        bpi.add_local_code(PELVIS_ID, Code('LOCAL', 'THX1138'))
+    with pytest.raises(Exception, match='No BodyPart'):
+        bpi.add_local_code('RID0', Code('LOCAL', 'THX1139'))
+
+
+def test_add_local_snomed_code(fresh_body_part_index: BodyPartIndex):
+    """Make sure a new SNOMED code reaches the cached snomed_code of the BodyPart and its children."""
+    bpi = fresh_body_part_index
+    areola = bpi.get_by_id(AREOLA_OF_MALE_BREAST_ID)
+    nipple = bpi.get_by_id(NIPPLE_OF_MALE_BREAST_ID)
+    assert nipple.snomed_code is None
+    assert areola.snomed_code == '67770001'
+    bpi.add_local_code(AREOLA_OF_MALE_BREAST_ID, Code('SNOMED', '1234567'))
+    assert areola.snomed_code == '1234567'
+    assert nipple.snomed_code == '1234567'
+
+
+def test_add_local_code_translation(fresh_body_part_index: BodyPartIndex):
+    """Make sure a code in a new system can be translated to and from right away."""
+    bpi = fresh_body_part_index
+    assert bpi.translate([PELVIS_ID], 'LOCAL', source_system=RADLEX) == [None]
+    bpi.add_local_code(PELVIS_ID, Code('LOCAL', 'P1'))
+    assert 'LOCAL' in bpi.code_systems
+    assert bpi.translate([PELVIS_ID], 'LOCAL', source_system=RADLEX) == ['P1']
+    assert bpi.translate([('LOCAL', 'P1')], 'SNOMED') == ['12921003']
+
+
+def test_query_after_local_code(fresh_body_part_index: BodyPartIndex):
+    """Make sure a code in a new system can be queried right away."""
+    bpi = fresh_body_part_index
+    assert bpi.query('code:LOCAL') == []
+    bpi.add_local_code(PELVIS_ID, Code('LOCAL', 'P1'))
+    assert [r.radlex_id for r in bpi.query('code:LOCAL')] == [PELVIS_ID]
+
+
+def test_add_synonym(fresh_body_part_index: BodyPartIndex):
+    """Make sure a new synonym can be found by every kind of search right away."""
+    bpi = fresh_body_part_index
+    left_adnexa = bpi.get_by_id(LEFT_UTERINE_ADNEXA_ID)
+    assert bpi.get_annotator().annotate('The left ovary region is normal.') == []
+    assert bpi.add_synonym(LEFT_UTERINE_ADNEXA_ID, 'left ovary region')
+    assert not bpi.add_synonym(LEFT_UTERINE_ADNEXA_ID, 'left ovary region')
+    assert left_adnexa.synonyms == ['left ovary region']
+    assert bpi.search('ovary reg') == {left_adnexa}
+    assert bpi.ranked_search('Left Ovary Region')[0] is left_adnexa
+    assert bpi.fuzzy_search('left ovary regoin') == [left_adnexa]
+    (annotation,) = bpi.get_annotator().annotate('The left ovary region is normal.')
+    assert annotation.body_part is left_adnexa
+
+
+def test_load_overlay(fresh_body_part_index: BodyPartIndex, tmp_path):
+    """Make sure an overlay file adds its codes and synonyms, and counts only the new ones."""
+    overlay = {
+        'bodyParts': [
+            {'radlexId': PELVIS_ID, 'codes': [{'system': 'LOCAL', 'code': 'PEL-1'}]},
+            {'radlexId': UTERINE_ADNEXA_ID, 'synonyms': ['adnexa', 'adnexal region']},
+        ]
+    }
+    overlay_filename = tmp_path / 'overlay.json'
+    overlay_filename.write_text(json.dumps(overlay), encoding='utf-8')
+    bpi = fresh_body_part_index
+    assert bpi.load_overlay(str(overlay_filename)) == 2
+    assert bpi.get('PEL-1').radlex_id == PELVIS_ID
+    assert bpi.ranked_search('adnexal region')[0].radlex_id == UTERINE_ADNEXA_ID
+
+
+def test_frozen_index_cannot_change(fresh_body_part_index: BodyPartIndex):
+    """Make sure a frozen index rejects changes."""
+    fresh_body_part_index.freeze()
+    with pytest.raises(ValueError, match='frozen index cannot be changed'):
+        fresh_body_part_index.add_synonym(PELVIS_ID, 'pelvic cavity')
+
+
+def test_translate(sample_body_part_index: BodyPartIndex):
+    """Make sure whole columns of codes are translated between systems, RadLex included."""
+    bpi = sample_body_part_index
+    assert bpi.code_systems == ['FMA', 'MESH', 'SNOMED', 'UMLS']
+    radlex_ids = [PELVIS_ID, UTERINE_ADNEXA_ID, 'unknown', PELVIS_ID, NIPPLE_OF_MALE_BREAST_ID]
+    snomed_codes = bpi.translate(radlex_ids, 'SNOMED', source_system=RADLEX)
+    assert snomed_codes == ['12921003', '23043003', None, '12921003', None]
+    assert bpi.translate(snomed_codes[:2], RADLEX, source_system='SNOMED') == radlex_ids[:2]
+    assert bpi.translate([PELVIS_ID.encode()], 'SNOMED', source_system=RADLEX) == ['12921003']
+    assert bpi.translate([Code('SNOMED', '12921003'), ('FMA', '265256')], 'UMLS') == [
+        'C0030797',
+        'C0001575',
+    ]
+    assert bpi.translate([(RADLEX, PELVIS_ID)], 'NONE', default='') == ['']
+    for body_part in bpi.get_all_body_parts():
+        for code in body_part.codes:
+            (radlex_id,) = bpi.translate([code], RADLEX)
+            assert radlex_id == bpi.get_by_code(code).radlex_id
+
+
+def test_crosswalk_table(sample_body_part_index: BodyPartIndex, tmp_path):
+    """Make sure the crosswalk has a row for each BodyPart and a column for each system."""
+    bpi = sample_body_part_index
+    table = bpi.crosswalk_table()
+    assert list(table) == [RADLEX, 'FMA', 'MESH', 'SNOMED', 'UMLS']
+    rows = {row[0]: row for row in zip(*table.values())}
+    assert len(rows) == len(list(bpi.get_all_body_parts()))
+    assert rows[PELVIS_ID] == (PELVIS_ID, '9578', 'A01.923.600', '12921003', 'C0030797')
+    assert rows[NIPPLE_OF_MALE_BREAST_ID][3] is None
+    assert list(bpi.crosswalk_table(['SNOMED', 'LOINC'])) == [RADLEX, 'SNOMED', 'LOINC']
+    bpi.save_crosswalk(str(tmp_path / 'crosswalk.csv'))
+    with open(tmp_path / 'crosswalk.csv', encoding='utf-8', newline='') as csv_file:
+        csv_rows = list(csv.reader(csv_file))
+    assert csv_rows[0] == list(table)
+    expected = [[code or '' for code in row] for row in zip(*table.values())]
+    assert csv_rows[1:] == expected
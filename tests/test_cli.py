@@ -0,0 +1,148 @@
+# pylint: disable=missing-module-docstring
+import io
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import subprocess
+import sys
+from typing import Iterator, List
+import pytest
+from body_part_index import BodyPartIndex
+from body_part_index.__main__ import main, read_values, run_batch
+
+# pylint: disable=no-name-in-module
+from . import PELVIS_ID, UTERINE_ADNEXA_ID
+
+# pylint: enable=no-name-in-module
+
+
+@pytest.fixture
+def _no_singleton() -> Iterator[None]:
+    """Let the CLI set up its own index (and log level), and drop them afterwards."""
+    logger = logging.getLogger('body_part_index')
+    level = logger.level
+    BodyPartIndex.reset_instance()
+    yield
+    BodyPartIndex.reset_instance()
+    logger.setLevel(level)
+
+
+def _read_lines(filename: str) -> List[dict]:
+    with open(filename, encoding='utf-8') as results_file:
+        return [json.loads(line) for line in results_file]
+
+
+def test_read_values():
+    """Check reading values one per line, or from a CSV column."""
+    assert list(read_values(io.StringIO(' RID56\n\n12921003 \n'))) == ['RID56', '12921003']
+    csv_file = io.StringIO('code,note\nRID56,a\n,b\n12921003,c\n')
+    assert list(read_values(csv_file, 'code')) == ['RID56', '12921003']
+    with pytest.raises(ValueError, match='No column id in the CSV header'):
+        list(read_values(io.StringIO('code\nRID56\n'), 'id'))
+
+
+@pytest.mark.usefixtures('_no_singleton')
+@pytest.mark.parametrize('workers', [1, 2])
+def test_batch(sample_json_data_filename: str, tmp_path, workers: int):
+    """Check that a batch of IDs and codes gives one result per value, in order."""
+    input_filename = tmp_path / 'values.txt'
+    input_filename.write_text(f'{PELVIS_ID}\n12921003\nRID0\n' * 3, encoding='utf-8')
+    output_filename = str(tmp_path / 'results.jsonl')
+    main([
+        '-f', sample_json_data_filename,
+        'batch', str(input_filename),
+        '-o', output_filename,
+        '--workers', str(workers),
+        '--chunk-size', '2',
+    ])
+    results = _read_lines(output_filename)
+    assert [result['query'] for result in results] == [PELVIS_ID, '12921003', 'RID0'] * 3
+    assert [(result['match'] or {}).get('radlexId') for result in results[:3]] == [
+        PELVIS_ID,
+        PELVIS_ID,
+        None,
+    ]
+
+
+@pytest.mark.usefixtures('_no_singleton')
+def test_batch_spawned_workers(sample_json_data_filename: str, monkeypatch):
+    """Check that workers that are not forked load the parent's index, without setting up their own."""
+    spawn_context = multiprocessing.get_context('spawn')
+    monkeypatch.setattr(multiprocessing, 'get_context', lambda method=None: spawn_context)
+    BodyPartIndex(json_filename=sample_json_data_filename)
+    # Workers would fail if they read the data themselves
+    args = argparse.Namespace(
+        from_file='no_such_file.json',
+        from_snapshot=None,
+        from_url=None,
+        verbose=False,
+        workers=2,
+        chunk_size=2,
+        column=None,
+        search=False,
+        limit=10,
+    )
+    output_file = io.StringIO()
+    # Many more chunks than are fed to the workers at a time
+    count = run_batch(args, io.StringIO(f'{PELVIS_ID}\nRID0\n' * 50), output_file)
+    results = [json.loads(line) for line in output_file.getvalue().splitlines()]
+    assert count == len(results) == 100
+    assert [result['query'] for result in results] == [PELVIS_ID, 'RID0'] * 50
+    assert [(result['match'] or {}).get('radlexId') for result in results[:2]] == [PELVIS_ID, None]
+
+
+@pytest.mark.usefixtures('_no_singleton')
+def test_batch_search(sample_json_data_filename: str, tmp_path):
+    """Check that a batch of search terms from a CSV column gives the best matches for each."""
+    input_filename = tmp_path / 'terms.csv'
+    input_filename.write_text('term\nuterine adnexa\nno such thing\n', encoding='utf-8')
+    output_filename = str(tmp_path / 'results.jsonl')
+    main([
+        '-f', sample_json_data_filename,
+        'batch', str(input_filename),
+        '--column', 'term',
+        '--search',
+        '--limit', '1',
+        '-o', output_filename,
+    ])
+    results = _read_lines(output_filename)
+    assert results[0]['matches'][0]['radlexId'] == UTERINE_ADNEXA_ID
+    assert len(results[0]['matches']) == 1
+    assert results[1] == {'query': 'no such thing', 'matches': []}
+
+
+@pytest.mark.usefixtures('_no_singleton')
+def test_tree(sample_json_data_filename: str, capsys):
+    """Check that the tree dump lists the body parts below the root, indented by depth."""
+    main(['-f', sample_json_data_filename, 'tree', PELVIS_ID, '--prune', UTERINE_ADNEXA_ID])
+    lines = capsys.readouterr().out.splitlines()
+    assert lines[0] == f'{PELVIS_ID}: pelvis'
+    assert f'  {UTERINE_ADNEXA_ID}: uterine adnexa' not in lines
+    assert '  RID270: female genital system' in lines
+    BodyPartIndex.reset_instance()
+    main(['-f', sample_json_data_filename, 'tree', '--json', '--max-depth', '1'])
+    results = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    assert [(result['depth'], result['radlexId']) for result in results] == [
+        (0, 'RID39569'),
+        (1, 'RID56'),
+        (1, PELVIS_ID),
+    ]
+
+
+def test_tree_into_closed_pipe():
+    """Make sure the tree dump stops quietly, with status 1, when the reader closes the pipe early."""
+    with subprocess.Popen(
+        [sys.executable, '-m', 'body_part_index', 'tree'],
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+    ) as process:
+        assert process.stdout is not None and process.stderr is not None
+        assert process.stdout.readline()
+        process.stdout.close()
+        errors = process.stderr.read()
+    assert process.returncode == 1
+    assert b'Traceback' not in errors
+    assert b'Exception ignored' not in errors
@@ -0,0 +1,161 @@
+# pylint: disable=missing-module-docstring
+import copy
+import json
+from typing import Dict, Iterator
+import pytest
+from body_part_index import BodyPartIndex
+from body_part_index.delta import apply_change, compute_delta, main
+
+# pylint: disable=no-name-in-module
+from . import (
+    AREOLA_OF_MALE_BREAST_ID,
+    NIPPLE_OF_MALE_BREAST_ID,
+    OVARIAN_ARTERY_ID,
+    PELVIS_ID,
+    RIGHT_OVARIAN_ARTERY_ID,
+    UTERINE_ADNEXA_ID,
+)
+
+# pylint: enable=no-name-in-module
+
+QUERIES = ['adnexa', 'pelvis', 'artery', 'areola', 'uterus', 'ARE1', 'new part']
+
+
+@pytest.fixture
+def new_json_data(sample_json_data) -> Dict:
+    """Returns a later version of the sample data, with parts added, removed and changed."""
+    new_data = copy.deepcopy(sample_json_data)
+    new_data['$version'] = 'next'
+    body_parts = {body_part['radlexId']: body_part for body_part in new_data['bodyParts']}
+    body_parts[UTERINE_ADNEXA_ID]['description'] = 'adnexa of uterus'
+    body_parts[UTERINE_ADNEXA_ID]['synonyms'] = ['adnexal region']
+    body_parts[AREOLA_OF_MALE_BREAST_ID]['codes'].append({'system': 'SNOMED', 'code': 'ARE1'})
+    body_parts[RIGHT_OVARIAN_ARTERY_ID]['containedById'] = 'RIDNEW'
+    del body_parts[RIGHT_OVARIAN_ARTERY_ID]['unsidedId']
+    del body_parts[OVARIAN_ARTERY_ID]
+    new_data['bodyParts'] = list(body_parts.values())
+    new_data['bodyParts'].append(
+        {'radlexId': 'RIDNEW', 'description': 'new part', 'containedById': PELVIS_ID}
+    )
+    return new_data
+
+
+@pytest.fixture
+def _empty_singleton() -> Iterator[None]:
+    """Makes sure no singleton exists before and after the test."""
+    if BodyPartIndex.is_initialized():
+        BodyPartIndex.reset_instance()
+    yield
+    BodyPartIndex.reset_instance()
+
+
+def _summary(bpi: BodyPartIndex) -> Dict:
+    """Everything that can be looked up in an index, as plain values."""
+
+    def ids(body_parts) -> list:
+        return sorted(body_part.radlex_id for body_part in body_parts)
+
+    body_parts = {}
+    for body_part in bpi.get_all_body_parts():
+        body_parts[body_part.radlex_id] = {
+            'fields': bpi.get_by_id(body_part.radlex_id).__repr__(),
+            'children': ids(body_part.children),
+            'part_of_children': ids(body_part.part_of_children),
+            'descendants': ids(body_part.descendants),
+            'snomed_code': body_part.snomed_code,
+            'codes': [bpi.get_by_code(code).radlex_id for code in body_part.codes],
+        }
+    return {
+        'version': bpi.version,
+        'body_parts': body_parts,
+        'search': {query: ids(bpi.search(query)) for query in QUERIES},
+        'ranked_search': {query: ids(bpi.ranked_search(query)) for query in QUERIES},
+        'fuzzy_search': {query: ids(bpi.fuzzy_search(query)) for query in QUERIES},
+        'get': {query: getattr(bpi.get(query), 'radlex_id', None) for query in QUERIES},
+        'crosswalk': sorted(zip(*bpi.crosswalk_table(['SNOMED', 'FMA']).values())),
+    }
+
+
+def test_compute_delta(sample_json_data, new_json_data):
+    """Make sure a delta holds just the differences, and turns the old data into the new."""
+    delta = compute_delta(sample_json_data, new_json_data)
+    assert (delta['fromVersion'], delta['toVersion']) == (sample_json_data['$version'], 'next')
+    assert [body_part['radlexId'] for body_part in delta['added']] == ['RIDNEW']
+    assert delta['removed'] == [OVARIAN_ARTERY_ID]
+    changes = {change['radlexId']: change for change in delta['changed']}
+    assert changes[UTERINE_ADNEXA_ID] == {
+        'radlexId': UTERINE_ADNEXA_ID,
+        'description': 'adnexa of uterus',
+        'addedSynonyms': ['adnexal region'],
+        'removedSynonyms': ['adnexa'],
+    }
+    added_codes = changes[AREOLA_OF_MALE_BREAST_ID]['addedCodes']
+    assert added_codes == [{'system': 'SNOMED', 'code': 'ARE1'}]
+    assert changes[RIGHT_OVARIAN_ARTERY_ID]['unsidedId'] is None
+    old_body_parts = {bp['radlexId']: bp for bp in sample_json_data['bodyParts']}
+    new_body_parts = {bp['radlexId']: bp for bp in new_json_data['bodyParts']}
+    for (radlex_id, change) in changes.items():
+        assert apply_change(old_body_parts[radlex_id], change) == new_body_parts[radlex_id]
+    assert compute_delta(new_json_data, new_json_data)['changed'] == []
+
+
+@pytest.mark.parametrize('lazy', [False, True])
+@pytest.mark.usefixtures('_empty_singleton')
+def test_apply_delta(sample_json_data, new_json_data, lazy):
+    """Make sure an updated index answers every lookup like an index built from the new data."""
+    expected = _summary(BodyPartIndex(json_data=new_json_data, lazy=lazy))
+    BodyPartIndex.reset_instance()
+    bpi = BodyPartIndex(json_data=sample_json_data, lazy=lazy)
+    _summary(bpi)  # Fill in the cached values and search postings
+    assert bpi.apply_delta(compute_delta(sample_json_data, new_json_data)) == 5
+    assert _summary(bpi) == expected
+
+
+@pytest.mark.usefixtures('_empty_singleton')
+def test_apply_delta_updates_body_parts(sample_json_data, new_json_data):
+    """Make sure changed BodyParts are updated in place, and stale cached values are dropped."""
+    bpi = BodyPartIndex(json_data=sample_json_data)
+    adnexa = bpi.get_by_id(UTERINE_ADNEXA_ID)
+    nipple = bpi.get_by_id(NIPPLE_OF_MALE_BREAST_ID)
+    assert nipple.snomed_code is None
+    right_artery = bpi.get_by_id(RIGHT_OVARIAN_ARTERY_ID)
+    assert right_artery.unsided.radlex_id == OVARIAN_ARTERY_ID
+    bpi.apply_delta(compute_delta(sample_json_data, new_json_data))
+    assert bpi.get_by_id(UTERINE_ADNEXA_ID) is adnexa
+    assert adnexa.description == 'adnexa of uterus'
+    assert adnexa.synonyms == ['adnexal region']
+    # The nipple has no SNOMED code of its own, so it uses the one added to its container
+    assert nipple.snomed_code == 'ARE1'
+    assert right_artery.unsided is None
+    assert right_artery.contained_by is bpi.get_by_id('RIDNEW')
+    assert bpi.version == 'next'
+
+
+@pytest.mark.usefixtures('_empty_singleton')
+def test_apply_delta_errors(sample_json_data, new_json_data):
+    """Make sure deltas that do not fit are rejected without changing the index."""
+    bpi = BodyPartIndex(json_data=sample_json_data)
+    delta = compute_delta(sample_json_data, new_json_data)
+    with pytest.raises(ValueError, match='Delta from version other'):
+        bpi.apply_delta({**delta, 'fromVersion': 'other'})
+    with pytest.raises(ValueError, match='Not a body part delta'):
+        bpi.apply_delta({'fromVersion': bpi.version})
+    with pytest.raises(Exception, match='No BodyPart with ID'):
+        bpi.apply_delta({**delta, 'removed': ['RID0']})
+    with pytest.raises(ValueError, match='Duplicate BodyPart'):
+        bpi.apply_delta({**delta, 'added': sample_json_data['bodyParts'][:1]})
+    assert bpi.get_by_id(UTERINE_ADNEXA_ID).description == 'uterine adnexa'
+    assert bpi.version == sample_json_data['$version']
+    bpi.freeze()
+    with pytest.raises(ValueError, match='frozen'):
+        bpi.apply_delta(delta)
+
+
+def test_delta_tool(sample_json_data, new_json_data, tmp_path):
+    """Make sure the command line tool writes the delta between two files."""
+    (old_filename, new_filename) = (tmp_path / 'old.json', tmp_path / 'new.json')
+    old_filename.write_text(json.dumps(sample_json_data), encoding='utf-8')
+    new_filename.write_text(json.dumps(new_json_data), encoding='utf-8')
+    main([str(old_filename), str(new_filename), '--output', str(tmp_path / 'delta.json')])
+    delta = json.loads((tmp_path / 'delta.json').read_text(encoding='utf-8'))
+    assert delta == compute_delta(sample_json_data, new_json_data)
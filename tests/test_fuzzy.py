@@ -0,0 +1,77 @@
+# pylint: disable=missing-module-docstring
+import pytest
+from body_part_index.fuzzy import DeletionIndex, deletes, levenshtein_distance
+
+
+@pytest.mark.parametrize(
+    ('first', 'second', 'max_distance', 'expected'),
+    [
+        ('adnexa', 'adnexa', 2, 0),
+        ('adnexxa', 'adnexa', 2, 1),
+        ('pancras', 'pancreas', 2, 1),
+        ('kitten', 'sitting', 3, 3),
+        ('kitten', 'sitting', 2, None),
+        ('liver', 'pelvis', 2, None),
+        ('', 'ab', 2, 2),
+    ],
+)
+def test_levenshtein_distance(first: str, second: str, max_distance: int, expected):
+    """Make sure edit distances are right and give up past the maximum."""
+    assert levenshtein_distance(first, second, max_distance) == expected
+    assert levenshtein_distance(second, first, max_distance) == expected
+
+
+def test_deletes():
+    """Make sure we get every string with up to the given number of characters removed."""
+    assert deletes('abc', 1) == {'abc', 'ab', 'ac', 'bc'}
+    assert deletes('ab', 2) == {'ab', 'a', 'b', ''}
+
+
+def test_lookup_matches_brute_force():
+    """Make sure the deletion index finds exactly the terms within the distance."""
+    terms = [
+        'uterine adnexa',
+        'adnexa',
+        'pancreas',
+        'pancreatic duct',
+        'xuterine adnexa',
+        'pelvis',
+        'renal pelvis',
+    ]
+    index = DeletionIndex(max_distance=2, prefix_length=4)
+    for term in terms:
+        index.add(term)
+    for query in ['adnexxa', 'pancras', 'uterine adnexa', 'uterin adnex', 'pelvic', 'kidney']:
+        expected = {
+            (term, levenshtein_distance(query, term, 2))
+            for term in terms
+            if levenshtein_distance(query, term, 2) is not None
+        }
+        assert set(index.lookup(query)) == expected
+
+
+def test_lookup_order_and_limits():
+    """Make sure closer matches come first and max_distance is enforced."""
+    index = DeletionIndex(max_distance=1)
+    index.add('pelvis')
+    index.add('pelvic')
+    assert index.lookup('pelvis') == [('pelvis', 0), ('pelvic', 1)]
+    assert index.lookup('pelvis', max_distance=0) == [('pelvis', 0)]
+    with pytest.raises(ValueError, match='max_distance can be at most 1'):
+        index.lookup('pelvis', max_distance=2)
+
+
+def test_discard():
+    """Make sure a discarded term is no longer found, whether it was indexed yet or not."""
+    for lookup_first in (False, True):
+        index = DeletionIndex(max_distance=1)
+        index.add('pelvis')
+        index.add('pelvic')
+        if lookup_first:
+            index.lookup('pelvis')
+        index.discard('pelvic')
+        index.discard('kidney')
+        assert index.lookup('pelvis') == [('pelvis', 0)]
+        index.add('pelvic')
+        assert index.lookup('pelvis') == [('pelvis', 0), ('pelvic', 1)]
+        assert len(index) == 2
@@ -0,0 +1,93 @@
+# pylint: disable=missing-module-docstring
+from body_part_index.hierarchy import ContainmentHierarchy
+
+PARENTS = {
+    'root': 'root',
+    'a': 'root',
+    'b': 'root',
+    'a1': 'a',
+    'a2': 'a',
+    'a11': 'a1',
+    'b1': 'b',
+}
+
+
+def test_subtree_ranges_are_nested():
+    """Make sure every subtree range lies inside the range of its container."""
+    hierarchy = ContainmentHierarchy(PARENTS)
+    assert len(hierarchy) == len(PARENTS)
+    assert hierarchy.subtree_range('root') == (0, len(PARENTS))
+    for radlex_id, parent_id in PARENTS.items():
+        if parent_id == radlex_id:
+            continue
+        (start, end) = hierarchy.subtree_range(radlex_id)
+        (parent_start, parent_end) = hierarchy.subtree_range(parent_id)
+        assert parent_start < start < end <= parent_end
+
+
+def test_descendant_ids():
+    """Make sure the descendants are the contiguous slice after a body part."""
+    hierarchy = ContainmentHierarchy(PARENTS)
+    assert set(hierarchy.descendant_ids('a')) == {'a1', 'a2', 'a11'}
+    assert set(hierarchy.descendant_ids('root')) == set(PARENTS) - {'root'}
+    assert len(hierarchy.descendant_ids('a11')) == 0
+    assert len(hierarchy.descendant_ids('missing')) == 0
+
+
+def test_is_ancestor():
+    """Make sure ancestry checks are strict and stay within a tree."""
+    hierarchy = ContainmentHierarchy(PARENTS)
+    assert hierarchy.is_ancestor('root', 'a11')
+    assert hierarchy.is_ancestor('a', 'a11')
+    assert not hierarchy.is_ancestor('b', 'a11')
+    assert not hierarchy.is_ancestor('a11', 'a')
+    assert not hierarchy.is_ancestor('a', 'a')
+    assert not hierarchy.is_ancestor('missing', 'a')
+
+
+def test_missing_container_and_cycle():
+    """Make sure orphans and cycles still get labels instead of being dropped."""
+    hierarchy = ContainmentHierarchy({'x': 'missing', 'y': 'x', 'p': 'q', 'q': 'p'})
+    assert len(hierarchy) == 4
+    assert hierarchy.is_ancestor('x', 'y')
+    assert 'p' in hierarchy and 'q' in hierarchy
+    assert hierarchy.is_ancestor('p', 'q') != hierarchy.is_ancestor('q', 'p')
+
+
+def test_lowest_common_ancestor():
+    """Make sure the lowest common ancestor is the most specific shared container."""
+    hierarchy = ContainmentHierarchy(PARENTS)
+    assert hierarchy.lowest_common_ancestor(['a11', 'a2']) == 'a'
+    assert hierarchy.lowest_common_ancestor(['a11', 'b1']) == 'root'
+    assert hierarchy.lowest_common_ancestor(['a11', 'a2', 'b']) == 'root'
+    assert hierarchy.lowest_common_ancestor(['a1', 'a11']) == 'a1'
+    assert hierarchy.lowest_common_ancestor(['a11']) == 'a11'
+    assert hierarchy.lowest_common_ancestor([]) is None
+    assert hierarchy.lowest_common_ancestor(['a11', 'missing']) is None
+
+
+def test_lowest_common_ancestor_deep_chain():
+    """Make sure binary lifting finds the common ancestor deep in a long chain."""
+    parents = {'n0': 'n0'}
+    for i in range(1, 200):
+        parents[f'n{i}'] = f'n{i - 1}'
+    parents['branch'] = 'n150'
+    hierarchy = ContainmentHierarchy(parents)
+    assert hierarchy.lowest_common_ancestor(['n199', 'branch']) == 'n150'
+    assert hierarchy.lowest_common_ancestor(['branch', 'n151']) == 'n150'
+    assert hierarchy.lowest_common_ancestor(['n7', 'branch']) == 'n7'
+
+
+def test_lowest_common_ancestor_different_trees():
+    """Make sure body parts in separate trees have no common ancestor."""
+    hierarchy = ContainmentHierarchy({'x': 'missing', 'y': 'x', 'z': 'other'})
+    assert hierarchy.lowest_common_ancestor(['y', 'z']) is None
+
+
+def test_to_and_from_arrays():
+    """Make sure a hierarchy recreated from its arrays answers queries the same way."""
+    hierarchy = ContainmentHierarchy(PARENTS)
+    copy = ContainmentHierarchy.from_arrays(*hierarchy.to_arrays())
+    assert copy.to_arrays() == hierarchy.to_arrays()
+    assert copy.is_ancestor('root', 'a11')
+    assert copy.lowest_common_ancestor(['a11', 'a2']) == 'a'
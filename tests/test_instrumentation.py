@@ -0,0 +1,102 @@
+# pylint: disable=missing-module-docstring
+from typing import Iterator, List, Optional, Tuple
+import pytest
+from body_part_index import BodyPart, BodyPartIndex
+from body_part_index.instrumentation import LATENCY_BUCKETS, OperationStats
+
+# pylint: disable=no-name-in-module
+from . import UTERINE_ADNEXA_ID, LEFT_UTERINE_ADNEXA_ID
+
+# pylint: enable=no-name-in-module
+
+
+@pytest.fixture
+def _uninstrumented() -> Iterator[None]:
+    """Make sure instrumentation is off before and after a test."""
+    BodyPartIndex.disable_instrumentation()
+    yield
+    BodyPartIndex.disable_instrumentation()
+
+
+def test_operation_stats():
+    """Check counting hits and misses, and bucketing latencies."""
+    stats = OperationStats()
+    stats.record(0.5e-6, True)
+    stats.record(3e-6, False)
+    stats.record(10.0, None)
+    result = stats.to_dict()
+    assert (result['calls'], result['hits'], result['misses']) == (3, 1, 1)
+    assert result['hit_ratio'] == 0.5
+    assert result['histogram'][0] == [LATENCY_BUCKETS[0], 1]
+    assert result['histogram'][2] == [LATENCY_BUCKETS[2], 1]
+    assert result['histogram'][-1] == [None, 1]
+    assert result['p50_seconds'] == LATENCY_BUCKETS[2]
+    assert result['p99_seconds'] is None
+
+
+@pytest.mark.usefixtures('_uninstrumented')
+def test_instrumented_lookups(sample_body_part_index: BodyPartIndex):
+    """Check that lookups are counted while instrumentation is on, and the callback is called."""
+    events: List[Tuple[str, float, Optional[bool]]] = []
+    instrumentation = BodyPartIndex.enable_instrumentation(
+        lambda operation, seconds, hit: events.append((operation, seconds, hit))
+    )
+    assert BodyPartIndex.get_instrumentation() is instrumentation
+    with pytest.raises(ValueError, match='already enabled'):
+        BodyPartIndex.enable_instrumentation()
+    sample_body_part_index.get(UTERINE_ADNEXA_ID)
+    sample_body_part_index.get('no such code')
+    sample_body_part_index.search('adnexa')
+    with pytest.raises(Exception, match='No BodyPart with ID RID0'):
+        sample_body_part_index.get_by_id('RID0')
+    operations = instrumentation.snapshot()['operations']
+    assert (operations['get']['hits'], operations['get']['misses']) == (1, 1)
+    assert operations['search']['hits'] == 1
+    assert operations['get_by_id']['misses'] == 1
+    assert [event[0] for event in events] == ['get', 'get', 'search', 'get_by_id']
+    assert [event[2] for event in events] == [True, False, True, False]
+
+
+@pytest.mark.usefixtures('_uninstrumented')
+def test_instrumented_cached_properties(sample_body_part_index: BodyPartIndex):
+    """Check that reads of cached BodyPart properties count as misses until the value is cached."""
+    body_part = sample_body_part_index.get_by_id(LEFT_UTERINE_ADNEXA_ID)
+    BodyPart.unsided.reset(body_part)
+    instrumentation = BodyPartIndex.enable_instrumentation()
+    assert body_part.unsided.radlex_id == UTERINE_ADNEXA_ID
+    assert body_part.unsided.radlex_id == UTERINE_ADNEXA_ID
+    stats = instrumentation.snapshot()['operations']['BodyPart.unsided']
+    assert (stats['calls'], stats['hits'], stats['misses']) == (2, 1, 1)
+    # Resetting goes through the stand-in for the cached property
+    body_part._forget_relationships()  # pylint: disable=protected-access
+    assert body_part.unsided.radlex_id == UTERINE_ADNEXA_ID
+    assert instrumentation.snapshot()['operations']['BodyPart.unsided']['misses'] == 2
+
+
+@pytest.mark.usefixtures('_uninstrumented')
+def test_build_phases(sample_json_data_filename: str):
+    """Check that the phases of building an index are timed."""
+    instrumentation = BodyPartIndex.enable_instrumentation()
+    if BodyPartIndex.is_initialized():
+        BodyPartIndex.reset_instance()
+    BodyPartIndex(json_filename=sample_json_data_filename, frozen=True)
+    snapshot = instrumentation.snapshot()
+    assert snapshot['builds'] == 1
+    assert set(snapshot['build_phases']) == {'parse', 'construct', 'index', 'check', 'freeze'}
+    assert all(seconds >= 0 for seconds in snapshot['build_phases'].values())
+    instrumentation.reset()
+    assert instrumentation.snapshot() == {'operations': {}, 'builds': 0, 'build_phases': {}}
+    BodyPartIndex.reset_instance()
+
+
+@pytest.mark.usefixtures('_uninstrumented')
+def test_disable_instrumentation(sample_body_part_index: BodyPartIndex):
+    """Check that disabling instrumentation puts back the original methods and properties."""
+    (original_get, original_left) = (BodyPartIndex.get, BodyPart.__dict__['left'])
+    instrumentation = BodyPartIndex.enable_instrumentation()
+    assert BodyPartIndex.get is not original_get
+    assert BodyPartIndex.disable_instrumentation() is instrumentation
+    assert BodyPartIndex.get_instrumentation() is None
+    assert (BodyPartIndex.get, BodyPart.__dict__['left']) == (original_get, original_left)
+    sample_body_part_index.get(UTERINE_ADNEXA_ID)
+    assert instrumentation.snapshot()['operations'] == {}
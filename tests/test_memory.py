@@ -0,0 +1,19 @@
+# pylint: disable=missing-module-docstring
+import sys
+from body_part_index.memory import deep_sizeof
+
+
+def test_deep_sizeof():
+    """Make sure contained objects are counted, but shared ones only once."""
+    text = 'uterine adnexa' * 10
+    assert deep_sizeof([text]) == sys.getsizeof([text]) + sys.getsizeof(text)
+    assert deep_sizeof([text, text]) == sys.getsizeof([text, text]) + sys.getsizeof(text)
+    assert deep_sizeof({'key': (text,)}) > deep_sizeof({'key': ()})
+
+
+def test_deep_sizeof_seen():
+    """Make sure objects already seen are not counted again."""
+    text = 'uterine adnexa' * 10
+    seen = set()
+    deep_sizeof(text, seen)
+    assert deep_sizeof([text], seen) == sys.getsizeof([text])
@@ -0,0 +1,77 @@
+# pylint: disable=missing-module-docstring
+import json
+import pytest
+from body_part_index import BodyPartIndex
+from body_part_index.refresh import fetch_data
+
+# pylint: disable=no-name-in-module
+from . import PELVIS_ID
+from .conftest import StubDataServer
+
+# pylint: enable=no-name-in-module
+
+
+def test_fetch_data_conditionally(stub_server: StubDataServer, sample_json_data, tmp_path):
+    """Make sure data is only downloaded again when it changed."""
+    first = fetch_data(stub_server.url, str(tmp_path))
+    assert first.changed
+    with open(first.filename, encoding='utf-8') as data_file:
+        assert json.load(data_file) == sample_json_data
+    second = fetch_data(stub_server.url, str(tmp_path))
+    assert not second.changed
+    assert second.validator == first.validator
+    assert stub_server.statuses == [200, 304]
+    stub_server.set_document({**sample_json_data, '$version': 'next'})
+    third = fetch_data(stub_server.url, str(tmp_path))
+    assert third.changed
+    assert third.validator != first.validator
+
+
+def test_fetch_data_offline(stub_server: StubDataServer, tmp_path):
+    """Make sure the cached copy is used when the server is gone (and an error without one)."""
+    fetched = fetch_data(stub_server.url, str(tmp_path))
+    url = stub_server.url
+    stub_server.shutdown()
+    stub_server.server_close()
+    assert fetch_data(url, str(tmp_path), timeout=1) == fetched._replace(changed=False)
+    with pytest.raises(OSError, match='urlopen error'):
+        fetch_data(url, str(tmp_path / 'empty'), timeout=1)
+
+
+def test_fetch_data_server_error(stub_server: StubDataServer, tmp_path):
+    """Make sure the cached copy is used when the server answers with an error."""
+    fetched = fetch_data(stub_server.url, str(tmp_path))
+    stub_server.error_status = 503
+    assert fetch_data(stub_server.url, str(tmp_path)) == fetched._replace(changed=False)
+    with pytest.raises(OSError, match='503'):
+        fetch_data(stub_server.url, str(tmp_path / 'empty'))
+
+
+def test_fetch_data_without_validator(stub_server: StubDataServer, tmp_path):
+    """Make sure a meta file without a validator counts as a cache miss."""
+    fetched = fetch_data(stub_server.url, str(tmp_path))
+    (meta_filename,) = tmp_path.glob('*.meta.json')
+    meta_filename.write_text(json.dumps({'url': stub_server.url}), encoding='utf-8')
+    assert fetch_data(stub_server.url, str(tmp_path)) == fetched
+    assert stub_server.statuses == [200, 200]
+
+
+def test_refresh_swaps_singleton(stub_server: StubDataServer, sample_json_data, tmp_path):
+    """Make sure refresh replaces the singleton only for new data, leaving the old index usable."""
+    if BodyPartIndex.is_initialized():
+        BodyPartIndex.reset_instance()
+    assert BodyPartIndex.refresh(url=stub_server.url, cache_directory=str(tmp_path))
+    old_index = BodyPartIndex.get_instance()
+    old_pelvis = old_index.get_by_id(PELVIS_ID)
+    assert not BodyPartIndex.refresh(url=stub_server.url, cache_directory=str(tmp_path))
+    assert BodyPartIndex.get_instance() is old_index
+
+    stub_server.set_document({**sample_json_data, '$version': 'next'})
+    future = BodyPartIndex.refresh_in_background(url=stub_server.url, cache_directory=str(tmp_path))
+    assert future.result(timeout=10)
+    new_index = BodyPartIndex.get_instance()
+    assert new_index is not old_index
+    assert new_index.version == 'next'
+    assert old_index.version == sample_json_data['$version']
+    assert old_pelvis.contained_by is old_index.get_by_id(old_pelvis.contained_by_id)
+    BodyPartIndex.reset_instance()
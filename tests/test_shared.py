@@ -0,0 +1,101 @@
+# pylint: disable=missing-module-docstring
+import multiprocessing
+import pickle
+from typing import List, Optional
+import pytest
+from body_part_index import BodyPartIndex, BodyPart, Code, SharedBodyPartIndex
+
+# pylint: disable=no-name-in-module
+from . import ABDOMEN_ID, PELVIS_ID, UTERINE_ADNEXA_ID, LEFT_UTERINE_ADNEXA_ID
+
+# pylint: enable=no-name-in-module
+
+
+def _fields(body_part: BodyPart):
+    return (
+        body_part.radlex_id,
+        body_part.description,
+        body_part.contained_by_id,
+        body_part.codes,
+        body_part.synonyms,
+        body_part.unsided_id,
+        body_part.left_id,
+        body_part.right_id,
+        body_part.part_of_id,
+        body_part.sex_specific,
+    )
+
+
+def _ids(body_parts) -> List[str]:
+    return sorted(bp.radlex_id for bp in body_parts)
+
+
+@pytest.fixture
+def shared_index_filename(sample_body_part_index: BodyPartIndex, tmp_path) -> str:
+    """Returns the name of a shared index file written from the sample index."""
+    filename = str(tmp_path / 'body_parts.bpshm')
+    sample_body_part_index.save_shared_index(filename)
+    return filename
+
+
+def test_shared_index_matches(sample_body_part_index: BodyPartIndex, shared_index_filename: str):
+    """Make sure the shared index has the same body parts, relationships and lookups."""
+    with SharedBodyPartIndex(shared_index_filename) as shared:
+        assert len(shared) == len(sample_body_part_index.get_all_body_parts())
+        assert shared.version == sample_body_part_index.version
+        for body_part in sample_body_part_index.get_all_body_parts():
+            radlex_id = body_part.radlex_id
+            shared_body_part = shared.get_by_id(radlex_id)
+            assert _fields(shared_body_part) == _fields(body_part)
+            assert _ids(shared_body_part.children) == _ids(body_part.children)
+            assert _ids(shared_body_part.part_of_children) == _ids(body_part.part_of_children)
+            assert [bp.radlex_id for bp in shared.get_descendants(radlex_id)] == [
+                bp.radlex_id for bp in sample_body_part_index.get_descendants(radlex_id)
+            ]
+            assert shared_body_part.snomed_code == body_part.snomed_code
+            for code in body_part.codes:
+                assert shared.get_by_code(code) == sample_body_part_index.get_by_code(code)
+                assert shared.get(code.code) == sample_body_part_index.get(code.code)
+        for query in ['adnexa', 'RID29', 'Left', 'le', '', 'no such text', 'adnexa\n', 'ütérus']:
+            assert _ids(shared.search(query)) == _ids(sample_body_part_index.search(query))
+
+
+def test_shared_index_lookups(shared_index_filename: str):
+    """Make sure BodyParts from a shared index work with the Index protocol, and misses are safe."""
+    with SharedBodyPartIndex(shared_index_filename) as shared:
+        adnexa = shared.get_by_id(UTERINE_ADNEXA_ID)
+        assert adnexa is shared.get(UTERINE_ADNEXA_ID)
+        assert adnexa.contained_by.radlex_id == PELVIS_ID
+        assert adnexa.left.radlex_id == LEFT_UTERINE_ADNEXA_ID
+        assert adnexa.is_contained(shared.get_by_id(ABDOMEN_ID)) is False
+        assert shared.get_by_id(PELVIS_ID).is_ancestor_of(adnexa)
+        assert shared.get('RID0') is None
+        assert shared.get_by_code(Code('SNOMED', 'RID0')) is None
+        assert not shared.get_children('RID0')
+        assert not shared.is_ancestor('RID0', PELVIS_ID)
+        with pytest.raises(Exception, match='No BodyPart'):
+            shared.get_by_id('RID0')
+
+
+def test_shared_index_invalid_file(tmp_path):
+    """Make sure files that are not shared indices are rejected."""
+    filename = tmp_path / 'not_an_index'
+    filename.write_bytes(b'BPIDX' + bytes(100))
+    with pytest.raises(ValueError, match='not a shared body part index'):
+        SharedBodyPartIndex(str(filename))
+
+
+def _worker_lookup(args) -> Optional[str]:
+    (shared, radlex_id) = args
+    body_part = shared.get(radlex_id)
+    return body_part.contained_by_id if body_part is not None else None
+
+
+def test_shared_index_in_worker_processes(shared_index_filename: str):
+    """Make sure a shared index can be handed to (spawned) worker processes."""
+    with SharedBodyPartIndex(shared_index_filename) as shared:
+        assert pickle.loads(pickle.dumps(shared)).filename == shared_index_filename
+        context = multiprocessing.get_context('spawn')
+        with context.Pool(2) as pool:
+            results = pool.map(_worker_lookup, [(shared, UTERINE_ADNEXA_ID), (shared, 'RID0')])
+        assert results == [PELVIS_ID, None]
@@ -0,0 +1,119 @@
+# pylint: disable=missing-module-docstring
+import pytest
+from body_part_index import BodyPartIndex, Code, WHOLE_BODY_ID
+from body_part_index.snapshot import read_snapshot, write_snapshot
+
+# pylint: disable=no-name-in-module
+from . import ABDOMEN_ID, PELVIS_ID, UTERINE_ADNEXA_ID, LEFT_UTERINE_ADNEXA_ID, RIGHT_OVARIAN_ARTERY_ID
+
+# pylint: enable=no-name-in-module
+
+
+def describe(index: BodyPartIndex) -> dict:
+    """Collect answers to a variety of queries, to compare indices."""
+    return {
+        'version': index.version,
+        'body_parts': [
+            (bp.radlex_id, bp.description, bp.contained_by_id, bp.codes, bp.synonyms, bp.left_id, bp.sex_specific)
+            for bp in index.get_all_body_parts()
+        ],
+        'get': index.get('12921003'),
+        'get_by_code': index.get_by_code(Code('SNOMED', '818983003')),
+        'search': index.search('adnexa'),
+        'ranked_search': index.ranked_search('Pelvis'),
+        'fuzzy_search': index.fuzzy_search('adnexxa'),
+        'children': index.get_children(PELVIS_ID),
+        'part_of_children': index.get_part_of_children('RID270'),
+        'descendants': index.get_descendants(WHOLE_BODY_ID),
+        'is_ancestor': index.is_ancestor(PELVIS_ID, LEFT_UTERINE_ADNEXA_ID),
+        'lca': index.lowest_common_ancestor(
+            index.get_by_id(UTERINE_ADNEXA_ID), index.get_by_id(RIGHT_OVARIAN_ARTERY_ID)
+        ),
+        'snomed_code': index.get_by_id(ABDOMEN_ID).snomed_code,
+    }
+
+
+def test_snapshot_round_trip(sample_json_data_filename: str, tmp_path):
+    """Make sure an index loaded from a snapshot answers queries like the original."""
+    if BodyPartIndex.is_initialized():
+        BodyPartIndex.reset_instance()
+    original = BodyPartIndex(json_filename=sample_json_data_filename)
+    expected = describe(original)
+    snapshot_filename = str(tmp_path / 'sample.snapshot')
+    original.save_snapshot(snapshot_filename)
+    BodyPartIndex.reset_instance()
+    loaded = BodyPartIndex.from_snapshot(snapshot_filename)
+    assert BodyPartIndex.get_instance() is loaded
+    assert loaded.version == 'DEV2022-04-25T18:28:26.959Z'
+    assert describe(loaded) == expected
+    assert all(bp.contained_by_id for bp in loaded.get_all_body_parts())
+    BodyPartIndex.reset_instance()
+
+
+def test_read_snapshot_rejects_other_files(sample_json_data_filename: str, tmp_path):
+    """Make sure files that are not snapshots (or in another format) are rejected."""
+    with pytest.raises(ValueError, match='is not a body part index snapshot'):
+        read_snapshot(sample_json_data_filename)
+    snapshot_filename = str(tmp_path / 'other.snapshot')
+    write_snapshot(snapshot_filename, {'version': None})
+    with open(snapshot_filename, 'r+b') as snapshot_file:
+        snapshot_file.seek(5)
+        snapshot_file.write(bytes([99]))
+    with pytest.raises(ValueError, match='unsupported snapshot format'):
+        read_snapshot(snapshot_filename)
+
+
+def test_is_default_snapshot_current(sample_json_data_filename: str, tmp_path, monkeypatch):
+    """Make sure the packaged snapshot is only used when it was built from the JSON data as it is."""
+    # pylint: disable=import-outside-toplevel
+    import shutil
+    from body_part_index import snapshot
+
+    json_filename = tmp_path / 'body_parts.json'
+    snapshot_filename = str(tmp_path / 'body_parts.snapshot')
+    monkeypatch.setattr(snapshot, 'DEFAULT_JSON_FILENAME', str(json_filename))
+    monkeypatch.setattr(snapshot, 'DEFAULT_SNAPSHOT_FILENAME', snapshot_filename)
+    shutil.copyfile(sample_json_data_filename, json_filename)
+    assert not snapshot.is_default_snapshot_current()
+    version = 'DEV2022-04-25T18:28:26.959Z'
+    write_snapshot(snapshot_filename, {'version': version}, str(json_filename))
+    assert snapshot.read_snapshot_header(snapshot_filename) == {
+        'version': version,
+        'json_digest': snapshot.json_digest(str(json_filename)),
+    }
+    assert snapshot.is_default_snapshot_current()
+    # Another version of the data, or no recorded digest
+    write_snapshot(snapshot_filename, {'version': 'other'}, str(json_filename))
+    assert not snapshot.is_default_snapshot_current()
+    write_snapshot(snapshot_filename, {'version': version})
+    assert not snapshot.is_default_snapshot_current()
+    # JSON data changed after the snapshot was written, whatever the modification times
+    write_snapshot(snapshot_filename, {'version': version}, str(json_filename))
+    json_filename.write_text(json_filename.read_text().replace('abdomen', 'belly'))
+    assert not snapshot.is_default_snapshot_current()
+
+
+def test_default_snapshot_is_loaded(sample_json_data_filename: str, tmp_path, monkeypatch):
+    """Make sure BodyPartIndex() loads the packaged snapshot when it was built from the JSON data."""
+    # pylint: disable=import-outside-toplevel
+    from body_part_index import body_part_index, snapshot
+
+    json_filename = tmp_path / 'body_parts.json'
+    snapshot_filename = str(tmp_path / 'body_parts.snapshot')
+    json_filename.write_text('{"$version": "DEV2022-04-25T18:28:26.959Z", "bodyParts": []}')
+    if BodyPartIndex.is_initialized():
+        BodyPartIndex.reset_instance()
+    # A snapshot of the sample data, recorded as built from the (empty) JSON file
+    BodyPartIndex(json_filename=sample_json_data_filename).save_snapshot(
+        snapshot_filename, json_filename=str(json_filename)
+    )
+    BodyPartIndex.reset_instance()
+    monkeypatch.setattr(snapshot, 'DEFAULT_JSON_FILENAME', str(json_filename))
+    monkeypatch.setattr(snapshot, 'DEFAULT_SNAPSHOT_FILENAME', snapshot_filename)
+    monkeypatch.setattr(body_part_index, 'DEFAULT_SNAPSHOT_FILENAME', snapshot_filename)
+    try:
+        index = BodyPartIndex()
+        # The sample data, rather than the packaged data
+        assert len(list(index.get_all_body_parts())) == 12
+    finally:
+        BodyPartIndex.reset_instance()
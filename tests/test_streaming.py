@@ -0,0 +1,56 @@
+# pylint: disable=missing-module-docstring
+import io
+import json
+import pytest
+from body_part_index.streaming import BodyPartStream
+
+
+@pytest.mark.parametrize('chunk_size', [1, 7, 1 << 16])
+def test_stream_body_parts(sample_json_data_filename: str, sample_json_data, chunk_size: int):
+    """Make sure streaming yields the same body parts and header as loading the whole document."""
+    with open(sample_json_data_filename, encoding='utf-8') as json_file:
+        stream = BodyPartStream(json_file, chunk_size=chunk_size)
+        assert list(stream) == sample_json_data['bodyParts']
+    assert stream.header['$version'] == sample_json_data['$version']
+
+
+def test_stream_header_after_body_parts():
+    """Make sure members after the body parts (including numbers split across chunks) are read."""
+    document = {'bodyParts': [{'radlexId': 'RID56'}], 'count': 12345, '$version': 'v2'}
+    stream = BodyPartStream(io.StringIO(json.dumps(document)), chunk_size=3)
+    assert list(stream) == [{'radlexId': 'RID56'}]
+    assert stream.header == {'count': 12345, '$version': 'v2'}
+
+
+@pytest.mark.parametrize('text', ['{}', '{"bodyParts": []}', ' { "bodyParts" : [ ] } '])
+def test_stream_no_body_parts(text: str):
+    """Make sure empty documents yield nothing."""
+    assert not list(BodyPartStream(io.StringIO(text)))
+
+
+@pytest.mark.parametrize(
+    'text', ['', '[]', '{"bodyParts": [{"radlexId": "RID56"}', '{"bodyParts": [{"radlexId": }]}']
+)
+def test_stream_invalid_json(text: str):
+    """Make sure malformed documents are rejected."""
+    with pytest.raises(ValueError, match='body part JSON'):
+        list(BodyPartStream(io.StringIO(text), chunk_size=4))
+
+
+@pytest.mark.parametrize('broken_entry', ['{"radlexId": }', '{"radlexId": "RID56', '{"radlexId": 1'])
+def test_stream_invalid_entry_before_large_tail(broken_entry: str):
+    """Make sure a malformed entry is rejected without reading the rest of a large file."""
+    entries = ',\n'.join(json.dumps({'radlexId': f'RID{i}'}) for i in range(100000))
+    json_file = io.StringIO(f'{{"bodyParts": [{{"radlexId": "RID0"}}, {broken_entry}, {entries}]}}')
+    stream = BodyPartStream(json_file, chunk_size=1024, max_value_size=1 << 16)
+    with pytest.raises(ValueError, match='Invalid body part JSON'):
+        list(stream)
+    assert json_file.tell() <= 1 << 17
+
+
+def test_stream_value_too_large():
+    """Make sure a value that never ends (e.g., a string missing its closing quote) is rejected."""
+    json_file = io.StringIO('{"bodyParts": [{"radlexId": "RID56' + 'x' * 1000000 + '"}]}')
+    with pytest.raises(ValueError, match='Unterminated string'):
+        list(BodyPartStream(json_file, chunk_size=1024, max_value_size=1 << 16))
+    assert json_file.tell() <= 1 << 17
@@ -0,0 +1,23 @@
+# pylint: disable=missing-module-docstring
+import pytest
+from benchmarks.synthetic import generate_body_parts
+
+REFERENCE_FIELDS = ('containedById', 'partOfId', 'leftId', 'rightId', 'unsidedId')
+
+
+@pytest.mark.parametrize('size', [1, 26, 101, 5001])
+@pytest.mark.parametrize('seed', [0, 3, 7])
+def test_generate_body_parts(size: int, seed: int):
+    """Make sure synthetic data has the requested size and no references to missing body parts."""
+    body_parts = generate_body_parts(size, seed)['bodyParts']
+    assert len(body_parts) == size
+    radlex_ids = {body_part['radlexId'] for body_part in body_parts}
+    assert len(radlex_ids) == size
+    dangling = [
+        (body_part['radlexId'], field)
+        for body_part in body_parts
+        for field in REFERENCE_FIELDS
+        if field in body_part and body_part[field] not in radlex_ids
+    ]
+    assert not dangling
+    assert generate_body_parts(size, seed) == generate_body_parts(size, seed)
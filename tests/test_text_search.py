@@ -0,0 +1,103 @@
+# pylint: disable=missing-module-docstring
+import pytest
+from body_part_index.text_search import (
+    EXACT_DESCRIPTION_MATCH,
+    EXACT_SYNONYM_MATCH,
+    InvertedIndex,
+    TrigramIndex,
+    normalize,
+    tokenize,
+    trigrams,
+)
+
+TEXTS = ['uterine adnexa', 'left uterine adnexa', 'adnexa', 'pelvis', 'true pelvis', 'RID2507', '9578']
+
+
+def test_trigrams():
+    """Make sure we get every overlapping trigram of a text."""
+    assert trigrams('pelvis') == {'pel', 'elv', 'lvi', 'vis'}
+    assert trigrams('ab') == set()
+
+
+@pytest.mark.parametrize(
+    'query', ['adnexa', 'uterine adn', 'pelvis', 'true', 'RID', '95', 'e', '', 'xyz', 'pelvic']
+)
+def test_find_matches_substring_scan(query: str):
+    """Make sure the trigram index finds exactly what a full substring scan finds."""
+    index = TrigramIndex()
+    for text in TEXTS:
+        index.add(text)
+    assert set(index.find(query)) == {text for text in TEXTS if query in text}
+
+
+def test_add_is_idempotent():
+    """Make sure adding the same text twice keeps a single entry."""
+    index = TrigramIndex()
+    index.add('pelvis')
+    index.add('pelvis')
+    assert len(index) == 1
+    assert list(index.find('pelvis')) == ['pelvis']
+
+
+def test_discard():
+    """Make sure a discarded text is no longer found, whether it was indexed yet or not."""
+    for find_first in (False, True):
+        index = TrigramIndex()
+        index.update(['pelvis', 'renal pelvis'])
+        if find_first:
+            index.find('pelvis')
+        index.discard('renal pelvis')
+        assert list(index.find('pelvis')) == ['pelvis']
+        index.add('renal pelvis')
+        assert set(index.find('pelvis')) == {'pelvis', 'renal pelvis'}
+
+
+def test_normalize_and_tokenize():
+    """Make sure normalization ignores case and punctuation."""
+    assert normalize('  Arteria ovarica <female>') == 'arteria ovarica female'
+    assert tokenize('A01.923.047') == ['a01', '923', '047']
+    assert tokenize('---') == []
+
+
+def make_inverted_index() -> InvertedIndex:
+    """Build a small inverted index of anatomic terms."""
+    index = InvertedIndex()
+    index.add('adnexa', 'uterine adnexa', EXACT_DESCRIPTION_MATCH)
+    index.add('adnexa', 'adnexa', EXACT_SYNONYM_MATCH)
+    index.add('left_adnexa', 'left uterine adnexa', EXACT_DESCRIPTION_MATCH)
+    index.add('pelvis', 'pelvis', EXACT_DESCRIPTION_MATCH)
+    index.add('pelvis', 'true pelvis', EXACT_SYNONYM_MATCH)
+    index.add('pelvis', '12921003', EXACT_SYNONYM_MATCH)
+    index.add('renal_pelvis', 'renal pelvis', EXACT_DESCRIPTION_MATCH)
+    return index
+
+
+def test_ranked_search_exact_matches_first():
+    """Make sure exact description and synonym matches outrank token overlap."""
+    index = make_inverted_index()
+    assert index.search('Pelvis', 10) == ['pelvis', 'renal_pelvis']
+    assert index.search('ADNEXA', 10)[0] == 'adnexa'
+    assert index.search('left uterine adnexa', 10)[0] == 'left_adnexa'
+    assert index.search('12921003', 10) == ['pelvis']
+
+
+def test_ranked_search_limit():
+    """Make sure only the requested number of results is returned."""
+    index = make_inverted_index()
+    assert len(index.search('adnexa uterine left pelvis', 2)) == 2
+    assert index.search('kidney', 10) == []
+    assert index.search('', 10) == []
+
+
+def test_ranked_search_remove():
+    """Make sure a removed document is no longer found, whether it was indexed yet or not."""
+    for index_first in (False, True):
+        index = make_inverted_index()
+        if index_first:
+            index.index_pending()
+        index.remove('pelvis', ['pelvis', 'true pelvis', '12921003'])
+        assert index.search('pelvis', 10) == ['renal_pelvis']
+        assert index.search('12921003', 10) == []
+        assert len(index) == 3
+        index.add('pelvis', 'pelvis', EXACT_DESCRIPTION_MATCH)
+        assert index.search('pelvis', 10) == ['pelvis', 'renal_pelvis']
@@ -0,0 +1,77 @@
+# pylint: disable=missing-module-docstring
+import threading
+from typing import Callable, Dict, List
+import pytest
+from body_part_index import BodyPartIndex
+
+# pylint: disable=no-name-in-module
+from . import ABDOMEN_ID, PELVIS_ID, UTERINE_ADNEXA_ID, LEFT_UTERINE_ADNEXA_ID
+
+# pylint: enable=no-name-in-module
+
+THREAD_COUNT = 8
+ROUNDS = 200
+
+
+def _lookups(bpi: BodyPartIndex) -> Dict[str, Callable[[], object]]:
+    def describe(body_parts) -> List[str]:
+        return sorted(bp.radlex_id for bp in body_parts)
+
+    return {
+        'get': lambda: bpi.get(UTERINE_ADNEXA_ID).radlex_id,
+        'children': lambda: describe(bpi.get_by_id(PELVIS_ID).children),
+        'descendants': lambda: describe(bpi.get_by_id(ABDOMEN_ID).descendants),
+        'ancestors': lambda: describe(bpi.get_by_id(LEFT_UTERINE_ADNEXA_ID).ancestors),
+        'left': lambda: bpi.get_by_id(UTERINE_ADNEXA_ID).left.radlex_id,
+        'snomed_code': lambda: bpi.get_by_id(LEFT_UTERINE_ADNEXA_ID).snomed_code,
+        'search': lambda: describe(bpi.search('adnexa')),
+        'ranked_search': lambda: [bp.radlex_id for bp in bpi.ranked_search('uterine adnexa')],
+        'fuzzy_search': lambda: [bp.radlex_id for bp in bpi.fuzzy_search('adnexxa')],
+        'annotate': lambda: [
+            (start, end, bp.radlex_id)
+            for (start, end, bp) in bpi.get_annotator().annotate('Left uterine adnexa, pelvis')
+        ],
+    }
+
+
+def test_frozen_index_concurrent_reads(sample_json_data_filename: str):
+    """Make sure many threads reading a fresh frozen index all get the single-threaded results."""
+    if BodyPartIndex.is_initialized():
+        BodyPartIndex.reset_instance()
+    reference = BodyPartIndex(json_filename=sample_json_data_filename)
+    expected = {name: lookup() for (name, lookup) in _lookups(reference).items()}
+    BodyPartIndex.reset_instance()
+
+    bpi = BodyPartIndex(json_filename=sample_json_data_filename, frozen=True)
+    assert bpi.is_frozen
+    lookups = _lookups(bpi)
+    barrier = threading.Barrier(THREAD_COUNT)
+    failures: List[str] = []
+
+    def read() -> None:
+        barrier.wait()
+        for _ in range(ROUNDS):
+            for name, lookup in lookups.items():
+                if lookup() != expected[name]:
+                    failures.append(name)
+
+    threads = [threading.Thread(target=read) for _ in range(THREAD_COUNT)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert not failures
+    BodyPartIndex.reset_instance()
+
+
+def test_freeze_lazy_index(sample_json_data_filename: str):
+    """Make sure a lazy index cannot be frozen."""
+    if BodyPartIndex.is_initialized():
+        BodyPartIndex.reset_instance()
+    with pytest.raises(ValueError, match='cannot be frozen'):
+        BodyPartIndex(json_filename=sample_json_data_filename, lazy=True, frozen=True)
+    bpi = BodyPartIndex(json_filename=sample_json_data_filename, lazy=True)
+    with pytest.raises(ValueError, match='cannot be frozen'):
+        bpi.freeze()
+    assert not bpi.is_frozen
+    BodyPartIndex.reset_instance()
@@ -0,0 +1,103 @@
+# pylint: disable=missing-module-docstring
+from typing import Iterator
+import pytest
+from body_part_index import BodyPartIndex, WHOLE_BODY_ID
+from body_part_index.table import BodyPartTable
+from body_part_index.validation import CYCLE, DANGLING_REFERENCE, ORPHAN, find_problems
+
+# pylint: disable=no-name-in-module
+from . import MALE_BREAST_ID, PELVIS_ID
+
+# pylint: enable=no-name-in-module
+
+
+@pytest.fixture
+def _empty_singleton() -> Iterator[None]:
+    """Makes sure no singleton exists before and after the test."""
+    if BodyPartIndex.is_initialized():
+        BodyPartIndex.reset_instance()
+    yield
+    BodyPartIndex.reset_instance()
+
+
+def _body_part(radlex_id: str, contained_by_id: str) -> dict:
+    return {'radlexId': radlex_id, 'description': radlex_id, 'containedById': contained_by_id}
+
+
+def test_find_problems():
+    """Make sure each kind of problem is found, and nothing else."""
+    table = BodyPartTable()
+    table.append(WHOLE_BODY_ID, 'whole body', WHOLE_BODY_ID)
+    table.append('A', 'a', WHOLE_BODY_ID, left_id='A_L')
+    table.append('A_L', 'left a', WHOLE_BODY_ID, unsided_id='A', part_of_id='A')
+    table.append('B', 'b', 'C')
+    table.append('C', 'c', 'B', part_of_id='C')
+    table.append('D', 'd', 'B')
+    table.append('E', 'e', 'MISSING', right_id='E_R')
+    table.append('F', 'f', 'E')
+    problems = [(problem.kind, problem.radlex_id) for problem in find_problems(table)]
+    assert problems == [
+        (DANGLING_REFERENCE, 'E'),
+        (DANGLING_REFERENCE, 'E'),
+        (CYCLE, 'B'),
+        (CYCLE, 'C'),
+        (ORPHAN, 'B'),
+        (ORPHAN, 'E'),
+    ]
+    assert [problem.message for problem in find_problems(table) if problem.kind == ORPHAN] == [
+        f'not contained by {WHOLE_BODY_ID} because of a cycle, so 3 body part(s) are outside '
+        'the hierarchy',
+        f'not contained by {WHOLE_BODY_ID} because of its container MISSING is missing, so 2 '
+        'body part(s) are outside the hierarchy',
+    ]
+
+
+@pytest.mark.usefixtures('_empty_singleton')
+def test_load_checks_integrity(sample_json_data_filename: str, caplog):
+    """Make sure problems in JSON data are logged as warnings while loading."""
+    bpi = BodyPartIndex(json_filename=sample_json_data_filename)
+    assert (ORPHAN, MALE_BREAST_ID) in {
+        (problem.kind, problem.radlex_id) for problem in bpi.integrity_problems
+    }
+    assert f'Integrity problem (orphan) in body part data: {MALE_BREAST_ID}' in caplog.text
+    BodyPartIndex.reset_instance()
+    bpi = BodyPartIndex(json_filename=sample_json_data_filename, trusted=True)
+    assert bpi.integrity_problems is None
+
+
+@pytest.mark.usefixtures('_empty_singleton')
+def test_snapshot_is_trusted(sample_json_data_filename: str, tmp_path):
+    """Make sure snapshots are only checked on request."""
+    BodyPartIndex(json_filename=sample_json_data_filename).save_snapshot(str(tmp_path / 'snapshot'))
+    BodyPartIndex.reset_instance()
+    assert BodyPartIndex.from_snapshot(str(tmp_path / 'snapshot')).integrity_problems is None
+    BodyPartIndex.reset_instance()
+    bpi = BodyPartIndex.from_snapshot(str(tmp_path / 'snapshot'), trusted=False)
+    assert bpi.integrity_problems
+    assert bpi.check_integrity() == bpi.integrity_problems
+
+
+@pytest.mark.usefixtures('_empty_singleton')
+def test_duplicate_ids():
+    """Make sure two body parts with the same ID are rejected."""
+    body_parts = [_body_part(WHOLE_BODY_ID, WHOLE_BODY_ID), _body_part('A', WHOLE_BODY_ID)]
+    with pytest.raises(Exception, match='Duplicate BodyPart with ID A'):
+        BodyPartIndex(json_data={'bodyParts': body_parts + [_body_part('A', 'A')]})
+
+
+@pytest.mark.usefixtures('_empty_singleton')
+def test_ancestors_on_cycle():
+    """Make sure the ancestors of a body part on a cycle raise an error instead of recursing."""
+    body_parts = [
+        _body_part(WHOLE_BODY_ID, WHOLE_BODY_ID),
+        _body_part(PELVIS_ID, WHOLE_BODY_ID),
+        _body_part('A', 'B'),
+        _body_part('B', 'A'),
+    ]
+    bpi = BodyPartIndex(json_data={'bodyParts': body_parts})
+    assert {problem.kind for problem in bpi.integrity_problems} == {CYCLE, ORPHAN}
+    assert [body_part.radlex_id for body_part in bpi.get_by_id(PELVIS_ID).ancestors] == [
+        WHOLE_BODY_ID
+    ]
+    with pytest.raises(ValueError, match='cycle'):
+        bpi.get_by_id('A').ancestors  # pylint: disable=expression-not-assigned